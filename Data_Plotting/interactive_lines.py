@@ -1,13 +1,26 @@
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+import webbrowser
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-# Read data
-df = pd.read_csv('sample3.csv')
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "featureEngineering"))
+
+ACCEL = ["Accel_X", "Accel_Y", "Accel_Z"]
+GYRO = ["Gyro_X", "Gyro_Y", "Gyro_Z"]
+CHANNELS = ACCEL + GYRO
 
-# Create subplot figure with 2 rows (accel and gyro)
-fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
-                    subplot_titles=("Accelerometer Data", "Gyroscope Data"))
+# Points per trace handed to the browser, for the whole recording and again
+# for whatever range is zoomed into; a few per screen pixel is plenty
+MAX_POINTS = 2000
 
 # Custom line dash styles for plotly
 line_dash_styles = {
@@ -29,69 +42,273 @@ line_colors = {
     'Gyro_Z': 'blue',
 }
 
-# Helper function to add markers every N points
-def add_trace_with_markers(ax, col, row, color, dash_style):
-    y_values = df[col]
-    x_values = df.index
-
-    # Marker every 10 points
-    marker_indices = x_values[::10]
-    marker_values = y_values.iloc[::10]
-
-    # Add line trace without markers
-    fig.add_trace(
-        go.Scatter(
-            x=x_values,
-            y=y_values,
-            mode='lines+markers',
-            name=col,
-            line=dict(width=6, dash=dash_style, color=color),
-            marker=dict(size=10, symbol='circle', color=color),
-            # To show markers only on every 10th point, we will trick by adding invisible markers except those points:
-            # But plotly doesn't support per-point marker visibility in a single trace.
-            # Workaround: plot full line without markers, then add a separate scatter with only markers at every 10th point.
-        ),
-        row=row, col=1
-    )
 
-    # Add separate marker trace for every 10 points only
-    fig.add_trace(
-        go.Scatter(
-            x=marker_indices,
-            y=marker_values,
-            mode='markers',
-            showlegend=False,
-            # marker=dict(size=10, color=color, symbol='circle'),
-        ),
-        row=row, col=1
+# ------------------------------------------------------------------ #
+# Downsampling. Both return sorted sample indices into y[start:stop], so
+# every plotted point is a real sample; the JavaScript below mirrors them
+# for the zoomed range.
+
+def minmax_indices(y, n_out, start=0, stop=None):
+    """Each of n_out // 2 equal buckets keeps its minimum and maximum.
+
+    Peaks survive at any zoom level, which is what matters for spotting
+    gestures; the line's overall shape is an envelope.
+    """
+    stop = len(y) if stop is None else stop
+    n = stop - start
+    if n <= n_out:
+        return np.arange(start, stop)
+    n_buckets = max(1, n_out // 2)
+    size = -(-n // n_buckets)
+    # Pad with the final value so the view reshapes; argmin/argmax take the
+    # first occurrence, so only buckets made entirely of padding pick it
+    seg = np.asarray(y[start:stop])
+    seg = np.concatenate([seg, np.full(n_buckets * size - n, seg[-1])]).reshape(n_buckets, size)
+    base = np.arange(n_buckets)[:, None] * size
+    pairs = np.sort(np.stack([seg.argmin(axis=1), seg.argmax(axis=1)], axis=1), axis=1) + base
+    pairs = pairs.ravel()
+    return start + np.unique(pairs[pairs < n])
+
+
+def lttb_indices(y, n_out, start=0, stop=None):
+    """Largest-Triangle-Three-Buckets: n_out points that keep the visual shape.
+
+    Smoother than min-max at the same point count, but a narrow spike can
+    lose to a wider feature in its bucket.
+    """
+    stop = len(y) if stop is None else stop
+    n = stop - start
+    if n <= n_out or n_out < 3:
+        return np.arange(start, stop)
+    y = np.asarray(y[start:stop], dtype=np.float64)
+    # First and last points are kept; n_out - 2 buckets share the rest
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nlo, nhi = hi, edges[b + 2] if b + 2 < len(edges) else n
+        cx, cy = (nlo + nhi - 1) / 2.0, y[nlo:nhi].mean()
+        x = np.arange(lo, hi)
+        area = np.abs((x - a) * (cy - y[a]) - (cx - a) * (y[lo:hi] - y[a]))
+        a = lo + int(area.argmax())
+        out[b + 1] = a
+    return start + out
+
+
+DOWNSAMPLERS = {"minmax": minmax_indices, "lttb": lttb_indices}
+
+
+# Runs in the page after the plot is drawn: on every zoom or pan, each
+# trace is downsampled again from the full-resolution data over just the
+# visible range, so detail appears as you zoom in
+REFINE_SCRIPT = r"""
+var gd = document.getElementById('{plot_id}');
+var spec = JSON.parse(document.getElementById('{plot_id}-data').textContent);
+var recordings = spec.recordings.map(function (b64) {
+    var bytes = Uint8Array.from(atob(b64), function (c) { return c.charCodeAt(0); });
+    return new Float32Array(bytes.buffer);
+});
+var nChannels = spec.channels;
+
+function channel(t) {
+    var rec = recordings[spec.traces[t][0]], c = spec.traces[t][1];
+    var n = rec.length / nChannels, y = new Float32Array(n);
+    for (var i = 0; i < n; i++) y[i] = rec[i * nChannels + c];
+    return y;
+}
+var series = spec.traces.map(function (_, t) { return channel(t); });
+
+function minmax(y, nOut, start, stop) {
+    var n = stop - start, idx = [];
+    if (n <= nOut) { for (var i = start; i < stop; i++) idx.push(i); return idx; }
+    var nBuckets = Math.max(1, Math.floor(nOut / 2)), size = Math.ceil(n / nBuckets);
+    for (var b = 0; b < nBuckets; b++) {
+        var lo = start + b * size, hi = Math.min(lo + size, stop);
+        if (lo >= stop) break;
+        var iMin = lo, iMax = lo;
+        for (var i = lo + 1; i < hi; i++) {
+            if (y[i] < y[iMin]) iMin = i;
+            if (y[i] > y[iMax]) iMax = i;
+        }
+        if (iMin === iMax) idx.push(iMin);
+        else if (iMin < iMax) idx.push(iMin, iMax);
+        else idx.push(iMax, iMin);
+    }
+    return idx;
+}
+
+function lttb(y, nOut, start, stop) {
+    var n = stop - start, idx = [];
+    if (n <= nOut || nOut < 3) { for (var i = start; i < stop; i++) idx.push(i); return idx; }
+    var edges = [];
+    for (var k = 0; k < nOut - 1; k++) edges.push(Math.floor(1 + k * (n - 2) / (nOut - 2)));
+    var a = 0;
+    idx.push(start);
+    for (var b = 0; b < nOut - 2; b++) {
+        var lo = edges[b], hi = edges[b + 1];
+        var nlo = hi, nhi = b + 2 < edges.length ? edges[b + 2] : n;
+        var cx = (nlo + nhi - 1) / 2, cy = 0;
+        for (var j = nlo; j < nhi; j++) cy += y[start + j];
+        cy /= (nhi - nlo);
+        var best = -1, next = lo, ya = y[start + a];
+        for (var x = lo; x < hi; x++) {
+            var area = Math.abs((x - a) * (cy - ya) - (cx - a) * (y[start + x] - ya));
+            if (area > best) { best = area; next = x; }
+        }
+        a = next;
+        idx.push(start + a);
+    }
+    idx.push(stop - 1);
+    return idx;
+}
+
+var downsample = spec.method === 'lttb' ? lttb : minmax;
+
+function refine(range) {
+    var xs = [], ys = [];
+    series.forEach(function (y) {
+        var start = 0, stop = y.length;
+        if (range) {
+            // One sample of margin each side so lines run off the edges
+            start = Math.max(0, Math.floor(range[0]) - 1);
+            stop = Math.min(y.length, Math.ceil(range[1]) + 2);
+        }
+        var idx = stop > start ? downsample(y, spec.points, start, stop) : [];
+        xs.push(idx);
+        ys.push(idx.map(function (i) { return y[i]; }));
+    });
+    Plotly.restyle(gd, {x: xs, y: ys});
+}
+
+gd.on('plotly_relayout', function (ev) {
+    var keys = Object.keys(ev);
+    if (keys.some(function (k) { return /^xaxis\d*\.autorange$/.test(k); })) return refine(null);
+    for (var i = 0; i < keys.length; i++) {
+        var m = /^(xaxis\d*)\.range\[0\]$/.exec(keys[i]);
+        if (m) return refine([ev[keys[i]], ev[m[1] + '.range[1]']]);
+        m = /^(xaxis\d*)\.range$/.exec(keys[i]);
+        if (m) return refine(ev[keys[i]]);
+    }
+});
+"""
+
+
+def load_csv(path):
+    """(n, 6) float32 recording from an accelerometer/gyroscope CSV."""
+    return pd.read_csv(path, usecols=CHANNELS)[CHANNELS].to_numpy(dtype=np.float32)
+
+
+def build_figure(recordings, names, method="minmax", points=MAX_POINTS, title=None):
+    """WebGL figure of the recordings, each channel downsampled to points.
+
+    Returns (figure, page data); the page data is what REFINE_SCRIPT
+    re-downsamples from, see write_html().
+    """
+    downsample = DOWNSAMPLERS[method]
+    overlay = len(recordings) > 1
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
+                        subplot_titles=("Accelerometer Data", "Gyroscope Data"))
+    traces = []
+    for r, (rec, name) in enumerate(zip(recordings, names)):
+        rec = np.asarray(rec, dtype=np.float32)
+        for c, col in enumerate(CHANNELS):
+            idx = downsample(rec[:, c], points)
+            fig.add_trace(
+                go.Scattergl(
+                    x=idx,
+                    y=rec[idx, c],
+                    mode='lines',
+                    name=col,
+                    # One legend entry per channel toggles it in every recording
+                    legendgroup=col,
+                    showlegend=r == 0,
+                    hovertext=name if overlay else None,
+                    line=dict(width=1 if overlay else 2, dash=line_dash_styles[col],
+                              color=line_colors[col]),
+                    opacity=max(0.15, 1 / np.sqrt(len(recordings))),
+                ),
+                row=1 if col in ACCEL else 2, col=1
+            )
+            traces.append((r, c))
+
+    # Update layout: disable gridlines
+    fig.update_xaxes(showgrid=False)
+    fig.update_yaxes(showgrid=False)
+
+    fig.update_layout(
+        height=700,
+        width=900,
+        title_text=title or "Accelerometer and Gyroscope Data (Interactive Plot)",
+        # Unified hover over hundreds of overlaid traces is unreadable
+        hovermode="closest" if overlay else "x unified",
     )
 
-# Plot Accelerometer data (row=1)
-for col in ['Accel_X', 'Accel_Y', 'Accel_Z']:
-    add_trace_with_markers(fig, col, 1, line_colors[col], line_dash_styles[col])
+    # Update y-axis labels
+    fig.update_yaxes(title_text="Acceleration", row=1, col=1)
+    fig.update_yaxes(title_text="Angular Velocity", row=2, col=1)
+
+    # Update x-axis label on bottom plot only
+    fig.update_xaxes(title_text="Sample Index", row=2, col=1)
+
+    data = dict(method=method, points=points, channels=len(CHANNELS), traces=traces,
+                recordings=[base64.b64encode(np.ascontiguousarray(rec, dtype="<f4").tobytes()).decode()
+                            for rec in recordings])
+    return fig, data
+
+
+def write_html(fig, data, path, include_plotlyjs=True):
+    """Standalone page: the figure, the full-resolution data and the zoom refinement."""
+    html = fig.to_html(include_plotlyjs=include_plotlyjs, post_script=REFINE_SCRIPT, full_html=True)
+    # The data goes in its own element, read by id once the plot exists
+    div_id = html.split('<div id="', 1)[1].split('"', 1)[0]
+    blob = f'<script type="application/json" id="{div_id}-data">{json.dumps(data)}</script>'
+    html = html.replace("<body>", "<body>\n" + blob, 1)
+    with open(path, "w") as f:
+        f.write(html)
+    return path
 
-# Plot Gyroscope data (row=2)
-for col in ['Gyro_X', 'Gyro_Y', 'Gyro_Z']:
-    add_trace_with_markers(fig, col, 2, line_colors[col], line_dash_styles[col])
 
-# Update layout: disable gridlines
-fig.update_xaxes(showgrid=False, row=1, col=1)
-fig.update_yaxes(showgrid=False, row=1, col=1)
-fig.update_xaxes(showgrid=False, row=2, col=1)
-fig.update_yaxes(showgrid=False, row=2, col=1)
+def main():
+    parser = argparse.ArgumentParser(description="Interactive WebGL plot of one or many recordings")
+    parser.add_argument("csv", nargs="*", help="CSV files to overlay (default sample3.csv)")
+    parser.add_argument("--gesture", help="overlay every dataset recording of this gesture")
+    parser.add_argument("--person", help="with --gesture, only this person's recordings")
+    parser.add_argument("--subject", help="with --gesture, only this subject's recordings")
+    parser.add_argument("--method", choices=sorted(DOWNSAMPLERS), default="minmax")
+    parser.add_argument("--points", type=int, default=MAX_POINTS,
+                        help=f"points per trace at any zoom level (default {MAX_POINTS})")
+    parser.add_argument("-o", "--out", default="interactive_plot.html")
+    parser.add_argument("--cdn", action="store_true",
+                        help="load plotly.js from the CDN instead of embedding it (~3.5 MB)")
+    parser.add_argument("--no-open", action="store_true", help="only write the HTML file")
+    args = parser.parse_args()
 
-fig.update_layout(
-    height=700,
-    width=900,
-    title_text="Accelerometer and Gyroscope Data (Interactive Plot)",
-    hovermode="x unified"
-)
+    start = time.perf_counter()
+    if args.gesture:
+        from dataset import Dataset
+        ds = Dataset()
+        indices = ds.select(args.person, args.gesture, args.subject)
+        if len(indices) == 0:
+            parser.error(f"no recordings of '{args.gesture}'; gestures: {ds.gestures}")
+        recordings = ds.recordings(indices)
+        names = [ds.entries[i]["path"] for i in indices]
+        title = f"{args.gesture}: {len(indices)} recordings"
+    else:
+        names = args.csv or ['sample3.csv']
+        recordings = [load_csv(p) for p in names]
+        title = None if len(names) == 1 else f"{len(names)} recordings"
 
-# Update y-axis labels
-fig.update_yaxes(title_text="Acceleration", row=1, col=1)
-fig.update_yaxes(title_text="Angular Velocity", row=2, col=1)
+    fig, data = build_figure(recordings, names, args.method, args.points, title)
+    path = write_html(fig, data, args.out, "cdn" if args.cdn else True)
+    n = sum(len(r) for r in recordings)
+    print(f"{len(recordings)} recordings, {n:,} samples, {len(fig.data)} WebGL traces of at most "
+          f"{args.points} points -> {path} ({os.path.getsize(path) / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - start:.2f} s")
+    if not args.no_open:
+        webbrowser.open("file://" + os.path.abspath(path))
 
-# Update x-axis label on bottom plot only
-fig.update_xaxes(title_text="Sample Index", row=2, col=1)
 
-fig.show()
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,160 @@
+import argparse
 import os
-import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Non-interactive backend: figures are only ever saved, and worker
+# processes have no display
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
-def plot_sensor_data(input_folder):
-    # Create output folder
-    output_folder = input_folder + "_plots"
-    os.makedirs(output_folder, exist_ok=True)
 
-    # Traverse all CSV files in the folder
-    for file in os.listdir(input_folder):
-        if file.endswith(".csv"):
-            file_path = os.path.join(input_folder, file)
+ACCEL = ["Accel_X", "Accel_Y", "Accel_Z"]
+GYRO = ["Gyro_X", "Gyro_Y", "Gyro_Z"]
+
+DATA_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+PLOTS_ROOT = DATA_ROOT + "_plots"
+
+# zlib level for the PNGs; the default (6) spends as long compressing as
+# drawing for a few percent smaller files
+PNG_COMPRESS_LEVEL = 1
+
+# CSVs handed to a worker per task; large enough to amortise pickling,
+# small enough to keep every worker busy until the end
+CHUNK_SIZE = 16
+
+
+class PlotTemplate:
+    """The accelerometer/gyroscope figure, built once and refilled per CSV.
+
+    Creating the figure, axes, legends and layout dominates the cost of a
+    plot this small, so render() only swaps the line data and rescales.
+    """
+
+    def __init__(self):
+        self.fig, axs = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+        self.axs = axs
+        self.lines = {}
+
+        # Plot Accelerometer
+        for col in ACCEL:
+            self.lines[col], = axs[0].plot([], [], label=col)
+        axs[0].set_title("Accelerometer Data")
+        axs[0].set_ylabel("Accel")
+        axs[0].legend()
+        axs[0].grid(True)
+
+        # Plot Gyroscope
+        for col in GYRO:
+            self.lines[col], = axs[1].plot([], [], label=col)
+        axs[1].set_title("Gyroscope Data")
+        axs[1].set_xlabel("Sample Index")
+        axs[1].set_ylabel("Gyro")
+        axs[1].legend()
+        axs[1].grid(True)
 
-            # Read CSV
-            df = pd.read_csv(file_path)
+        # Adjust layout
+        self.fig.tight_layout()
 
-            # Create subplots
-            fig, axs = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
+    def render(self, csv_path, png_path):
+        with open(csv_path) as f:
+            header = f.readline().strip().split(",")
+        columns = [c for c in ACCEL + GYRO if c in header]
+        data = np.loadtxt(csv_path, delimiter=",", skiprows=1, ndmin=2,
+                          usecols=[header.index(c) for c in columns])
+        index = np.arange(len(data))
 
-            # Plot Accelerometer
-            axs[0].plot(df['Accel_X'], label='Accel_X')
-            axs[0].plot(df['Accel_Y'], label='Accel_Y')
-            axs[0].plot(df['Accel_Z'], label='Accel_Z')
-            axs[0].set_title("Accelerometer Data")
-            axs[0].set_ylabel("Accel")
-            axs[0].legend()
-            axs[0].grid(True)
+        for col, line in self.lines.items():
+            if col in columns:
+                line.set_data(index, data[:, columns.index(col)])
+            else:
+                line.set_data([], [])
+        for ax in self.axs:
+            ax.relim()
+            ax.autoscale_view()
 
-            # Plot Gyroscope
-            axs[1].plot(df['Gyro_X'], label='Gyro_X')
-            axs[1].plot(df['Gyro_Y'], label='Gyro_Y')
-            axs[1].plot(df['Gyro_Z'], label='Gyro_Z')
-            axs[1].set_title("Gyroscope Data")
-            axs[1].set_xlabel("Sample Index")
-            axs[1].set_ylabel("Gyro")
-            axs[1].legend()
-            axs[1].grid(True)
+        # Save figure
+        os.makedirs(os.path.dirname(png_path) or ".", exist_ok=True)
+        self.fig.savefig(png_path, pil_kwargs={"compress_level": PNG_COMPRESS_LEVEL})
 
-            # Adjust layout
-            plt.tight_layout()
 
-            # Save figure
-            output_file = os.path.join(output_folder, file.replace(".csv", ".png"))
-            plt.savefig(output_file)
-            plt.close()
+_template = None
 
-            print(f"Saved plot: {output_file}")
 
+def _render_chunk(jobs):
+    """Worker entry point: render (csv, png) pairs with this process's template."""
+    global _template
+    if _template is None:
+        _template = PlotTemplate()
+    for csv_path, png_path in jobs:
+        _template.render(csv_path, png_path)
+    return [png for _, png in jobs]
+
+
+def find_jobs(input_root, output_root, force=False):
+    """(csv, png) pairs for every CSV under input_root whose PNG is missing or older.
+
+    The PNG path mirrors the CSV's path relative to input_root.
+    """
+    jobs = []
+    skipped = 0
+    for dirpath, dirnames, filenames in os.walk(input_root):
+        # Skip hidden directories such as the dataset cache
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if not name.endswith(".csv"):
+                continue
+            csv_path = os.path.join(dirpath, name)
+            rel = os.path.relpath(csv_path, input_root)
+            png_path = os.path.join(output_root, rel[:-len(".csv")] + ".png")
+            if not force and os.path.exists(png_path) and \
+                    os.path.getmtime(png_path) >= os.path.getmtime(csv_path):
+                skipped += 1
+                continue
+            jobs.append((csv_path, png_path))
+    return jobs, skipped
+
+
+def plot_tree(input_root=DATA_ROOT, output_root=PLOTS_ROOT, workers=None, force=False):
+    """Render every out-of-date CSV under input_root into a mirrored PNG tree."""
+    start = time.perf_counter()
+    jobs, skipped = find_jobs(input_root, output_root, force)
+    chunks = [jobs[i:i + CHUNK_SIZE] for i in range(0, len(jobs), CHUNK_SIZE)]
+
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            for png in _render_chunk(chunk):
+                print(f"Saved plot: {png}")
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for pngs in pool.map(_render_chunk, chunks):
+                for png in pngs:
+                    print(f"Saved plot: {png}")
+
+    print(f"{len(jobs)} plots rendered, {skipped} up to date, "
+          f"in {time.perf_counter() - start:.1f} s -> {output_root}")
+
+
+def plot_sensor_data(input_folder):
+    # Plots go next to the folder, in <input_folder>_plots
+    plot_tree(input_folder, input_folder + "_plots", workers=1)
 
 
 if __name__ == "__main__":
-    folder_name = "mydata"  
-    plot_sensor_data(folder_name)
+    parser = argparse.ArgumentParser(description="Plot accelerometer/gyroscope CSVs to PNG")
+    parser.add_argument("folder", nargs="?", default="mydata",
+                        help="folder of CSVs, plotted into <folder>_plots")
+    parser.add_argument("--tree", action="store_true",
+                        help="plot the whole data/ tree into data_plots/ instead")
+    parser.add_argument("--out", help="output root (default <input>_plots)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--force", action="store_true", help="re-render up-to-date plots too")
+    args = parser.parse_args()
+
+    input_root = DATA_ROOT if args.tree else args.folder
+    plot_tree(input_root, args.out or os.path.normpath(input_root) + "_plots",
+              workers=args.workers, force=args.force)
@@ -0,0 +1,392 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "emulator"))
+sys.path.append(os.path.join(ROOT, "featureEngineering"))
+sys.path.append(os.path.join(ROOT, "m2cgenmodel"))
+
+DATA_ROOT = os.path.join(ROOT, "data")
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+REPEAT = 3
+THRESHOLD = 0.25        # allowed slowdown before a result is flagged
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit, higher_is_better=True):
+    """Register fn() -> float as a benchmark; the best of REPEAT runs is kept."""
+    def register(fn):
+        BENCHMARKS[name] = dict(fn=fn, unit=unit, higher_is_better=higher_is_better)
+        return fn
+    return register
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+# ------------------------------------------------------------------ #
+# Emulator hot paths
+
+N_LIVE = 20_000
+
+
+def _manager():
+    from emulator import BLEManager, SharedState
+    return BLEManager(SharedState())
+
+
+@benchmark("emulator.notification_handler.text", "samples/s")
+def bench_notification_text():
+    from frames import synthetic_imu
+    texts = [("%d,%d,%d,%d,%d,%d" % tuple(r)).encode() for r in synthetic_imu(N_LIVE).astype(int)]
+    manager = _manager()
+    elapsed = timed(lambda: [manager.notification_handler(None, t) for t in texts])
+    return N_LIVE / elapsed
+
+
+@benchmark("emulator.notification_handler.binary", "samples/s")
+def bench_notification_binary():
+    from frames import PacketGenerator, synthetic_imu
+    packets = list(PacketGenerator(synthetic_imu(N_LIVE)).packets())
+    manager = _manager()
+    elapsed = timed(lambda: [manager.notification_handler(None, p) for p in packets])
+    return N_LIVE / elapsed
+
+
+@benchmark("emulator.process_physics", "samples/s")
+def bench_process_physics():
+    from frames import synthetic_imu
+    rows = synthetic_imu(N_LIVE).tolist()
+    manager = _manager()
+    elapsed = timed(lambda: [manager.process_physics(*r) for r in rows])
+    return N_LIVE / elapsed
+
+
+@benchmark("emulator.multiring", "samples/s")
+def bench_multiring():
+    # 8 simulated rings at 20 kHz each, more than one core fuses in total
+    import asyncio
+    from multiring import run_simulation
+    manager = asyncio.run(run_simulation(0, 2.0, greedy=8, greedy_speed=200))
+    return sum(r.samples for r in manager.rings.values()) / manager.elapsed
+
+
+# ------------------------------------------------------------------ #
+# featureEngineering filters, seconds per million 6-channel samples
+
+N_FILTER = 1_000_000
+
+
+def _filter_input():
+    return np.random.default_rng(0).normal(0, 1000, (N_FILTER, 6))
+
+
+@benchmark("filters.low_pass", "s/Msample", higher_is_better=False)
+def bench_low_pass():
+    from filters import low_pass_filter
+    return timed(low_pass_filter, _filter_input(), 0.24) * 1e6 / N_FILTER
+
+
+@benchmark("filters.high_pass", "s/Msample", higher_is_better=False)
+def bench_high_pass():
+    from filters import high_pass_filter
+    return timed(high_pass_filter, _filter_input(), 0.97) * 1e6 / N_FILTER
+
+
+@benchmark("filters.moving_average", "s/Msample", higher_is_better=False)
+def bench_moving_average():
+    from filters import moving_average_filter
+    return timed(moving_average_filter, _filter_input(), 5) * 1e6 / N_FILTER
+
+
+@benchmark("filters.kalman", "s/Msample", higher_is_better=False)
+def bench_kalman():
+    from filters import KalmanFilter
+    return timed(KalmanFilter().process, _filter_input()) * 1e6 / N_FILTER
+
+
+@benchmark("filters.kalman_c", "s/Msample", higher_is_better=False)
+def bench_kalman_c():
+    from kalman_c import kalman_filter
+    x = _filter_input()
+    kalman_filter(x[:1])        # build/load the library outside the timing
+    return timed(kalman_filter, x) * 1e6 / N_FILTER
+
+
+# ------------------------------------------------------------------ #
+# Quaternion fusion
+
+@benchmark("fusion.mahony.stream", "samples/s")
+def bench_mahony_stream():
+    from fusion import MahonyFilter
+    rows = np.random.default_rng(0).normal(0, 1, (N_LIVE, 6)).tolist()
+    f = MahonyFilter()
+    elapsed = timed(lambda: [f.update(*r, 0.01) for r in rows])
+    return N_LIVE / elapsed
+
+
+@benchmark("fusion.mahony.corpus", "s", higher_is_better=False)
+def bench_mahony_corpus():
+    from fusion import fuse_recordings
+    from sources import find_recordings, load_recording
+    recordings = [load_recording(p) for p in find_recordings(DATA_ROOT)]
+    return timed(fuse_recordings, recordings)
+
+
+@benchmark("physics.batch_sweep", "samples/s")
+def bench_physics_sweep():
+    # Corpus under 27 parameter sets, counted in sample-evaluations
+    import itertools
+    from physics_batch import Params, replay_recordings
+    from sources import find_recordings, load_recording
+    recordings = [load_recording(p) for p in find_recordings(DATA_ROOT)]
+    params = [Params(*p) for p in itertools.product((0.1, 0.3, 0.5), (0.95, 0.98, 0.99),
+                                                     (0.9, 0.95, 0.98))]
+    elapsed = timed(lambda: replay_recordings(recordings, params=params))
+    return len(params) * sum(len(r) for r in recordings) / elapsed
+
+
+# ------------------------------------------------------------------ #
+# Dataset loading
+
+@benchmark("corpus.load_csv", "s", higher_is_better=False)
+def bench_load_corpus():
+    import pandas as pd
+    paths = glob.glob(os.path.join(DATA_ROOT, "*", "gestures", "*", "*", "*.csv"))
+    return timed(lambda: [pd.read_csv(p) for p in paths])
+
+
+@benchmark("corpus.load_cached", "s", higher_is_better=False)
+def bench_load_cached():
+    from dataset import Dataset
+    Dataset(DATA_ROOT)      # make sure the pack exists and is fresh
+    return timed(lambda: Dataset(DATA_ROOT).recordings())
+
+
+@benchmark("corpus.slice", "s", higher_is_better=False)
+def bench_slice():
+    from dataset import Dataset
+    ds = Dataset(DATA_ROOT)
+    return timed(lambda: [np.asarray(ds.slice(gesture=g)[0]).sum() for g in ds.gestures])
+
+
+@benchmark("features.extract", "s", higher_is_better=False)
+def bench_features():
+    from dataset import Dataset
+    from features import FeatureConfig, extract
+    ds = Dataset(DATA_ROOT)
+    return timed(extract, ds, FeatureConfig(stride=10), None, False)
+
+
+# ------------------------------------------------------------------ #
+# m2cgenmodel: same forest as model_generator.py on synthetic f1..f4 features
+
+N_TRAIN = 2_000
+N_PREDICT = 20_000
+
+
+def _model_data(n):
+    rng = np.random.default_rng(42)
+    y = rng.integers(0, 4, n)
+    X = rng.normal(0, 1, (n, 4)) + y[:, None]
+    return X, y
+
+
+def _forest():
+    from sklearn.ensemble import RandomForestClassifier
+    X, y = _model_data(N_TRAIN)
+    rf = RandomForestClassifier(n_estimators=100, max_depth=None, random_state=42, n_jobs=-1)
+    return rf, X, y
+
+
+@benchmark("model.train", "s", higher_is_better=False)
+def bench_model_train():
+    rf, X, y = _forest()
+    return timed(rf.fit, X, y)
+
+
+@benchmark("model.export_c", "s", higher_is_better=False)
+def bench_model_export():
+    import m2cgen as m2c
+    rf, X, y = _forest()
+    rf.fit(X, y)
+    return timed(lambda: m2c.export_to_c(rf, function_name="score_rf"))
+
+
+@benchmark("model.predict", "predictions/s")
+def bench_model_predict():
+    rf, X, y = _forest()
+    rf.fit(X, y)
+    X_pred, _ = _model_data(N_PREDICT)
+    return N_PREDICT / timed(rf.predict, X_pred)
+
+
+# Generated C, compiled on the host with harness.py (cached per code + flags)
+
+def _c_model(quantize=False):
+    from harness import CModel
+    from compress import Quantizer, export_c, export_c_quantized, quantize_forest
+    rf, X, y = _forest()
+    rf.fit(X, y)
+    code = export_c_quantized(quantize_forest(rf, Quantizer.fit(X))) if quantize else export_c(rf)
+    X_pred, _ = _model_data(N_PREDICT)
+    return CModel.from_code(code, X.shape[1], len(rf.classes_)), X_pred
+
+
+@benchmark("model.c.predict_batch", "predictions/s")
+def bench_c_predict_batch():
+    model, X_pred = _c_model()
+    return N_PREDICT / timed(model.predict_index, X_pred)
+
+
+@benchmark("model.c.predict_row", "predictions/s")
+def bench_c_predict_row():
+    model, X_pred = _c_model()
+    return N_PREDICT / timed(model.score_rows, X_pred)
+
+
+@benchmark("model.c_int16.predict_batch", "predictions/s")
+def bench_c_int16_predict_batch():
+    model, X_pred = _c_model(quantize=True)
+    return N_PREDICT / timed(model.predict_index, X_pred)
+
+
+# ------------------------------------------------------------------ #
+# Visualizer frames under software GL, no display needed (SDL's offscreen
+# driver with Mesa through EGL). glFinish after every flip makes the
+# timings include the rendering itself.
+
+N_FRAMES = 300
+
+
+def _render(with_scope):
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    import pygame
+    from emulator import SENS, BLEManager, SharedState
+    from frames import synthetic_imu
+    from scope import Scope, default_traces
+    from visualizer import Visualizer
+
+    manager = BLEManager(SharedState())
+    state = manager.state
+    scope = Scope(state.history, default_traces(SENS)) if with_scope else None
+    viz = Visualizer(state, scope, fps=0, finish=True, log_interval=0)
+    try:
+        viz.open()
+    except pygame.error as e:
+        raise ImportError(f"no GL context: {e}")
+    # Two 100 Hz samples per frame, like a 50 fps display of a live ring
+    imu = synthetic_imu(2 * N_FRAMES)
+    try:
+        for i in range(N_FRAMES):
+            manager.process_samples(imu[2 * i:2 * i + 2])
+            viz.frame()
+    finally:
+        viz.close()
+    return viz.frame_stats.snapshot()["frame_ms"]
+
+
+@benchmark("render.frame", "ms", higher_is_better=False)
+def bench_render_frame():
+    return _render(with_scope=False)
+
+
+@benchmark("render.frame_scope", "ms", higher_is_better=False)
+def bench_render_frame_scope():
+    return _render(with_scope=True)
+
+
+# ------------------------------------------------------------------ #
+
+def run(names, repeat):
+    results = {}
+    for name in names:
+        spec = BENCHMARKS[name]
+        try:
+            values = [spec["fn"]() for _ in range(repeat)]
+        except ImportError as e:
+            print(f"{name:40s} skipped ({e})")
+            continue
+        best = max(values) if spec["higher_is_better"] else min(values)
+        results[name] = dict(value=best, unit=spec["unit"],
+                             higher_is_better=spec["higher_is_better"])
+        print(f"{name:40s} {best:14.4g} {spec['unit']}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print results against the baseline; return the names that regressed."""
+    regressions = []
+    print()
+    print(f"{'benchmark':40s} {'value':>14s} {'baseline':>14s} {'change':>8s}")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:40s} {r['value']:14.4g} {'-':>14s} {'new':>8s}")
+            continue
+
+        # Positive change is always an improvement
+        ratio = r["value"] / base["value"]
+        change = ratio - 1.0 if r["higher_is_better"] else 1.0 / ratio - 1.0
+        flag = ""
+        if change < -threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:40s} {r['value']:14.4g} {base['value']:14.4g} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open Ring performance benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (prefix match), default all")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="fractional slowdown flagged as a regression")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write these results into the baseline file")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, spec in BENCHMARKS.items():
+            print(f"{name:40s} {spec['unit']}")
+        return 0
+
+    names = [n for n in BENCHMARKS if not args.names or any(n.startswith(p) for p in args.names)]
+    results = run(names, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
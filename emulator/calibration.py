@@ -0,0 +1,344 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "featureEngineering"))
+from fusion import ACCEL_SENS, GYRO_SENS
+
+from frames import SAMPLE_RATE_HZ
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DEVICES_FILE = os.path.join(CACHE_DIR, "devices.json")
+
+# A window counts as rest when every gyro axis and every accel axis stays
+# this still, and the gyro mean is plausible as a bias
+REST_WINDOW_S = 1.0
+REST_GYRO_STD_DPS = 0.6
+REST_ACCEL_STD_G = 0.01
+MAX_GYRO_BIAS_DPS = 10.0
+
+# Weight of each new rest window in the running gyro bias
+BIAS_SMOOTHING = 0.2
+
+# Accel offsets and scale need the ring to have rested in several
+# orientations: at least MIN_ORIENTATIONS gravity directions this far apart
+MIN_ORIENTATIONS = 6
+ORIENTATION_SEPARATION_DEG = 30.0
+MAX_ORIENTATIONS = 32
+MAX_FIT_CONDITION = 1e3
+MAX_ACCEL_OFFSET_G = 0.25
+ACCEL_SCALE_RANGE = (0.8, 1.25)
+
+# Seconds between cache writes while the estimate keeps improving
+SAVE_INTERVAL_S = 30.0
+
+QUEUE_SIZE = 1024
+
+
+class Calibration(namedtuple("Calibration", ["offset", "scale", "rest_windows", "orientations", "updated"])):
+    """Per-axis correction of raw counts: (raw - offset) * scale.
+
+    offset holds the accel offsets then the gyro bias, in raw counts;
+    scale is the accel scale then 1.0 for the gyro. Immutable, so the
+    calibrator publishes a new one and readers never need a lock.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def identity(cls):
+        return cls(np.zeros(6), np.ones(6), 0, 0, 0.0)
+
+    @classmethod
+    def from_json(cls, d):
+        return cls(np.array(d["offset"], dtype=float), np.array(d["scale"], dtype=float),
+                   d.get("rest_windows", 0), d.get("orientations", 0), d.get("updated", 0.0))
+
+    def to_json(self):
+        return dict(offset=self.offset.tolist(), scale=self.scale.tolist(),
+                    rest_windows=self.rest_windows, orientations=self.orientations,
+                    updated=self.updated)
+
+    def apply(self, raw):
+        return (raw - self.offset) * self.scale
+
+    def describe(self):
+        return (f"gyro bias {np.round(self.offset[3:] / GYRO_SENS, 3).tolist()} deg/s, "
+                f"accel offset {np.round(self.offset[:3] / ACCEL_SENS, 4).tolist()} g, "
+                f"scale {np.round(self.scale[:3], 4).tolist()} "
+                f"({self.rest_windows} rest windows, {self.orientations} orientations)")
+
+
+class DeviceCache:
+    """Last address and calibration of every ring, in .cache/devices.json.
+
+    Entries are keyed by address; "last_seen" lets a new session connect
+    straight to the ring used most recently instead of scanning.
+    """
+
+    def __init__(self, path=DEVICES_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def last_address(self, device_name=""):
+        """Most recently seen address whose name contains device_name, or None."""
+        devices = [(e.get("last_seen", 0), address) for address, e in self.load().items()
+                   if device_name in (e.get("name") or "")]
+        return max(devices)[1] if devices else None
+
+    def calibration(self, address):
+        entry = self.load().get(address)
+        if entry and entry.get("calibration"):
+            return Calibration.from_json(entry["calibration"])
+        return None
+
+    def update(self, address, name=None, calibration=None):
+        """Merge into the entry for address and rewrite the file atomically."""
+        with self.lock:
+            devices = self.load()
+            entry = devices.setdefault(address, {})
+            entry["last_seen"] = time.time()
+            if name:
+                entry["name"] = name
+            if calibration is not None:
+                entry["calibration"] = calibration.to_json()
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(devices, f, indent=1)
+            os.replace(tmp, self.path)
+
+    def forget(self, address):
+        with self.lock:
+            devices = self.load()
+            if devices.pop(address, None) is not None:
+                tmp = self.path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(devices, f, indent=1)
+                os.replace(tmp, self.path)
+
+
+def fit_accel(means):
+    """Per-axis (offset, scale) in g from rest gravity vectors in g, or None.
+
+    Fits the axis-aligned ellipsoid A x^2 + B y^2 + C z^2 + D x + E y + F z = 1
+    by least squares; the corrected (v - offset) * scale then has unit
+    norm. None when the orientations cannot pin down all six parameters
+    or the result is implausible.
+    """
+    v = np.asarray(means, dtype=float)
+    m = np.hstack([v**2, v])
+    if len(v) < MIN_ORIENTATIONS or np.linalg.cond(m) > MAX_FIT_CONDITION:
+        return None
+    p = np.linalg.lstsq(m, np.ones(len(v)), rcond=None)[0]
+    quad, lin = p[:3], p[3:]
+    if np.any(quad <= 0):
+        return None
+    offset = -lin / (2 * quad)
+    g = 1.0 + np.sum(lin**2 / (4 * quad))
+    scale = np.sqrt(quad / g)
+    if (np.any(np.abs(offset) > MAX_ACCEL_OFFSET_G)
+            or np.any(scale < ACCEL_SCALE_RANGE[0]) or np.any(scale > ACCEL_SCALE_RANGE[1])):
+        return None
+    return offset, scale
+
+
+class RestCalibrator:
+    """Refines a ring's calibration whenever it is at rest.
+
+    feed() runs in the BLE thread and only queues the raw batch. A worker
+    thread cuts REST_WINDOW_S windows and, for windows where the ring is
+    still, moves the gyro bias towards the window mean and collects the
+    gravity direction. Once enough distinct orientations are in,
+    fit_accel() supplies accel offsets and scale. Every improvement is
+    published as a new `calibration` (BLEManager picks it up on its next
+    batch) and saved to the DeviceCache under the attached address.
+    """
+
+    def __init__(self, cache=None, rate_hz=SAMPLE_RATE_HZ, queue_size=QUEUE_SIZE):
+        self.cache = cache
+        self.window = int(REST_WINDOW_S * rate_hz)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.address = None
+        self.calibration = Calibration.identity()
+        self.orientations = []          # (unit gravity direction, accel mean in g)
+        self.pending = []
+        self.last_save = 0.0
+        self.dirty = False
+        self.dropped = 0
+
+    def attach(self, address, name=None):
+        """Use and refine the cached calibration of `address` from now on."""
+        if address != self.address:
+            self.address = address
+            cached = self.cache.calibration(address) if self.cache else None
+            self.calibration = cached or Calibration.identity()
+            self.orientations = []
+        if self.cache:
+            self.cache.update(address, name)
+        return self.calibration
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="calibrator", daemon=True)
+        self.thread.start()
+        return self
+
+    def feed(self, raw):
+        try:
+            self.queue.put_nowait(raw)
+        except queue.Full:
+            self.dropped += len(raw)
+
+    def stop(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+        self.save()
+
+    def save(self):
+        if self.dirty and self.cache and self.address:
+            self.cache.update(self.address, calibration=self.calibration)
+            self.last_save = time.time()
+            self.dirty = False
+
+    def _run(self):
+        while True:
+            raw = self.queue.get()
+            if raw is None:
+                return
+            self.pending.append(np.asarray(raw, dtype=float))
+            if sum(len(p) for p in self.pending) < self.window:
+                continue
+            rows = np.concatenate(self.pending)
+            n = len(rows) // self.window * self.window
+            self.pending = [rows[n:]]
+            for w in rows[:n].reshape(-1, self.window, 6):
+                self.refine(w)
+            if self.dirty and time.time() - self.last_save >= SAVE_INTERVAL_S:
+                self.save()
+
+    def refine(self, window):
+        """Update the calibration from one (window, 6) block of raw counts; True if at rest."""
+        std = window.std(axis=0)
+        mean = window.mean(axis=0)
+        if (np.any(std[3:] > REST_GYRO_STD_DPS * GYRO_SENS)
+                or np.any(std[:3] > REST_ACCEL_STD_G * ACCEL_SENS)
+                or np.any(np.abs(mean[3:]) > MAX_GYRO_BIAS_DPS * GYRO_SENS)):
+            return False
+
+        cal = self.calibration
+        offset, scale = cal.offset.copy(), cal.scale.copy()
+        weight = 1.0 if cal.rest_windows == 0 else BIAS_SMOOTHING
+        offset[3:] += weight * (mean[3:] - offset[3:])
+
+        accel = mean[:3] / ACCEL_SENS
+        direction = accel / np.linalg.norm(accel)
+        close = [i for i, (d, _) in enumerate(self.orientations)
+                 if np.degrees(np.arccos(np.clip(d @ direction, -1, 1))) < ORIENTATION_SEPARATION_DEG]
+        if close:
+            # Same pose again: keep the newest reading of it
+            self.orientations[close[0]] = (direction, accel)
+        elif len(self.orientations) < MAX_ORIENTATIONS:
+            self.orientations.append((direction, accel))
+        orientations = max(cal.orientations, len(self.orientations))
+
+        fit = fit_accel([a for _, a in self.orientations])
+        if fit is not None:
+            offset[:3], scale[:3] = fit[0] * ACCEL_SENS, fit[1]
+        self.calibration = Calibration(offset, scale, cal.rest_windows + 1, orientations, time.time())
+        self.dirty = True
+        return True
+
+
+# ------------------------------------------------------------------ #
+# Check against a simulated ring with known errors
+
+def simulated_rests(rng, bias, offset, scale, seconds=3.0, rate_hz=SAMPLE_RATE_HZ):
+    """Raw counts of a ring resting in the 6 face-up/down poses plus 2 tilted ones."""
+    poses = [(0, 0, 1), (0, 0, -1), (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0),
+             (0.6, 0.0, 0.8), (0.0, -0.6, 0.8)]
+    n = int(seconds * rate_hz)
+    blocks = []
+    for g in poses:
+        accel = np.asarray(g, dtype=float) / scale + offset      # what the sensor reports, g
+        block = np.empty((n, 6))
+        block[:, :3] = accel * ACCEL_SENS
+        block[:, 3:] = bias * GYRO_SENS
+        blocks.append(np.round(block + rng.normal(0, [40] * 3 + [20] * 3, block.shape)))
+    return blocks
+
+
+def simulate(seed=0):
+    from emulator import BLEManager, SharedState
+
+    rng = np.random.default_rng(seed)
+    bias = np.array([1.5, -2.0, 0.8])                       # deg/s
+    offset = np.array([0.03, -0.02, 0.05])                  # g
+    scale = np.array([1.02, 0.97, 1.01])
+    rests = simulated_rests(rng, bias, offset, scale)
+
+    calibrator = RestCalibrator()
+    for block in rests:
+        for w in block[:len(block) // calibrator.window * calibrator.window].reshape(-1, calibrator.window, 6):
+            calibrator.refine(w)
+    cal = calibrator.calibration
+    print(f"true:      gyro bias {bias.tolist()} deg/s, accel offset {offset.tolist()} g, "
+          f"scale {scale.tolist()}")
+    print(f"estimated: {cal.describe()}")
+
+    # A fresh session on the cached calibration: 10 s flat on a table
+    still = simulated_rests(np.random.default_rng(seed + 1), bias, offset, scale, seconds=10.0)[0]
+    for name, calibration in (("uncalibrated", None), ("calibrated", cal)):
+        manager = BLEManager(SharedState())
+        manager.calibration = calibration
+        for start in range(0, len(still), 8):
+            manager.process_samples(still[start:start + 8])
+        s = manager.state
+        print(f"{name:12s} after 10 s at rest: roll {np.degrees(s.roll):7.2f}, pitch {np.degrees(s.pitch):7.2f}, "
+              f"yaw {np.degrees(s.yaw):7.2f} deg, position {np.linalg.norm([s.x, s.y, s.z]):8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached ring addresses and calibration")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="cached rings, most recent first")
+    p = sub.add_parser("forget", help="drop a ring from the cache")
+    p.add_argument("address")
+    sub.add_parser("simulate", help="estimate a simulated ring's known errors and show the drift they cause")
+    args = parser.parse_args()
+
+    cache = DeviceCache()
+    if args.command == "list":
+        devices = sorted(cache.load().items(), key=lambda kv: -kv[1].get("last_seen", 0))
+        for address, entry in devices:
+            seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.get("last_seen", 0)))
+            print(f"{address}  {entry.get('name') or '?'}  last seen {seen}")
+            if entry.get("calibration"):
+                print(f"    {Calibration.from_json(entry['calibration']).describe()}")
+        if not devices:
+            print(f"No rings cached in {cache.path}")
+    elif args.command == "forget":
+        cache.forget(args.address)
+    else:
+        simulate()
+
+
+if __name__ == "__main__":
+    main()
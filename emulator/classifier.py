@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque, namedtuple
+
+import numpy as np
+
+from features import FeatureConfig, StreamingExtractor
+
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                          "m2cgenmodel", "rf_model.joblib")
+
+# Consecutive windows that must agree before a gesture is reported
+DEBOUNCE = 3
+
+# Windows whose top class probability is below this never count towards a gesture
+MIN_CONFIDENCE = 0.0
+
+# A reported gesture is held while its label keeps winning; after this many
+# more windows (1 s at the default stride and 100 Hz) the same label can be
+# reported again. A low-confidence window or another label releases it at once.
+REPEAT_AFTER = 4
+
+# Sample batches waiting for the worker; beyond this the BLE thread drops
+# batches instead of blocking
+QUEUE_SIZE = 256
+
+Prediction = namedtuple("Prediction", ["label", "confidence", "time", "latency"])
+
+
+class GestureClassifier:
+    """Runs the gesture forest on a live sample stream.
+
+    The BLE thread hands raw (n, 6) batches to feed(), which only enqueues
+    them. A worker thread cuts them into the model's feature windows,
+    predicts every completed window and debounces the labels. The latest
+    debounced Prediction is swapped into `gesture`, like SharedState.pose,
+    so readers never wait.
+    """
+
+    def __init__(self, model, config=None, debounce=DEBOUNCE, min_confidence=MIN_CONFIDENCE,
+                 repeat_after=REPEAT_AFTER, on_gesture=None, window=1000):
+        self.model = model
+        if config is None:
+            # model_generator.py stores the windowing it trained with
+            config = FeatureConfig(**getattr(model, "feature_config_", {}))
+        n_features = getattr(model, "n_features_in_", len(config.columns))
+        if n_features != len(config.columns):
+            raise ValueError(f"Model expects {n_features} features, "
+                             f"{config} produces {len(config.columns)}")
+        self.config = config
+        self.extractor = StreamingExtractor(config)
+        self.debounce = debounce
+        self.min_confidence = min_confidence
+        self.repeat_after = repeat_after
+        self.on_gesture = on_gesture
+
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.thread = None
+        self.gesture = None
+
+        self.candidate = None
+        self.streak = 0
+        self.held = None            # label reported and not yet released
+        self.held_windows = 0
+        self.windows = 0
+        self.samples = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self.started = None
+        self.latencies = deque(maxlen=window)    # last sample arrival -> label, s
+        self.counts = Counter()
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, **kwargs):
+        import joblib
+        model = joblib.load(path)
+        if hasattr(model, "n_jobs"):
+            # One window at a time: thread pool start-up would dominate
+            model.n_jobs = 1
+        return cls(model, **kwargs)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name="gesture-classifier", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Finish the queued batches and stop the worker."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def feed(self, raw, arrival=None):
+        """Queue an (n, 6) batch of raw samples. Never blocks."""
+        try:
+            self.queue.put_nowait((raw, arrival or time.time()))
+        except queue.Full:
+            self.dropped += len(raw)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self._process(*item)
+
+    def _process(self, raw, arrival):
+        start = time.perf_counter()
+        rows = self.extractor.push(raw)
+        if len(rows):
+            proba = self.model.predict_proba(rows)
+            done = time.time()
+            for p in proba:
+                self._debounce(p, done, done - arrival)
+            # Every window in this batch completed with its last sample
+            self.latencies.extend([done - arrival] * len(rows))
+            self.windows += len(rows)
+        self.samples += len(raw)
+        self.busy += time.perf_counter() - start
+
+    def _debounce(self, proba, now, latency):
+        best = int(np.argmax(proba))
+        label = self.model.classes_[best]
+        if proba[best] < self.min_confidence:
+            self.candidate, self.streak, self.held = None, 0, None
+            return
+        if label == self.candidate:
+            self.streak += 1
+        else:
+            self.candidate, self.streak, self.held = label, 1, None
+
+        if self.held is not None:
+            self.held_windows += 1
+            if self.held_windows < self.repeat_after:
+                return
+            # Still the same label a gesture later: a repetition, debounced afresh
+            self.held, self.streak = None, 1
+
+        if self.streak >= self.debounce:
+            self.gesture = Prediction(label, float(proba[best]), now, latency)
+            self.counts[label] += 1
+            self.held, self.held_windows = label, 0
+            if self.on_gesture:
+                self.on_gesture(self.gesture)
+
+    def report(self):
+        lines = [f"{self.windows} windows classified ({self.config.window} samples, "
+                 f"stride {self.config.stride}), {sum(self.counts.values())} gestures"]
+        if self.latencies:
+            lat = np.array(self.latencies) * 1e3
+            lines.append(f"last sample->label p50 {np.percentile(lat, 50):.2f} ms, "
+                         f"p99 {np.percentile(lat, 99):.2f} ms")
+        if self.windows and self.started:
+            elapsed = time.perf_counter() - self.started
+            # Sample rate the worker could sustain if it were never idle
+            capacity = self.samples / self.busy if self.busy else float("inf")
+            lines.append(f"worker busy {self.busy / elapsed:.1%}, "
+                         f"{self.busy / self.windows * 1e3:.2f} ms/window, "
+                         f"keeps up to {capacity:,.0f} Hz")
+        if self.dropped:
+            lines.append(f"dropped {self.dropped} samples (queue full)")
+        if self.counts:
+            lines.append("gestures " + ", ".join(f"{k}:{v}" for k, v in self.counts.most_common()))
+        return "\n".join(lines)
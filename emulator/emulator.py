@@ -1,41 +1,82 @@
+import argparse
 import asyncio
+import glob
 import math
+import os
+import sys
 import time
 import threading
 import struct
+from collections import namedtuple
 from typing import List, Optional
 
 # Third-party libraries
-from bleak import BleakScanner, BleakClient
-import pygame
-from pygame.locals import DOUBLEBUF, OPENGL, QUIT, K_SPACE, KEYDOWN
+import numpy as np
 
-# OpenGL
-from OpenGL.GL import *
-from OpenGL.GLU import *
+# Filters shared with the offline featureEngineering scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "featureEngineering"))
+from filters import LowPassFilter
+from fusion import MahonyFilter, quaternion_to_rotation_matrix
 
+from frames import SAMPLE_RATE_HZ, TICK_HZ, FrameDecoder, is_binary_packet
+from ringbuffer import RingBuffer
+from stats import PipelineStats
+from sources import BLESource, ReplaySource, SyntheticSource
+from classifier import MODEL_PATH, DEBOUNCE, REPEAT_AFTER, GestureClassifier
+from recorder import ROTATE_BYTES, ROTATE_SECONDS, Recorder
+from metrics import EXPORT_INTERVAL_S, METRICS_PORT, Metrics, MetricsExporter
+from calibration import DeviceCache, RestCalibrator
 
-DEVICE_NAME = "open-ring"
+# "auto" picks binary frames by their magic byte, "binary" or "text" forces one
+FRAME_FORMAT = "auto"
 
-CHAR_UUID = "0000fe4-0000-1000-8000-00805f9b34fb" 
+# Where integration dt comes from for binary frames: the device "tick", or
+# "seq" (sequence number at the nominal rate) if the ring's clock is unreliable.
+# Text samples carry neither and are spaced at the nominal rate.
+TIMEBASE = "tick"
+NOMINAL_DT = 1.0 / SAMPLE_RATE_HZ
+MAX_DT = 0.1
 
 
 ACCEL_SENS = 16384.0  
 GYRO_SENS  = 131.0     
+SENS = np.array([ACCEL_SENS] * 3 + [GYRO_SENS] * 3)
 
 
 COMP_ALPHA   = 0.98    
 LPF_ALPHA    = 0.3     
 GRAVITY      = 9.81
 VEL_DAMPING  = 0.98   
-POS_SCALE    = 0.1    
+ACCEL_DEADBAND = 0.2   # m/s^2; smaller world accelerations are treated as drift
+
+# "complementary" integrates Euler angles, "mahony" runs the quaternion filter
+FUSION_MODE  = "complementary"
+
+HISTORY_SECONDS = 10.0
+
+# Immutable pose handed to the renderer. The BLE thread swaps in a new one
+# after every batch, so readers never need the lock.
+Pose = namedtuple("Pose", ["seq", "roll", "pitch", "yaw", "x", "y", "z"])
+
+HISTORY_COLUMNS = (
+    ["time"]                                                   # device time, s
+    + ["Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z"]
+    + ["ax_g", "ay_g", "az_g", "gx_dps", "gy_dps", "gz_dps"]
+    + ["roll", "pitch", "yaw", "x", "y", "z"]
+)
 
 
 class SharedState:
 
     def __init__(self):
+        # Guards the working state below; only the BLE thread takes it
         self.lock = threading.Lock()
         self.running = True
+        self.reset_requested = False
+
+        self.pose = Pose(0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        self.history = RingBuffer(int(HISTORY_SECONDS * SAMPLE_RATE_HZ), HISTORY_COLUMNS)
+        self.gesture = None     # latest classifier Prediction, swapped like pose
         
 
         self.roll = 0.0
@@ -61,17 +102,22 @@ class SharedState:
         self.initialized = False
     
     def reset_position(self):
+        # Applied by the BLE thread on its next batch so the caller never waits
+        self.reset_requested = True
 
-        with self.lock:
-            self.x = self.y = self.z = 0.0
-            self.vx = self.vy = self.vz = 0.0
-            print("Position reset.")
+    def apply_reset(self):
+        """Caller holds the lock."""
+        self.x = self.y = self.z = 0.0
+        self.vx = self.vy = self.vz = 0.0
+        self.reset_requested = False
+        print("Position reset.")
 
-class MathUtils:
-    @staticmethod
-    def low_pass(prev: float, new_val: float, alpha: float) -> float:
-        return prev + alpha * (new_val - prev)
+    def publish(self):
+        """Swap in a new Pose from the working state. Caller holds the lock."""
+        self.pose = Pose(self.pose.seq + 1, self.roll, self.pitch, self.yaw,
+                         self.x, self.y, self.z)
 
+class MathUtils:
     @staticmethod
     def euler_to_rotation_matrix(roll, pitch, yaw):
         """Returns 3x3 rotation matrix for transforming accel vector."""
@@ -88,12 +134,56 @@ class MathUtils:
 
 class BLEManager:
 
-    def __init__(self, state: SharedState):
+    def __init__(self, state: SharedState, classifier: Optional[GestureClassifier] = None,
+                 recorder: Optional[Recorder] = None, metrics: Optional[Metrics] = None,
+                 calibrator: Optional[RestCalibrator] = None):
         self.state = state
-        self.last_update_time = None
-
-    def notification_handler(self, sender, data: bytearray):
+        self.classifier = classifier
+        self.recorder = recorder
+        # calibration.Calibration applied to raw counts, None for none. With a
+        # calibrator it follows the calibrator's latest estimate every batch.
+        self.calibrator = calibrator
+        self.calibration = calibrator.calibration if calibrator is not None else None
+        self.last_tick = None
+        self.lpf = LowPassFilter(LPF_ALPHA)
+        self.fusion = MahonyFilter()
+        self.decoder = FrameDecoder()
+        self.stats = PipelineStats()
+
+        # Per-stage timings into metrics histograms "ble.<stage>"; every
+        # hook is skipped when this is None
+        self.metrics = metrics
+        self.probe = None
+        if metrics is not None:
+            self.probe = metrics.probe("ble")
+            metrics.gauge("ble.notifications", lambda: self.stats.notifications)
+            metrics.gauge("ble.samples", lambda: self.stats.samples)
+            metrics.gauge("ble.sample_rate_hz", self.stats.sample_rate)
+            metrics.gauge("ble.dropped_frames", lambda: self.decoder.dropped)
+            if recorder is not None:
+                metrics.gauge("recorder.dropped_samples", lambda: recorder.dropped)
+
+    def notification_handler(self, sender, data: bytearray, arrival=None):
+        """Decode and fuse one notification; arrival defaults to now."""
+        arrival = arrival or time.time()
+        probe = self.probe
+        if probe is not None:
+            probe.begin()
         try:
+            if FRAME_FORMAT == "binary" or (FRAME_FORMAT == "auto" and is_binary_packet(data)):
+                samples, ticks, seq = self.decoder.decode(data)
+                if len(samples) == 0:
+                    return
+                if TIMEBASE == "seq":
+                    ticks = np.round(seq * (TICK_HZ * NOMINAL_DT)).astype(np.int64)
+                self.stats.on_arrival(arrival, len(samples), ticks[-1] / TICK_HZ)
+                if probe is not None:
+                    probe.mark("decode")
+                self.process_samples(samples, ticks, arrival)
+                if probe is not None:
+                    probe.end("notification")
+                return
+
             # Decode data (Expected format: "ax,ay,az,gx,gy,gz")
             text = data.decode("utf-8", errors='ignore').strip()
             parts = text.split(",")
@@ -103,251 +193,336 @@ class BLEManager:
 
 
             raw_vals = [float(x) for x in parts]
-            ax_raw, ay_raw, az_raw, gx_raw, gy_raw, gz_raw = raw_vals
 
-            self.process_physics(ax_raw, ay_raw, az_raw, gx_raw, gy_raw, gz_raw)
+            self.stats.on_arrival(arrival, 1)
+            if probe is not None:
+                probe.mark("decode")
+            self.process_samples(np.array([raw_vals]), arrival=arrival)
+            if probe is not None:
+                probe.end("notification")
 
         except ValueError:
-            pass 
+            if self.metrics is not None:
+                self.metrics.count("ble.parse_errors")
         except Exception as e:
             print(f"Data Error: {e}")
+            if self.metrics is not None:
+                self.metrics.count("ble.errors")
 
     def process_physics(self, ax_r, ay_r, az_r, gx_r, gy_r, gz_r):
-        current_time = time.time()
-        if self.last_update_time is None:
-            self.last_update_time = current_time
+        probe = self.probe
+        if probe is not None:
+            probe.begin()
+        self.process_samples(np.array([[ax_r, ay_r, az_r, gx_r, gy_r, gz_r]], dtype=float))
+        if probe is not None:
+            probe.end("physics")
+
+    def process_samples(self, raw: np.ndarray, ticks=None, arrival=None):
+        """Fuse an (n, 6) batch of raw ax, ay, az, gx, gy, gz samples.
+
+        ticks are the samples' device ticks (TICK_HZ). Without them the
+        samples are taken to be NOMINAL_DT apart, continuing from the last
+        batch.
+        """
+        n = len(raw)
+        if n == 0:
             return
-        
-        dt = current_time - self.last_update_time
-        self.last_update_time = current_time
-        
-
-        if dt <= 0 or dt > 0.1:
-            dt = 0.01
 
-        ax_g_new = ax_r / ACCEL_SENS
-        ay_g_new = ay_r / ACCEL_SENS
-        az_g_new = az_r / ACCEL_SENS
-        gx_dps_new = gx_r / GYRO_SENS
-        gy_dps_new = gy_r / GYRO_SENS
-        gz_dps_new = gz_r / GYRO_SENS
+        period = TICK_HZ * NOMINAL_DT
+        if ticks is None:
+            start = 0 if self.last_tick is None else self.last_tick + period
+            ticks = [start + period * i for i in range(n)]
+        else:
+            ticks = ticks.tolist()
+        prev = ticks[0] - period if self.last_tick is None else self.last_tick
+        self.last_tick = ticks[-1]
+
+        if self.recorder is not None:
+            self.recorder.feed(raw, ticks, arrival)
+        probe = self.probe
+        if probe is not None:
+            probe.mark("record")
+
+        if self.calibrator is not None:
+            self.calibrator.feed(raw)
+            self.calibration = self.calibrator.calibration
+
+        # Calibration, unit conversion and LPF for the whole batch at once, outside the lock
+        calibration = self.calibration
+        scaled = (raw if calibration is None else calibration.apply(raw)) / SENS
+        filtered = self.lpf.process(scaled)
+        fused = []
+        if probe is not None:
+            probe.mark("filter")
 
         with self.state.lock:
-
+            if probe is not None:
+                probe.mark("lock_wait")
             if not self.state.initialized:
-                self.state.ax_g, self.state.ay_g, self.state.az_g = ax_g_new, ay_g_new, az_g_new
-                self.state.gx_dps, self.state.gy_dps, self.state.gz_dps = gx_dps_new, gy_dps_new, gz_dps_new
+                self._seed_tilt(*filtered[0, :3])
                 self.state.initialized = True
-            else:
-                self.state.ax_g = MathUtils.low_pass(self.state.ax_g, ax_g_new, LPF_ALPHA)
-                self.state.ay_g = MathUtils.low_pass(self.state.ay_g, ay_g_new, LPF_ALPHA)
-                self.state.az_g = MathUtils.low_pass(self.state.az_g, az_g_new, LPF_ALPHA)
-                self.state.gx_dps = MathUtils.low_pass(self.state.gx_dps, gx_dps_new, LPF_ALPHA)
-                self.state.gy_dps = MathUtils.low_pass(self.state.gy_dps, gy_dps_new, LPF_ALPHA)
-                self.state.gz_dps = MathUtils.low_pass(self.state.gz_dps, gz_dps_new, LPF_ALPHA)
-
-
-            roll_acc = math.atan2(self.state.ay_g, self.state.az_g)
-            pitch_acc = math.atan2(-self.state.ax_g, math.sqrt(self.state.ay_g**2 + self.state.az_g**2))
-
-
-            self.state.roll += math.radians(self.state.gx_dps) * dt
-            self.state.pitch += math.radians(self.state.gy_dps) * dt
-            self.state.yaw += math.radians(self.state.gz_dps) * dt
-
-
-            self.state.roll = COMP_ALPHA * self.state.roll + (1.0 - COMP_ALPHA) * roll_acc
-            self.state.pitch = COMP_ALPHA * self.state.pitch + (1.0 - COMP_ALPHA) * pitch_acc
-            
-
-            R = MathUtils.euler_to_rotation_matrix(self.state.roll, self.state.pitch, self.state.yaw)
-            
-
-            acc_local = [self.state.ax_g * GRAVITY, self.state.ay_g * GRAVITY, self.state.az_g * GRAVITY]
-            
-
-            acc_world = [
-                sum(R[0][i] * acc_local[i] for i in range(3)),
-                sum(R[1][i] * acc_local[i] for i in range(3)),
-                sum(R[2][i] * acc_local[i] for i in range(3))
-            ]
-
-            # Subtract Gravity (Assume World Z is up)
-            acc_world[2] -= GRAVITY
-
-            # Thresholding (ignore tiny movements to stop drift)
-            if abs(acc_world[0]) < 0.2: acc_world[0] = 0
-            if abs(acc_world[1]) < 0.2: acc_world[1] = 0
-            if abs(acc_world[2]) < 0.2: acc_world[2] = 0
-
-
-            self.state.vx += acc_world[0] * dt
-            self.state.vy += acc_world[1] * dt
-            self.state.vz += acc_world[2] * dt
-
-            self.state.vx *= VEL_DAMPING
-            self.state.vy *= VEL_DAMPING
-            self.state.vz *= VEL_DAMPING
-
-            self.state.x += self.state.vx * dt
-            self.state.y += self.state.vy * dt
-            self.state.z += self.state.vz * dt
-
-    async def run(self):
-        print(f"Scanning for device with name containing: '{DEVICE_NAME}'...")
-        device = await BleakScanner.find_device_by_filter(
-            lambda d, ad: d.name and DEVICE_NAME in d.name,
-            timeout=10.0
-        )
-
-        if not device:
-            print("Device not found. Please ensure it is powered on.")
-            self.state.running = False
-            return
-
-        print(f"Connecting to {device.name}...")
-        
-        try:
-            async with BleakClient(device) as client:
-                print(f"Connected. subscribing to {CHAR_UUID}")
-                await client.start_notify(CHAR_UUID, self.notification_handler)
-                
-                while self.state.running:
-                    if not client.is_connected:
-                        print("Device disconnected unexpectedly.")
-                        break
-                    await asyncio.sleep(0.5)
-                
-                await client.stop_notify(CHAR_UUID)
-        except Exception as e:
-            print(f"Bluetooth Error: {e}")
-            self.state.running = False
-
-class Visualizer:
-    def __init__(self, state: SharedState):
-        self.state = state
-        self.display_dim = (800, 600)
-
-    def draw_axis(self):
-        glBegin(GL_LINES)
-        # X Axis (Red)
-        glColor3f(1, 0, 0); glVertex3f(0, 0, 0); glVertex3f(1, 0, 0)
-        # Y Axis (Green)
-        glColor3f(0, 1, 0); glVertex3f(0, 0, 0); glVertex3f(0, 1, 0)
-        # Z Axis (Blue)
-        glColor3f(0, 0, 1); glVertex3f(0, 0, 0); glVertex3f(0, 0, 1)
-        glEnd()
-
-    def draw_glider(self):
-        """Draws a 3D Paper Plane / Dart shape using Triangles."""
-        glBegin(GL_TRIANGLES)
-
+            if self.state.reset_requested:
+                self.state.apply_reset()
+
+            for (ax_g, ay_g, az_g, gx_dps, gy_dps, gz_dps), tick in zip(filtered.tolist(), ticks):
+                # dt from the device clock. Gaps from lost frames integrate over
+                # their real length; nonsense (clock reset, stale tick) falls
+                # back to the nominal period.
+                dt = (tick - prev) / TICK_HZ
+                prev = tick
+                if dt <= 0 or dt > MAX_DT:
+                    dt = NOMINAL_DT
+
+                self.state.ax_g, self.state.ay_g, self.state.az_g = ax_g, ay_g, az_g
+                self.state.gx_dps, self.state.gy_dps, self.state.gz_dps = gx_dps, gy_dps, gz_dps
+                self._integrate(dt)
+                fused.append((self.state.roll, self.state.pitch, self.state.yaw,
+                              self.state.x, self.state.y, self.state.z))
+
+            self.state.publish()
+
+        if arrival is not None:
+            self.stats.on_published(arrival)
+        if probe is not None:
+            probe.mark("publish")
+
+        rows = np.empty((n, len(HISTORY_COLUMNS)))
+        rows[:, 0] = ticks
+        rows[:, 0] /= TICK_HZ
+        rows[:, 1:7] = raw
+        rows[:, 7:13] = filtered
+        rows[:, 13:] = fused
+        self.state.history.extend(rows)
+        if probe is not None:
+            probe.mark("history")
+
+        if self.classifier is not None:
+            self.classifier.feed(raw, arrival)
+            if probe is not None:
+                probe.mark("classify")
+
+    def _seed_tilt(self, ax_g, ay_g, az_g):
+        """Start roll and pitch at the first sample's accel tilt instead of
+        level, so the complementary filter needs no warm-up. Caller holds the lock."""
+        if FUSION_MODE != "mahony":
+            self.state.roll = math.atan2(ay_g, az_g)
+            self.state.pitch = math.atan2(-ax_g, math.sqrt(ay_g**2 + az_g**2))
+
+    def _integrate(self, dt):
+        """One fusion and dead-reckoning step. Caller holds the lock."""
+        if FUSION_MODE == "mahony":
+            q = self.fusion.update(math.radians(self.state.gx_dps), math.radians(self.state.gy_dps),
+                                   math.radians(self.state.gz_dps),
+                                   self.state.ax_g, self.state.ay_g, self.state.az_g, dt)
+            self.state.roll, self.state.pitch, self.state.yaw = self.fusion.euler()
+            R = quaternion_to_rotation_matrix(q)
+        else:
+            R = self._complementary(dt)
+        # Per sample: trig and rotation matrix, then dead reckoning below
+        if self.probe is not None:
+            self.probe.mark("fusion")
+
+
+        acc_local = [self.state.ax_g * GRAVITY, self.state.ay_g * GRAVITY, self.state.az_g * GRAVITY]
         
 
-        glColor3f(0.2, 0.6, 1.0)
-        
-        # Left Wing Top
-        glVertex3f(0.0, 0.0, -1.5)  
-        glVertex3f(-1.0, 0.0, 1.0)  
-        glVertex3f(0.0, 0.2, 1.0) 
-        
-        # Right Wing Top
-        glVertex3f(0.0, 0.0, -1.5)  
-        glVertex3f(1.0, 0.0, 1.0)  
-        glVertex3f(0.0, 0.2, 1.0)   
+        acc_world = [
+            sum(R[0][i] * acc_local[i] for i in range(3)),
+            sum(R[1][i] * acc_local[i] for i in range(3)),
+            sum(R[2][i] * acc_local[i] for i in range(3))
+        ]
 
+        # Subtract Gravity (Assume World Z is up)
+        acc_world[2] -= GRAVITY
 
-        glColor3f(0.1, 0.4, 0.8)
-        
+        # Thresholding (ignore tiny movements to stop drift)
+        if abs(acc_world[0]) < ACCEL_DEADBAND: acc_world[0] = 0
+        if abs(acc_world[1]) < ACCEL_DEADBAND: acc_world[1] = 0
+        if abs(acc_world[2]) < ACCEL_DEADBAND: acc_world[2] = 0
 
-        glVertex3f(0.0, 0.0, -1.5)
-        glVertex3f(-1.0, 0.0, 1.0)
-        glVertex3f(0.0, -0.2, 1.0)  
 
+        self.state.vx += acc_world[0] * dt
+        self.state.vy += acc_world[1] * dt
+        self.state.vz += acc_world[2] * dt
 
-        glVertex3f(0.0, 0.0, -1.5)
-        glVertex3f(1.0, 0.0, 1.0)
-        glVertex3f(0.0, -0.2, 1.0)
+        self.state.vx *= VEL_DAMPING
+        self.state.vy *= VEL_DAMPING
+        self.state.vz *= VEL_DAMPING
 
+        self.state.x += self.state.vx * dt
+        self.state.y += self.state.vy * dt
+        self.state.z += self.state.vz * dt
+        if self.probe is not None:
+            self.probe.mark("integrate")
 
-        glColor3f(0.6, 0.6, 0.6) 
-        glVertex3f(-1.0, 0.0, 1.0)
-        glVertex3f(1.0, 0.0, 1.0)
-        glVertex3f(0.0, 0.2, 1.0)
+    def _complementary(self, dt):
+        """Euler-angle integration blended with the accel tilt. Caller holds the lock."""
+        roll_acc = math.atan2(self.state.ay_g, self.state.az_g)
+        pitch_acc = math.atan2(-self.state.ax_g, math.sqrt(self.state.ay_g**2 + self.state.az_g**2))
 
-        glVertex3f(-1.0, 0.0, 1.0)
-        glVertex3f(1.0, 0.0, 1.0)
-        glVertex3f(0.0, -0.2, 1.0)
 
-        glEnd()
+        self.state.roll += math.radians(self.state.gx_dps) * dt
+        self.state.pitch += math.radians(self.state.gy_dps) * dt
+        self.state.yaw += math.radians(self.state.gz_dps) * dt
 
-    def main_loop(self):
-        pygame.init()
-        pygame.display.set_mode(self.display_dim, DOUBLEBUF | OPENGL)
-        pygame.display.set_caption("IMU Visualizer | Press SPACE to Reset Position")
 
-        glEnable(GL_DEPTH_TEST)
-        glMatrixMode(GL_PROJECTION)
-        gluPerspective(45, (self.display_dim[0] / self.display_dim[1]), 0.1, 100.0)
-        glMatrixMode(GL_MODELVIEW)
+        self.state.roll = COMP_ALPHA * self.state.roll + (1.0 - COMP_ALPHA) * roll_acc
+        self.state.pitch = COMP_ALPHA * self.state.pitch + (1.0 - COMP_ALPHA) * pitch_acc
         
-        clock = pygame.time.Clock()
-
-        while self.state.running:
- 
-            for event in pygame.event.get():
-                if event.type == QUIT:
-                    self.state.running = False
-                elif event.type == KEYDOWN:
-                    if event.key == K_SPACE:
-                        self.state.reset_position()
-
-      
-            with self.state.lock:
-                roll = self.state.roll
-                pitch = self.state.pitch
-                yaw = self.state.yaw
-                x = self.state.x * POS_SCALE
-                y = self.state.y * POS_SCALE
-                z = self.state.z * POS_SCALE
-
-
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-            glLoadIdentity()
-            
-            glTranslatef(0.0, 0.0, -8.0)
-            
-
-            glTranslatef(x, y, z)
-            
-
-            glRotatef(math.degrees(yaw), 0, 1, 0)   
-            glRotatef(math.degrees(pitch), 1, 0, 0) 
-            glRotatef(math.degrees(roll), 0, 0, 1) 
 
-            self.draw_axis()
-            self.draw_glider()
+        return MathUtils.euler_to_rotation_matrix(self.state.roll, self.state.pitch, self.state.yaw)
 
-            pygame.display.flip()
-            clock.tick(60)
-
-        pygame.quit()
+    async def run(self, source=None):
+        """Feed the pipeline from `source`, the ring over BLE by default."""
+        self.source = source or BLESource()
+        if self.metrics is not None:
+            self.metrics.register_thread("ble")
+        await self.source.run(self)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Open Ring IMU emulator")
+    parser.add_argument("--replay", nargs="+", metavar="CSV",
+                        help="replay recorded sampleN.csv files (globs allowed) instead of BLE")
+    parser.add_argument("--synthetic", type=float, metavar="SECONDS",
+                        help="feed generated motion instead of BLE")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier, 0 = as fast as possible")
+    parser.add_argument("--chunk", type=int, default=1,
+                        help="samples handed over per call")
+    parser.add_argument("--packets", choices=["text", "binary"],
+                        help="encode replayed samples as BLE notifications")
+    parser.add_argument("--fusion", choices=["complementary", "mahony"], default=FUSION_MODE,
+                        help="orientation filter")
+    parser.add_argument("--classify", nargs="?", const=MODEL_PATH, metavar="MODEL",
+                        help="run the gesture forest (rf_model.joblib) on the live stream")
+    parser.add_argument("--debounce", type=int, default=DEBOUNCE,
+                        help="windows that must agree before a gesture is reported")
+    parser.add_argument("--repeat-after", type=int, default=REPEAT_AFTER,
+                        help="windows a reported gesture is held before the same label counts again")
+    parser.add_argument("--scope", action="store_true",
+                        help="live scrolling plot of raw and filtered accel/gyro under the 3D view")
+    parser.add_argument("--fps", type=float, default=60,
+                        help="frame-rate cap for the window, 0 for uncapped")
+    parser.add_argument("--frame-log", type=float, default=5.0, metavar="SECONDS",
+                        help="print the frame-time breakdown this often, 0 for never")
+    parser.add_argument("--record", metavar="DIR",
+                        help="log every raw sample to DIR/session_<time>/ (see recorder.py)")
+    parser.add_argument("--label", metavar="PERSON/GESTURE/SUBJECT",
+                        help="label for recorded segments, toggled with R in the window")
+    parser.add_argument("--rotate-mb", type=float, default=ROTATE_BYTES / 2**20,
+                        help="start a new log part after this many MB")
+    parser.add_argument("--rotate-minutes", type=float, default=ROTATE_SECONDS / 60,
+                        help="start a new log part after this many minutes")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="export per-stage counters and latency histograms here every "
+                             "--metrics-interval (Prometheus text, or JSON lines for *.jsonl); "
+                             "SIGUSR1 dumps a profile of the BLE thread next to it")
+    parser.add_argument("--metrics-port", type=int, nargs="?", const=METRICS_PORT, metavar="PORT",
+                        help=f"serve /metrics, /metrics.json and /profile on localhost (default {METRICS_PORT})")
+    parser.add_argument("--metrics-interval", type=float, default=EXPORT_INTERVAL_S, metavar="SECONDS")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always scan for the ring, and neither apply nor refine its cached calibration")
+    parser.add_argument("--calibrate-as", metavar="KEY",
+                        help="with --replay/--synthetic, apply and refine the calibration cached under KEY")
+    parser.add_argument("--headless", action="store_true",
+                        help="no window, print throughput and latency when done")
+    args = parser.parse_args()
+    FUSION_MODE = args.fusion
+    if args.label and len(args.label.split("/")) != 3:
+        parser.error("--label must be person/gesture/subject")
+
+    source = None
+    replay_opts = dict(speed=args.speed, chunk_size=args.chunk, packet_format=args.packets)
+    if args.replay:
+        paths = [p for pattern in args.replay for p in sorted(glob.glob(pattern))]
+        source = ReplaySource(paths, **replay_opts)
+    elif args.synthetic:
+        source = SyntheticSource(args.synthetic, **replay_opts)
+
     shared_state = SharedState()
-    
 
-    ble_manager = BLEManager(shared_state)
-    ble_thread = threading.Thread(target=lambda: asyncio.run(ble_manager.run()), daemon=True)
+    classifier = None
+    if args.classify:
+        def on_gesture(p):
+            shared_state.gesture = p
+            print(f"Gesture: {p.label} ({p.confidence:.0%}, {p.latency * 1e3:.1f} ms)")
+        classifier = GestureClassifier.load(args.classify, debounce=args.debounce,
+                                            repeat_after=args.repeat_after,
+                                            on_gesture=on_gesture).start()
+
+    recorder = None
+    if args.record:
+        recorder = Recorder(args.record, rotate_bytes=int(args.rotate_mb * 2**20),
+                            rotate_seconds=args.rotate_minutes * 60, label=args.label).start()
+
+    metrics = exporter = None
+    if args.metrics_file or args.metrics_port is not None:
+        metrics = Metrics()
+        exporter = MetricsExporter(metrics, args.metrics_file, args.metrics_port,
+                                   args.metrics_interval).start()
+        exporter.install_signal()
+
+    # The ring's cached calibration is applied from its first sample and
+    # refined whenever it rests; BLESource attaches it to the connected ring
+    device_cache = None if args.no_cache else DeviceCache()
+    calibrator = None
+    if source is None:
+        source = BLESource(cache=device_cache)
+        if device_cache:
+            calibrator = RestCalibrator(device_cache)
+    elif args.calibrate_as:
+        calibrator = RestCalibrator(device_cache)
+        print(f"Calibration: {calibrator.attach(args.calibrate_as).describe()}")
+    if calibrator:
+        calibrator.start()
+
+    ble_manager = BLEManager(shared_state, classifier, recorder, metrics, calibrator)
+
+    if args.headless:
+        if not (args.replay or args.synthetic):
+            parser.error("--headless needs --replay or --synthetic")
+        asyncio.run(ble_manager.run(source))
+        print(source.report())
+        print(ble_manager.stats.report(ble_manager.decoder))
+        if classifier:
+            classifier.stop()
+            print(classifier.report())
+        if recorder:
+            recorder.stop()
+            print(recorder.report())
+        if exporter:
+            exporter.stop()
+            print(metrics.report())
+        if calibrator:
+            calibrator.stop()
+            print(f"Calibration: {calibrator.calibration.describe()}")
+        sys.exit(0)
+
+    ble_thread = threading.Thread(target=lambda: asyncio.run(ble_manager.run(source)), daemon=True)
     ble_thread.start()
 
 
-    viz = Visualizer(shared_state)
+    from visualizer import Visualizer
+
+    scope = None
+    if args.scope:
+        from scope import Scope, default_traces
+        scope = Scope(shared_state.history, default_traces(SENS))
+
+    viz = Visualizer(shared_state, scope, fps=args.fps, log_interval=args.frame_log,
+                     recorder=recorder, metrics=metrics)
     try:
         viz.main_loop()
     except KeyboardInterrupt:
         pass
     finally:
         shared_state.running = False
-        print("Exiting...")
\ No newline at end of file
+        if recorder:
+            recorder.stop()
+            print(recorder.report())
+        if exporter:
+            exporter.stop()
+        if calibrator:
+            calibrator.stop()
+        print("Exiting...")
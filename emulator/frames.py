@@ -0,0 +1,171 @@
+import struct
+import time
+
+import numpy as np
+
+
+# Binary notification layout (little-endian):
+#
+#   header : uint8 magic (0xA5), uint8 frame count
+#   frame  : uint16 seq, uint32 device tick (us), int16 ax, ay, az, gx, gy, gz
+#
+# Text notifications ("ax,ay,az,gx,gy,gz") always start with an ASCII digit
+# or '-', so the magic byte is enough to tell the two formats apart.
+
+FRAME_MAGIC = 0xA5
+HEADER = struct.Struct("<BB")
+FRAME_DTYPE = np.dtype([("seq", "<u2"), ("tick", "<u4"), ("imu", "<i2", (6,))])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+TICK_HZ = 1_000_000
+SAMPLE_RATE_HZ = 100.0
+
+# 247-byte ATT MTU leaves 244 bytes of notification payload
+MAX_FRAMES_PER_PACKET = (244 - HEADER.size) // FRAME_SIZE
+
+
+def is_binary_packet(data) -> bool:
+    return len(data) >= HEADER.size and data[0] == FRAME_MAGIC
+
+
+def encode_packet(imu, seq, ticks) -> bytes:
+    """Pack (n, 6) int16 samples with their sequence numbers and ticks."""
+    frames = np.empty(len(imu), dtype=FRAME_DTYPE)
+    frames["seq"] = np.asarray(seq) & 0xFFFF
+    frames["tick"] = np.asarray(ticks) & 0xFFFFFFFF
+    frames["imu"] = imu
+    return HEADER.pack(FRAME_MAGIC, len(frames)) + frames.tobytes()
+
+
+class FrameDecoder:
+    """Bulk decoder for binary notifications.
+
+    Tracks the sequence number across packets to count dropped frames and
+    unwraps both the 16-bit sequence number and the 32-bit device tick into
+    monotonic int64 counters.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.last_seq = None
+        self.last_seq_unwrapped = None
+        self.last_tick_raw = None
+        self.last_tick = None
+        self.frames = 0
+        self.dropped = 0
+        self.bad_packets = 0
+
+    def decode(self, data):
+        """Return (samples, ticks, seq) for one packet.
+
+        samples is an (n, 6) float array, ticks and seq are the n unwrapped
+        device ticks and sequence numbers.
+        """
+        magic, count = HEADER.unpack_from(data)
+        if magic != FRAME_MAGIC or len(data) != HEADER.size + count * FRAME_SIZE:
+            self.bad_packets += 1
+            count = 0
+
+        frames = np.frombuffer(data, dtype=FRAME_DTYPE, count=count, offset=HEADER.size)
+        if count == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return np.empty((0, 6)), empty, empty
+
+        # Frames arrive in order, so loss is whatever the sequence span
+        # covers beyond the frames we got. Huge spans are duplicates or
+        # reordering, not loss.
+        first_seq, last_seq = int(frames["seq"][0]), int(frames["seq"][-1])
+        prev = first_seq - 1 if self.last_seq is None else self.last_seq
+        span = (last_seq - prev) & 0xFFFF
+        if count <= span < 0x8000:
+            self.dropped += span - count
+        self.last_seq = last_seq
+
+        seq_raw = frames["seq"].astype(np.int64)
+        if self.last_seq_unwrapped is None:
+            self.last_seq_unwrapped = prev
+        seq = self.last_seq_unwrapped + ((seq_raw - prev) & 0xFFFF)
+        self.last_seq_unwrapped = int(seq[-1])
+
+        tick_raw = frames["tick"].astype(np.int64)
+        if self.last_tick is None:
+            self.last_tick_raw = self.last_tick = int(tick_raw[0])
+        ticks = self.last_tick + ((tick_raw - self.last_tick_raw) & 0xFFFFFFFF)
+        self.last_tick_raw = int(tick_raw[-1])
+        self.last_tick = int(ticks[-1])
+
+        self.frames += count
+        return frames["imu"].astype(float), ticks, seq
+
+
+class PacketGenerator:
+    """Stand-in for the ring: turns (n, 6) samples into binary notifications.
+
+    drop_rate randomly removes frames before packing so the decoder's loss
+    accounting can be checked against `dropped`.
+    """
+
+    def __init__(self, imu, frames_per_packet=MAX_FRAMES_PER_PACKET,
+                 rate_hz=SAMPLE_RATE_HZ, drop_rate=0.0, seed=0, start_tick=0):
+        self.imu = np.clip(np.asarray(imu), -32768, 32767).astype(np.int16)
+        self.frames_per_packet = frames_per_packet
+        self.rate_hz = rate_hz
+        self.drop_rate = drop_rate
+        self.rng = np.random.default_rng(seed)
+        self.start_tick = start_tick
+        self.dropped = 0
+
+    def packets(self):
+        n = len(self.imu)
+        seq = np.arange(n)
+        ticks = self.start_tick + np.round(seq * TICK_HZ / self.rate_hz).astype(np.int64)
+
+        keep = self.rng.random(n) >= self.drop_rate
+        self.dropped = int(n - keep.sum())
+        idx = np.flatnonzero(keep)
+
+        for start in range(0, len(idx), self.frames_per_packet):
+            sel = idx[start:start + self.frames_per_packet]
+            yield encode_packet(self.imu[sel], seq[sel], ticks[sel])
+
+
+def synthetic_imu(n, rate_hz=SAMPLE_RATE_HZ, seed=0):
+    """Raw int16-range IMU samples: gravity on Z plus slow motion and noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / rate_hz
+    imu = np.empty((n, 6))
+    imu[:, 0] = 2000 * np.sin(2 * np.pi * 0.5 * t)
+    imu[:, 1] = 1500 * np.sin(2 * np.pi * 0.3 * t)
+    imu[:, 2] = -16384 + 500 * np.cos(2 * np.pi * 0.2 * t)
+    imu[:, 3:] = 1000 * np.sin(2 * np.pi * np.array([0.7, 0.4, 0.9]) * t[:, None])
+    imu += rng.normal(0, 50, imu.shape)
+    return np.round(imu)
+
+
+def main():
+    n = 200_000
+    imu = synthetic_imu(n)
+
+    gen = PacketGenerator(imu, drop_rate=0.01)
+    packets = list(gen.packets())
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    for p in packets:
+        decoder.decode(p)
+    elapsed = time.perf_counter() - start
+    print(f"[binary] {decoder.frames} frames in {len(packets)} packets, "
+          f"{decoder.frames / elapsed:,.0f} samples/s")
+    print(f"[binary] dropped: generated {gen.dropped}, detected {decoder.dropped}")
+
+    texts = [("%d,%d,%d,%d,%d,%d" % tuple(row)).encode() for row in imu.astype(int)]
+    start = time.perf_counter()
+    for t in texts:
+        [float(x) for x in t.decode("utf-8", errors='ignore').strip().split(",")]
+    elapsed = time.perf_counter() - start
+    print(f"[text]   {len(texts)} notifications, {len(texts) / elapsed:,.0f} samples/s")
+
+
+if __name__ == "__main__":
+    main()
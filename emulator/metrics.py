@@ -0,0 +1,361 @@
+import bisect
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Upper edges of every latency histogram in microseconds; the last bin
+# collects everything above the final edge.
+LATENCY_EDGES_US = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000]
+LATENCY_EDGES_S = [e * 1e-6 for e in LATENCY_EDGES_US]
+
+EXPORT_INTERVAL_S = 5.0
+METRICS_PORT = 9108
+METRICS_PREFIX = "open_ring"
+
+PROFILE_SECONDS = 5.0
+PROFILE_INTERVAL_S = 0.001
+# Interpreter switch interval while profiling (default 5 ms). It has to be
+# well below one BLE batch (~50 us), or samples pile up in lfilter again:
+# at 20 us lfilter already takes 85-90% of them against ~70% at 1-10 us.
+# The setting is process-wide. It costs little CPU, but threads contending
+# for the GIL trade it far more often; next to a busy pipeline thread a
+# pure-Python thread (the renderer) ran ~30% slower while profiling.
+PROFILE_SWITCH_INTERVAL_S = 10e-6
+
+# The switch interval is global, so only one profile() runs at a time
+_profile_lock = threading.Lock()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; observe() is a bisect and three adds."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_EDGES_S) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_right(LATENCY_EDGES_S, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper edge of the bucket holding the q-th observation, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for edge, c in zip(LATENCY_EDGES_S + [float("inf")], self.counts):
+            seen += c
+            if seen >= rank:
+                return edge
+        return float("inf")
+
+
+class StageProbe:
+    """Per-stage timer feeding <prefix>.<stage> histograms.
+
+    Used like FrameStats: begin(), then mark(stage) as each stage ends,
+    one perf_counter() per mark; end(name) records the time since begin().
+    """
+
+    __slots__ = ("metrics", "prefix", "hists", "start", "last")
+
+    def __init__(self, metrics, prefix):
+        self.metrics = metrics
+        self.prefix = prefix
+        self.hists = {}
+        self.start = self.last = time.perf_counter()
+
+    def _hist(self, stage):
+        h = self.hists[stage] = self.metrics.histogram(f"{self.prefix}.{stage}")
+        return h
+
+    def begin(self):
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        (self.hists.get(stage) or self._hist(stage)).observe(now - self.last)
+        self.last = now
+
+    def end(self, name="total"):
+        now = time.perf_counter()
+        (self.hists.get(name) or self._hist(name)).observe(now - self.start)
+        self.last = now
+
+
+class Metrics:
+    """Counters, latency histograms and gauges for the live pipeline.
+
+    Everything is recorded on the thread doing the work, with no locks:
+    each counter and histogram has a single writer, and exporters only
+    read. Gauges are callables evaluated at export time, so figures the
+    pipeline keeps anyway (PipelineStats, decoder loss, recorder drops)
+    cost nothing per sample. Pipelines built without a Metrics skip
+    every hook on an `is not None` test.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.threads = {}       # name -> thread ident, for profile()
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def histogram(self, name):
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        return h
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def gauge(self, name, fn):
+        self.gauges[name] = fn
+
+    def probe(self, prefix):
+        return StageProbe(self, prefix)
+
+    def register_thread(self, name):
+        """Make the calling thread available to profile(name)."""
+        self.threads[name] = threading.get_ident()
+
+    # ---------------------------------------------------------------- #
+    # Export
+
+    def _gauge_values(self):
+        values = {}
+        for name, fn in list(self.gauges.items()):
+            try:
+                values[name] = float(fn())
+            except Exception:
+                pass
+        return values
+
+    def snapshot(self):
+        """Plain dict of every figure; histogram times in seconds."""
+        return dict(
+            time=time.time(),
+            uptime_s=time.time() - self.started,
+            counters=dict(self.counters),
+            gauges=self._gauge_values(),
+            histograms={name: dict(count=h.count, sum=h.sum, counts=list(h.counts))
+                        for name, h in list(self.histograms.items())},
+            edges_s=LATENCY_EDGES_S,
+        )
+
+    def prometheus(self):
+        """Prometheus text exposition format."""
+        def metric(name):
+            return METRICS_PREFIX + "_" + name.replace(".", "_").replace("-", "_")
+
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {metric(name)}_total counter", f"{metric(name)}_total {value}"]
+        for name, value in sorted(self._gauge_values().items()):
+            lines += [f"# TYPE {metric(name)} gauge", f"{metric(name)} {value:g}"]
+        for name, h in sorted(self.histograms.items()):
+            m = metric(name) + "_seconds"
+            lines.append(f"# TYPE {m} histogram")
+            cumulative = 0
+            for edge, c in zip(LATENCY_EDGES_S, h.counts):
+                cumulative += c
+                lines.append(f'{m}_bucket{{le="{edge:g}"}} {cumulative}')
+            lines.append(f'{m}_bucket{{le="+Inf"}} {h.count}')
+            lines += [f"{m}_sum {h.sum:.9g}", f"{m}_count {h.count}"]
+        return "\n".join(lines) + "\n"
+
+    def report(self):
+        """One line per histogram: count, mean and bucketed p50/p99, in microseconds."""
+        lines = []
+        for name, h in sorted(self.histograms.items()):
+            if h.count:
+                lines.append(f"{name:24s} n={h.count:<8d} mean {h.sum / h.count * 1e6:8.1f} us  "
+                             f"p50 <={h.quantile(0.5) * 1e6:g} us  p99 <={h.quantile(0.99) * 1e6:g} us")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:24s} {value}")
+        return "\n".join(lines)
+
+    # ---------------------------------------------------------------- #
+    # Sampling profiler
+
+    def profile(self, thread="ble", seconds=PROFILE_SECONDS, interval=PROFILE_INTERVAL_S):
+        """Sample a registered thread's Python stack every `interval` seconds.
+
+        Returns folded stacks ("outer;...;inner count" per line, for
+        flamegraph.pl or speedscope) after a header with the functions
+        most often on top of the stack. Runs on the calling thread; the
+        sampled thread only loses the GIL for one sys._current_frames()
+        per sample, plus the shorter switch interval while it runs
+        (PROFILE_SWITCH_INTERVAL_S). Concurrent calls wait for each other.
+        """
+        ident = self.threads.get(thread)
+        if ident is None:
+            raise KeyError(f"no thread registered as '{thread}' (have {list(self.threads)})")
+        stacks = Counter()
+        samples = 0
+        # The sampler only runs once it holds the GIL. With the default 5 ms
+        # switch interval it would nearly always get it from a C call that
+        # releases the GIL (lfilter, I/O), and every sample would land there;
+        # a short interval makes the interpreter hand it over mid-bytecode.
+        with _profile_lock:
+            switch = sys.getswitchinterval()
+            sys.setswitchinterval(min(switch, PROFILE_SWITCH_INTERVAL_S))
+            try:
+                end = time.perf_counter() + seconds
+                while time.perf_counter() < end:
+                    frame = sys._current_frames().get(ident)
+                    if frame is None:
+                        break
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    stacks[";".join(reversed(stack))] += 1
+                    samples += 1
+                    time.sleep(interval)
+            finally:
+                sys.setswitchinterval(switch)
+
+        leaves = Counter()
+        for stack, n in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += n
+        lines = [f"# {samples} samples of thread '{thread}' every {interval * 1e3:g} ms"]
+        lines += [f"# {n / samples:6.1%}  {leaf}" for leaf, n in leaves.most_common(15)]
+        lines += [f"{stack} {n}" for stack, n in stacks.most_common()]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Periodic file export and an optional local HTTP endpoint.
+
+    path ending in .jsonl appends one snapshot per interval; any other
+    path is rewritten atomically in Prometheus text format (for a
+    node_exporter textfile collector). The HTTP server, bound to
+    localhost, serves /metrics, /metrics.json and
+    /profile?thread=ble&seconds=5.
+    """
+
+    def __init__(self, metrics, path=None, port=None, interval=EXPORT_INTERVAL_S, host="127.0.0.1"):
+        self.metrics = metrics
+        self.path = path
+        self.port = port
+        self.host = host
+        self.interval = interval
+        self.stopping = threading.Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        if self.path:
+            self.thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+            self.thread.start()
+        if self.port is not None:
+            self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"Metrics on http://{self.host}:{self.server.server_address[1]}/metrics")
+        return self
+
+    def write(self):
+        if self.path.endswith(".jsonl"):
+            with open(self.path, "a") as f:
+                f.write(json.dumps(self.metrics.snapshot()) + "\n")
+        else:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(self.metrics.prometheus())
+            os.replace(tmp, self.path)
+
+    def _run(self):
+        failing = False
+        while not self.stopping.wait(self.interval):
+            # A full disk, a removed folder or a snapshot tripping over
+            # live data must not end exporting for the session
+            try:
+                self.write()
+            except Exception as e:
+                if not failing:
+                    print(f"Metrics export to {self.path} failed: {e}")
+                failing = True
+                continue
+            if failing:
+                print(f"Metrics export to {self.path} resumed")
+            failing = False
+
+    def dump_profile(self, thread="ble", seconds=PROFILE_SECONDS):
+        """Profile `thread` in the background into profile_<thread>_<time>.folded."""
+        folder = os.path.dirname(os.path.abspath(self.path)) if self.path else os.getcwd()
+        out = os.path.join(folder, time.strftime(f"profile_{thread}_%Y%m%d_%H%M%S.folded"))
+
+        def run():
+            text = self.metrics.profile(thread, seconds)
+            with open(out, "w") as f:
+                f.write(text)
+            print(f"Profile of '{thread}' -> {out}")
+        threading.Thread(target=run, name="metrics-profile", daemon=True).start()
+
+    def install_signal(self, signum=getattr(signal, "SIGUSR1", None)):
+        """Dump a BLE-thread profile when the process receives signum (SIGUSR1)."""
+        if signum is not None:
+            signal.signal(signum, lambda *_: self.dump_profile())
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            try:
+                self.write()
+            except Exception as e:
+                print(f"Metrics export to {self.path} failed: {e}")
+        if self.server is not None:
+            self.server.shutdown()
+
+    def _handler(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                try:
+                    if url.path == "/metrics":
+                        body, kind = metrics.prometheus(), "text/plain; version=0.0.4"
+                    elif url.path == "/metrics.json":
+                        body, kind = json.dumps(metrics.snapshot()), "application/json"
+                    elif url.path == "/profile":
+                        body = metrics.profile(query.get("thread", "ble"),
+                                               float(query.get("seconds", PROFILE_SECONDS)))
+                        kind = "text/plain"
+                    else:
+                        self.send_error(404)
+                        return
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
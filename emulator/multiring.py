@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import time
+from collections import deque
+
+import numpy as np
+
+from emulator import BLEManager, SharedState
+from frames import MAX_FRAMES_PER_PACKET, SAMPLE_RATE_HZ, PacketGenerator, is_binary_packet, synthetic_imu
+from sources import CHAR_UUID, DEVICE_NAME, STATS_INTERVAL
+
+
+# Notifications queued per ring before the oldest are dropped
+QUEUE_LIMIT = 256
+
+# Samples each ring may process per scheduling round (deficit round robin).
+# A round never takes much longer than rings x QUANTUM samples of fusion,
+# however many notifications one ring has queued.
+QUANTUM = 32
+
+SCAN_TIMEOUT = 5.0
+RECONNECT_DELAY = 2.0
+
+# BlueZ handles one connection attempt at a time; more fail with
+# "Operation already in progress"
+CONNECT_CONCURRENCY = 1
+
+# Speed of --greedy simulated rings: 100 kHz, more than one core fuses
+GREEDY_SPEED = 1000.0
+
+
+def packet_samples(data):
+    """Samples carried by one notification: the frame count of a binary packet, else 1."""
+    return data[1] if is_binary_packet(data) else 1
+
+
+class Ring:
+    """One device's pipeline: its own SharedState, BLEManager and queue.
+
+    The BLE callback only timestamps and queues the notification; decoding
+    and fusion happen when the manager's scheduler serves this ring, so
+    the callback costs the same however busy the pipeline is.
+    """
+
+    def __init__(self, address, name=None, queue_limit=QUEUE_LIMIT):
+        self.address = address
+        self.name = name or address
+        self.state = SharedState()
+        self.manager = BLEManager(self.state)
+        self.queue = deque()
+        self.queue_limit = queue_limit
+        self.deficit = 0
+        self.wakeup = None          # the manager's asyncio.Event
+        self.connected = False
+
+        self.received = 0           # notifications
+        self.overflow = 0           # notifications dropped from a full queue
+        self.max_queue = 0
+        self.samples = 0            # samples decoded and fused
+        self.busy = 0.0             # seconds spent doing so
+
+    def enqueue(self, sender, data):
+        """Notification callback; runs on the event loop."""
+        if len(self.queue) >= self.queue_limit:
+            self.queue.popleft()
+            self.overflow += 1
+        self.queue.append((time.time(), bytes(data)))
+        self.received += 1
+        self.max_queue = max(self.max_queue, len(self.queue))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def service(self, quantum=QUANTUM):
+        """Process queued notifications worth up to this round's quantum of samples."""
+        self.deficit += quantum
+        start = time.perf_counter()
+        n = 0
+        while self.queue:
+            arrival, data = self.queue[0]
+            cost = packet_samples(data)
+            if cost > self.deficit:
+                break
+            self.queue.popleft()
+            self.deficit -= cost
+            self.manager.notification_handler(None, data, arrival)
+            n += cost
+        if not self.queue:
+            # An idle ring does not bank credit for a later burst
+            self.deficit = 0
+        self.busy += time.perf_counter() - start
+        self.samples += n
+        return n
+
+    def snapshot(self):
+        s = self.manager.stats.snapshot(self.manager.decoder)
+        s.update(name=self.name, received=self.received, overflow=self.overflow,
+                 max_queue=self.max_queue, fused=self.samples, busy_s=self.busy,
+                 connected=self.connected)
+        return s
+
+    def report(self):
+        s = self.snapshot()
+        line = (f"{self.name}: {s['sample_rate_hz']:6.1f} Hz, {self.samples} samples, "
+                f"busy {self.busy:.2f} s, queue max {self.max_queue}, overflow {self.overflow}")
+        if "processing_ms_p50" in s:
+            line += f", arrival->fused p50 {s['processing_ms_p50']:.2f} ms p99 {s['processing_ms_p99']:.2f} ms"
+        if "loss" in s:
+            line += f", loss {s['loss']:.2%}"
+        return line
+
+
+class RingManager:
+    """Many rings in one asyncio loop, served fairly by one scheduler."""
+
+    def __init__(self, quantum=QUANTUM, queue_limit=QUEUE_LIMIT):
+        self.quantum = quantum
+        self.queue_limit = queue_limit
+        self.rings = {}
+        self.running = True
+        self.wakeup = asyncio.Event()
+
+    def add(self, address, name=None):
+        ring = Ring(address, name, self.queue_limit)
+        ring.wakeup = self.wakeup
+        self.rings[address] = ring
+        return ring
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    async def schedule(self):
+        """Serve every ring with queued data once per round, then yield to the loop.
+
+        Yielding between rounds lets notification callbacks and the
+        connection tasks run; per-round quanta keep a ring that floods the
+        queue from delaying the others by more than its share.
+        """
+        while self.running:
+            served = False
+            for ring in list(self.rings.values()):
+                if ring.queue:
+                    ring.service(self.quantum)
+                    served = True
+            if served:
+                await asyncio.sleep(0)
+                continue
+            self.wakeup.clear()
+            if not any(r.queue for r in self.rings.values()):
+                await self.wakeup.wait()
+
+    def report(self):
+        return "\n".join(ring.report() for ring in self.rings.values())
+
+    async def report_loop(self, interval=STATS_INTERVAL):
+        while self.running and interval:
+            await asyncio.sleep(interval)
+            print(self.report())
+
+    # -------------------------------------------------------------- #
+    # BLE
+
+    async def discover(self, device_name=DEVICE_NAME, timeout=SCAN_TIMEOUT, limit=None):
+        """Scan once and add every device whose name contains device_name."""
+        from bleak import BleakScanner
+
+        print(f"Scanning {timeout:.0f} s for devices with name containing: '{device_name}'...")
+        devices = await BleakScanner.discover(timeout=timeout)
+        found = [d for d in devices if d.name and device_name in d.name][:limit]
+        for d in found:
+            self.add(d.address, d.name)
+        print(f"Found {len(found)}: {', '.join(d.name for d in found) or '-'}")
+        return found
+
+    async def hold(self, ring, connect_lock, char_uuid=CHAR_UUID):
+        """Keep one ring connected and subscribed, reconnecting after drops."""
+        from bleak import BleakClient
+
+        while self.running:
+            try:
+                async with connect_lock:
+                    client = BleakClient(ring.address)
+                    await client.connect()
+                try:
+                    await client.start_notify(char_uuid, ring.enqueue)
+                    ring.connected = True
+                    print(f"{ring.name}: connected")
+                    while self.running and client.is_connected:
+                        await asyncio.sleep(0.5)
+                    if client.is_connected:
+                        await client.stop_notify(char_uuid)
+                finally:
+                    ring.connected = False
+                    await client.disconnect()
+            except Exception as e:
+                print(f"{ring.name}: Bluetooth Error: {e}")
+            if self.running:
+                print(f"{ring.name}: disconnected, retrying in {RECONNECT_DELAY:.0f} s")
+                await asyncio.sleep(RECONNECT_DELAY)
+
+    async def run_ble(self, addresses=None, device_name=DEVICE_NAME, limit=None):
+        """Connect to the given addresses, or to every matching device found."""
+        if addresses:
+            for address in addresses:
+                self.add(address)
+        else:
+            await self.discover(device_name, limit=limit)
+        if not self.rings:
+            print("No devices. Please ensure they are powered on.")
+            return
+
+        connect_lock = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        await asyncio.gather(self.schedule(), self.report_loop(),
+                             *(self.hold(r, connect_lock) for r in self.rings.values()))
+
+
+# ------------------------------------------------------------------ #
+# Simulated rings
+
+def simulated_packets(seconds, rate_hz=SAMPLE_RATE_HZ, speed=1.0,
+                      frames_per_packet=MAX_FRAMES_PER_PACKET, seed=0):
+    """Binary notifications for `seconds` of a ring sending at rate_hz * speed."""
+    imu = synthetic_imu(int(seconds * rate_hz * speed) + frames_per_packet, rate_hz, seed)
+    return list(PacketGenerator(imu, frames_per_packet, rate_hz).packets())
+
+
+async def simulate_ring(manager, ring, packets, seconds, rate_hz=SAMPLE_RATE_HZ, speed=1.0):
+    """Deliver pre-encoded packets into ring at rate_hz * speed samples per second."""
+    period = packet_samples(packets[0]) / (rate_hz * speed)
+    ring.connected = True
+    sent = 0
+    start = time.perf_counter()
+    while manager.running and sent < len(packets):
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        # Everything due by now goes out at once, like the notifications
+        # that pile up over a BLE connection interval
+        due = min(len(packets), int(elapsed / period) + 1)
+        while sent < due:
+            ring.enqueue(None, packets[sent])
+            sent += 1
+        await asyncio.sleep(max(start + sent * period - time.perf_counter(), 0))
+    ring.connected = False
+
+
+async def run_simulation(n_rings, seconds, speed=1.0, greedy=0, quantum=QUANTUM,
+                         frames_per_packet=MAX_FRAMES_PER_PACKET, greedy_speed=GREEDY_SPEED):
+    """n_rings rings at speed plus `greedy` ones at greedy_speed; returns the manager."""
+    manager = RingManager(quantum)
+    tasks = []
+    for i in range(n_rings + greedy):
+        is_greedy = i >= n_rings
+        ring = manager.add(f"sim-{i:02d}{'-greedy' if is_greedy else ''}")
+        ring_speed = greedy_speed if is_greedy else speed
+        # Encoded up front so generating them does not stall the loop
+        packets = simulated_packets(seconds, speed=ring_speed, frames_per_packet=frames_per_packet, seed=i)
+        tasks.append(simulate_ring(manager, ring, packets, seconds, speed=ring_speed))
+
+    scheduler = asyncio.ensure_future(manager.schedule())
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    manager.elapsed = time.perf_counter() - start
+    manager.stop()
+    await scheduler
+    return manager
+
+
+def scaling_table(counts, seconds, speed, greedy=0, quantum=QUANTUM, greedy_speed=GREEDY_SPEED):
+    lines = [f"{'rings':>5s} {'offered Hz':>11s} {'fused Hz':>10s} {'per ring min/max':>17s} "
+             f"{'p50 ms':>7s} {'p99 ms':>7s} {'overflow':>8s}"]
+    for n in counts:
+        manager = asyncio.run(run_simulation(n, seconds, speed, greedy, quantum,
+                                                 greedy_speed=greedy_speed))
+        paced = [r for r in manager.rings.values() if "greedy" not in r.name]
+        rates = np.array([r.samples for r in paced]) / manager.elapsed
+        total = sum(r.samples for r in manager.rings.values()) / manager.elapsed
+        lat = np.concatenate([np.array(r.manager.stats.processing) for r in paced]) * 1e3
+        overflow = sum(r.overflow for r in manager.rings.values())
+        offered = n * SAMPLE_RATE_HZ * speed
+        lines.append(f"{n:5d} {offered:11,.0f} {total:10,.0f} {rates.min():8,.0f}/{rates.max():<8,.0f} "
+                     f"{np.percentile(lat, 50):7.2f} {np.percentile(lat, 99):7.2f} {overflow:8d}")
+        if greedy:
+            lines.extend("      " + r.report() for r in manager.rings.values() if "greedy" in r.name)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hold many rings at once in one asyncio loop")
+    parser.add_argument("--address", nargs="+", help="connect to these addresses instead of scanning")
+    parser.add_argument("--name", default=DEVICE_NAME, help="device name substring to scan for")
+    parser.add_argument("--limit", type=int, help="connect to at most this many rings")
+    parser.add_argument("--quantum", type=int, default=QUANTUM,
+                        help="samples per ring per scheduling round")
+    parser.add_argument("--simulate", type=int, nargs="+", metavar="N",
+                        help="instead of BLE, run N simulated rings (several N: a scaling table)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="simulation length")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="simulated rings send at 100 Hz x speed")
+    parser.add_argument("--greedy", type=int, default=0,
+                        help="extra simulated rings flooding the loop at --greedy-speed")
+    parser.add_argument("--greedy-speed", type=float, default=GREEDY_SPEED,
+                        help=f"greedy rings send at 100 Hz x this (default {GREEDY_SPEED:.0f})")
+    args = parser.parse_args()
+
+    if args.simulate:
+        print(f"Simulated rings at {SAMPLE_RATE_HZ * args.speed:.0f} Hz, "
+              f"{MAX_FRAMES_PER_PACKET} frames per notification, {args.seconds:.0f} s each"
+              + (f", plus {args.greedy} at {SAMPLE_RATE_HZ * args.greedy_speed:,.0f} Hz" if args.greedy else ""))
+        print(scaling_table(args.simulate, args.seconds, args.speed, args.greedy, args.quantum,
+                            args.greedy_speed))
+        return
+
+    manager = RingManager(args.quantum)
+    try:
+        asyncio.run(manager.run_ble(args.address, args.name, args.limit))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(manager.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.signal import lfilter
+
+import emulator
+from emulator import (ACCEL_DEADBAND, COMP_ALPHA, GRAVITY, HISTORY_COLUMNS, LPF_ALPHA, MAX_DT,
+                      NOMINAL_DT, SENS, TICK_HZ, VEL_DAMPING, BLEManager, SharedState)
+from filters import low_pass_filter, stack_recordings
+from fusion import fuse_batch, quaternion_to_euler, quaternion_to_rotation_matrix
+from dataset import DATA_ROOT, Dataset
+from recorder import read_session
+from sources import load_recording
+
+
+# One pipeline configuration; the rest of the pipeline is fixed
+Params = namedtuple("Params", ["lpf_alpha", "comp_alpha", "vel_damping"])
+DEFAULT_PARAMS = Params(LPF_ALPHA, COMP_ALPHA, VEL_DAMPING)
+
+# Filtered signals and fused pose, as in the emulator history
+OUTPUT_COLUMNS = HISTORY_COLUMNS[7:]
+OUTPUT_DTYPE = "float32"
+
+# Recordings per worker task
+CHUNK_SIZE = 32
+
+# Largest batch/stream difference --verify accepts, relative to each
+# column's range (at least 1)
+VERIFY_TOLERANCE = 1e-13
+
+
+def integration_dt(ticks=None, n=0):
+    """Per-sample dt exactly as BLEManager.process_samples derives it.
+
+    Without ticks the samples are NOMINAL_DT apart, computed through the
+    same nominal tick arithmetic as the live path so the two agree to the
+    last bit.
+    """
+    period = TICK_HZ * NOMINAL_DT
+    ticks = period * np.arange(n) if ticks is None else np.asarray(ticks, dtype=float)
+    if len(ticks) == 0:
+        return np.empty(0)
+    prev = np.concatenate([[ticks[0] - period], ticks[:-1]])
+    dt = (ticks - prev) / TICK_HZ
+    dt[(dt <= 0) | (dt > MAX_DT)] = NOMINAL_DT
+    return dt
+
+
+def _rotation_matrix(roll, pitch, yaw):
+    """MathUtils.euler_to_rotation_matrix over arrays."""
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    return [
+        [cy * cp,  cy * sp * sr - sy * cr,  cy * sp * cr + sy * sr],
+        [sy * cp,  sy * sp * sr + cy * cr,  sy * sp * cr - cy * sr],
+        [-sp,      cp * sr,                cp * cr]
+    ]
+
+
+def _orientation(f, dt, comp_alpha, fusion):
+    """(roll, pitch, yaw, R) for filtered (k, n, 6) g / deg/s samples."""
+    if fusion == "mahony":
+        # Already in g and deg/s, so unit sensitivities
+        q = fuse_batch(f, dt, accel_sens=1.0, gyro_sens=1.0)
+        roll, pitch, yaw = quaternion_to_euler(q)
+        return roll, pitch, yaw, quaternion_to_rotation_matrix(np.moveaxis(q, -1, 0))
+
+    ax, ay, az, gx, gy, gz = np.moveaxis(f, -1, 0)
+    roll_acc = np.arctan2(ay, az)
+    pitch_acc = np.arctan2(-ax, np.sqrt(ay**2 + az**2))
+    # angle[t] = a * (angle[t-1] + gyro * dt) + (1 - a) * accel_angle: first order
+    # linear recursions, so lfilter runs them along the whole time axis.
+    # angle[-1] is the first sample's tilt, as BLEManager._seed_tilt sets it.
+    a = comp_alpha
+    recursion = ([1.0], [1.0, -a])
+    roll, _ = lfilter(*recursion, a * (np.radians(gx) * dt) + (1.0 - a) * roll_acc, axis=-1,
+                      zi=a * roll_acc[..., :1])
+    pitch, _ = lfilter(*recursion, a * (np.radians(gy) * dt) + (1.0 - a) * pitch_acc, axis=-1,
+                       zi=a * pitch_acc[..., :1])
+    yaw = np.cumsum(np.radians(gz) * dt, axis=-1)
+    return roll, pitch, yaw, _rotation_matrix(roll, pitch, yaw)
+
+
+def _position(f, R, dt, vel_damping):
+    """x, y, z (k, n) from gravity-removed, deadbanded, damped integration."""
+    acc_local = [f[..., 0] * GRAVITY, f[..., 1] * GRAVITY, f[..., 2] * GRAVITY]
+    acc_world = [R[i][0] * acc_local[0] + R[i][1] * acc_local[1] + R[i][2] * acc_local[2]
+                 for i in range(3)]
+    acc_world[2] = acc_world[2] - GRAVITY
+
+    position = []
+    for acc in acc_world:
+        acc = np.where(np.abs(acc) < ACCEL_DEADBAND, 0.0, acc)
+        # v[t] = d * (v[t-1] + acc * dt)
+        v = lfilter([vel_damping], [1.0, -vel_damping], acc * dt, axis=-1)
+        position.append(np.cumsum(v * dt, axis=-1))
+    return position
+
+
+def replay(raw, dt=None, params=(DEFAULT_PARAMS,), fusion="complementary", calibration=None):
+    """The emulator's physics over whole (n, 6) or (k, n, 6) raw recordings.
+
+    dt is per sample, (n,) or (k, n); nominal by default. calibration is
+    an optional calibration.Calibration applied to the raw counts. Returns
+    (len(params), [k,] n, 12) arrays of OUTPUT_COLUMNS, equal to what
+    fresh BLEManagers would have put in their history. Stages are shared
+    between parameter sets: the LPF runs once per lpf_alpha and the
+    orientation once per (lpf_alpha, comp_alpha).
+    """
+    raw = np.asarray(raw, dtype=float)
+    stack = raw[None] if raw.ndim == 2 else raw
+    k, n, _ = stack.shape
+    dt = integration_dt(n=n) if dt is None else np.asarray(dt, dtype=float)
+    dt = np.broadcast_to(dt, (k, n))
+
+    out = np.empty((len(params), k, n, len(OUTPUT_COLUMNS)))
+    if n == 0:
+        return out[:, 0] if raw.ndim == 2 else out
+
+    scaled = (stack if calibration is None else calibration.apply(stack)) / SENS
+    filtered, oriented = {}, {}
+    for p, prm in enumerate(params):
+        if prm.lpf_alpha not in filtered:
+            filtered[prm.lpf_alpha] = low_pass_filter(scaled, prm.lpf_alpha, axis=1)
+        f = filtered[prm.lpf_alpha]
+        key = (prm.lpf_alpha, prm.comp_alpha if fusion == "complementary" else None)
+        if key not in oriented:
+            oriented[key] = _orientation(f, dt, prm.comp_alpha, fusion)
+        roll, pitch, yaw, R = oriented[key]
+
+        out[p, ..., :6] = f
+        out[p, ..., 6], out[p, ..., 7], out[p, ..., 8] = roll, pitch, yaw
+        for c, axis in enumerate(_position(f, R, dt, prm.vel_damping)):
+            out[p, ..., 9 + c] = axis
+
+    return out[:, 0] if raw.ndim == 2 else out
+
+
+def replay_recordings(recordings, ticks=None, **kwargs):
+    """replay() over recordings of different lengths.
+
+    ticks is None or one device-tick array (or None) per recording.
+    Returns [params][recording] -> (n_i, 12).
+    """
+    stack, lengths = stack_recordings(recordings)
+    ticks = ticks or [None] * len(recordings)
+    dt = np.full(stack.shape[:2], NOMINAL_DT)
+    for i, (n, t) in enumerate(zip(lengths, ticks)):
+        dt[i, :n] = integration_dt(t, n)
+    out = replay(stack, dt, **kwargs)
+    return [[out[p, i, :n] for i, n in enumerate(lengths)] for p in range(len(out))]
+
+
+# ------------------------------------------------------------------ #
+# Sources: dataset indices, sampleN.csv paths or recorder sessions
+
+_dataset = None
+
+
+def load_source(source, root=DATA_ROOT):
+    """(raw (n, 6), device ticks or None)."""
+    global _dataset
+    if isinstance(source, str):
+        if os.path.isdir(source):
+            records = read_session(source)
+            return np.asarray(records["imu"], dtype=float), np.asarray(records["tick"])
+        return load_recording(source), None
+    if _dataset is None or _dataset.root != root:
+        _dataset = Dataset(root)
+    return np.asarray(_dataset[source], dtype=float), None
+
+
+def _stream(raw, ticks, params, fusion, chunk_sizes):
+    """Run one recording through a fresh BLEManager in uneven batches."""
+    emulator.COMP_ALPHA, emulator.VEL_DAMPING = params.comp_alpha, params.vel_damping
+    emulator.FUSION_MODE = fusion
+    manager = BLEManager(SharedState())
+    manager.lpf.alpha = params.lpf_alpha
+    rows = []
+    start = 0
+    for size in itertools.cycle(chunk_sizes):
+        if start >= len(raw):
+            break
+        batch = raw[start:start + size]
+        manager.process_samples(batch, None if ticks is None else ticks[start:start + size])
+        rows.append(manager.state.history.latest(len(batch))[:, 7:].copy())
+        start += size
+    return np.concatenate(rows) if rows else np.empty((0, len(OUTPUT_COLUMNS)))
+
+
+def verify(sources, params, fusion="complementary", root=DATA_ROOT):
+    """Largest relative batch/stream difference over sources and params."""
+    defaults = (emulator.COMP_ALPHA, emulator.VEL_DAMPING, emulator.FUSION_MODE)
+    loaded = [load_source(s, root) for s in sources]
+    recordings, ticks = [r for r, _ in loaded], [t for _, t in loaded]
+    batch = replay_recordings(recordings, ticks, params=params, fusion=fusion)
+    worst = 0.0
+    try:
+        for p, prm in enumerate(params):
+            for i, (raw, t) in enumerate(loaded):
+                # Batch sizes like BLE notifications of 1-16 frames
+                streamed = _stream(raw, t, prm, fusion, chunk_sizes=(1, 7, 16, 3))
+                scale = np.maximum(1.0, np.abs(streamed).max(axis=0))
+                worst = max(worst, float((np.abs(batch[p][i] - streamed) / scale).max()))
+    finally:
+        emulator.COMP_ALPHA, emulator.VEL_DAMPING, emulator.FUSION_MODE = defaults
+    return worst
+
+
+# ------------------------------------------------------------------ #
+# Workers
+
+def summarize(outputs):
+    """Per-recording end displacement |x, y, z| and pose path length."""
+    end = np.array([np.linalg.norm(o[-1, 9:]) if len(o) else 0.0 for o in outputs])
+    path = np.array([np.linalg.norm(np.diff(o[:, 9:], axis=0), axis=1).sum() for o in outputs])
+    return end, path
+
+
+def _replay_chunk(job):
+    sources, root, params, fusion, dtype, keep = job
+    loaded = [load_source(s, root) for s in sources]
+    out = replay_recordings([r for r, _ in loaded], [t for _, t in loaded],
+                            params=params, fusion=fusion)
+    stats = [summarize(recs) for recs in out]
+    if not keep:
+        return None, stats
+    return [[r.astype(dtype) for r in recs] for recs in out], stats
+
+
+def output_name(prm):
+    return f"lpf{prm.lpf_alpha:g}_comp{prm.comp_alpha:g}_damp{prm.vel_damping:g}"
+
+
+def _write_npy(path, arr):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def run(sources, params=(DEFAULT_PARAMS,), fusion="complementary", out_dir=None,
+        root=DATA_ROOT, dtype=OUTPUT_DTYPE, workers=None):
+    """Replay sources under every parameter set on a process pool.
+
+    Returns one (end displacement, path length) pair of per-recording
+    arrays per parameter set. With out_dir the trajectories are written
+    in filter_batch's layout (manifest.json, offsets.npy and one (N, 12)
+    <output>.npy per parameter set), readable with filter_batch.open_output.
+    """
+    params = list(params)
+    keep = out_dir is not None
+    jobs = [(sources[i:i + CHUNK_SIZE], root, params, fusion, dtype, keep)
+            for i in range(0, len(sources), CHUNK_SIZE)]
+    if workers == 1 or len(jobs) <= 1:
+        parts = [_replay_chunk(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_replay_chunk, jobs))
+
+    stats = [tuple(np.concatenate([part[1][p][s] for part in parts]) if parts else np.empty(0)
+                   for s in range(2)) for p in range(len(params))]
+    if not keep:
+        return stats
+
+    os.makedirs(out_dir, exist_ok=True)
+    lengths = [len(r) for part in parts for r in part[0][0]]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    for p, prm in enumerate(params):
+        recs = [r for part in parts for r in part[0][p]]
+        arr = np.concatenate(recs) if recs else np.empty((0, len(OUTPUT_COLUMNS)), dtype=dtype)
+        _write_npy(os.path.join(out_dir, output_name(prm) + ".npy"), arr)
+    _write_npy(os.path.join(out_dir, "offsets.npy"), offsets)
+    entries = [dict(path=s if isinstance(s, str) else _dataset_path(s, root), length=n)
+               for s, n in zip(sources, lengths)]
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(dict(fusion=fusion, dtype=dtype, channels=OUTPUT_COLUMNS,
+                       params={output_name(p): p._asdict() for p in params},
+                       outputs=[output_name(p) for p in params], entries=entries), f, indent=1)
+    return stats
+
+
+def _dataset_path(i, root):
+    global _dataset
+    if _dataset is None or _dataset.root != root:
+        _dataset = Dataset(root)
+    return _dataset.entries[i]["path"]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay the emulator physics (LPF, fusion, dead reckoning) over whole "
+                    "recordings, sweeping parameters")
+    parser.add_argument("inputs", nargs="*",
+                        help="sampleN.csv files, globs or recorder session folders "
+                             "(default: the whole data/ tree)")
+    parser.add_argument("--lpf", type=float, nargs="+", default=[LPF_ALPHA], help="LPF_ALPHA values")
+    parser.add_argument("--comp", type=float, nargs="+", default=[COMP_ALPHA], help="COMP_ALPHA values")
+    parser.add_argument("--damping", type=float, nargs="+", default=[VEL_DAMPING],
+                        help="VEL_DAMPING values")
+    parser.add_argument("--fusion", choices=["complementary", "mahony"], default="complementary")
+    parser.add_argument("-o", "--out", help="write every trajectory here (default: summary only)")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default=OUTPUT_DTYPE)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the batch engine against the streaming BLEManager sample for sample")
+    args = parser.parse_args()
+
+    if args.inputs:
+        sources = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+        if not sources:
+            parser.error("no recordings match the inputs")
+    else:
+        sources = list(range(len(Dataset(DATA_ROOT))))
+    params = [Params(*p) for p in itertools.product(args.lpf, args.comp, args.damping)]
+
+    if args.verify:
+        start = time.perf_counter()
+        worst = verify(sources, params, args.fusion)
+        ok = worst <= VERIFY_TOLERANCE
+        print(f"{len(sources)} recordings x {len(params)} parameter set(s), {args.fusion}: "
+              f"largest batch/stream difference {worst:.2e} of column range "
+              f"({time.perf_counter() - start:.1f} s) -> {'OK' if ok else 'MISMATCH'}")
+        return 0 if ok else 1
+
+    start = time.perf_counter()
+    stats = run(sources, params, args.fusion, args.out, dtype=args.dtype, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(sources)} recordings x {len(params)} parameter set(s) in {elapsed:.2f} s"
+          + (f" -> {args.out}" if args.out else ""))
+    print(f"{'lpf':>6} {'comp':>6} {'damp':>6} {'end |xyz| p50':>14} {'p95':>8} {'path p50':>9}")
+    for prm, (end, path) in zip(params, stats):
+        print(f"{prm.lpf_alpha:6g} {prm.comp_alpha:6g} {prm.vel_damping:6g} "
+              f"{np.median(end):14.4f} {np.percentile(end, 95):8.4f} {np.median(path):9.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+import argparse
+import glob
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from frames import SAMPLE_RATE_HZ, TICK_HZ
+from sources import CHANNELS
+
+
+# Session logs: <out>/session_<YYYYmmdd_HHMMSS>[_N]/part_NNNN.orlog, each
+#
+#   magic (6 bytes) | uint32 header length | JSON header | records...
+#
+# with fixed-size little-endian records, so a part cut short by a crash
+# is still readable up to its last whole record.
+LOG_MAGIC = b"ORLOG\x01"
+LOG_SUFFIX = ".orlog"
+RECORD_DTYPE = np.dtype([("arrival", "<f8"),       # host time.time() of the notification
+                         ("tick", "<i8"),          # device tick (TICK_HZ), unwrapped
+                         ("imu", "<i2", (6,))])    # raw ax, ay, az, gx, gy, gz
+LABELS_FILE = "labels.jsonl"
+
+ROTATE_BYTES = 64 * 2**20
+ROTATE_SECONDS = 15 * 60.0
+
+# The writer wakes this often and writes everything queued meanwhile.
+# Waking per notification instead would take the GIL from the BLE thread
+# hundreds of times a second.
+FLUSH_INTERVAL_S = 0.25
+
+# Notifications (not samples) waiting for the writer; when it falls this
+# far behind, new batches are dropped and counted rather than queued.
+# Several seconds of 1 kHz traffic even at one sample per notification.
+QUEUE_SIZE = 8192
+
+DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+RECORDINGS_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "recordings")
+
+
+class Recorder:
+    """Append-only binary log of everything the ring sends.
+
+    feed() runs in the BLE thread and only enqueues references to the
+    batch it was given, so recording costs the callback one put_nowait.
+    A writer thread wakes every flush_interval, packs whatever is queued
+    into RECORD_DTYPE and appends it with one write(), rotating parts by
+    size or age. Memory is bounded by the queue size.
+
+    Labeled segments (start/end host times plus person/gesture/subject)
+    go to labels.jsonl next to the parts, for slice_session().
+    """
+
+    def __init__(self, out_dir=RECORDINGS_ROOT, rotate_bytes=ROTATE_BYTES,
+                 rotate_seconds=ROTATE_SECONDS, queue_size=QUEUE_SIZE,
+                 flush_interval=FLUSH_INTERVAL_S, label=None):
+        self.session_dir = os.path.join(out_dir, time.strftime("session_%Y%m%d_%H%M%S"))
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.label = label              # "person/gesture/subject" for new segments
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopping = threading.Event()
+        self.thread = None
+
+        self.segment_start = None
+        self.part = -1
+        self.file = None
+        self.file_bytes = 0
+        self.file_opened = 0.0
+
+        self.dropped = 0                # samples lost to a full queue
+        self.samples = 0                # samples written
+        self.bytes = 0
+        self.writes = 0
+        self.max_backlog = 0
+
+    # ---------------------------------------------------------------- #
+    # Producer side
+
+    def start(self):
+        # Sessions started within the same second get _2, _3, ... rather
+        # than sharing (and truncating) one folder
+        base, n = self.session_dir, 1
+        while True:
+            try:
+                os.makedirs(self.session_dir)
+                break
+            except FileExistsError:
+                n += 1
+                self.session_dir = f"{base}_{n}"
+        self.thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self.thread.start()
+        return self
+
+    def feed(self, raw, ticks, arrival=None):
+        """Queue an (n, 6) batch with its n device ticks; never blocks."""
+        try:
+            self.queue.put_nowait((raw, ticks, arrival or time.time()))
+        except queue.Full:
+            self.dropped += len(raw)
+
+    def stop(self):
+        if self.segment_start is not None:
+            self.stop_segment()
+        if self.thread is not None:
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+
+    # ---------------------------------------------------------------- #
+    # Labels
+
+    def start_segment(self, label=None):
+        self.label = label or self.label
+        if not self.label:
+            raise ValueError("segments need a person/gesture/subject label")
+        self.segment_start = time.time()
+
+    def stop_segment(self):
+        """Close the open segment and append it to labels.jsonl."""
+        if self.segment_start is None:
+            return None
+        segment = dict(start=self.segment_start, end=time.time(), label=self.label)
+        self.segment_start = None
+        with open(os.path.join(self.session_dir, LABELS_FILE), "a") as f:
+            f.write(json.dumps(segment) + "\n")
+        return segment
+
+    def toggle_segment(self):
+        if self.segment_start is None:
+            self.start_segment()
+            return True
+        self.stop_segment()
+        return False
+
+    # ---------------------------------------------------------------- #
+    # Writer thread
+
+    def _open_part(self):
+        if self.file is not None:
+            self.file.close()
+        self.part += 1
+        header = json.dumps(dict(created=time.time(), part=self.part, rate_hz=SAMPLE_RATE_HZ,
+                                 tick_hz=TICK_HZ, channels=CHANNELS,
+                                 dtype=RECORD_DTYPE.descr)).encode()
+        path = os.path.join(self.session_dir, f"part_{self.part:04d}{LOG_SUFFIX}")
+        self.file = open(path, "wb")
+        self.file.write(LOG_MAGIC + struct.pack("<I", len(header)) + header)
+        self.file_bytes = self.file.tell()
+        self.file_opened = time.time()
+
+    def _write(self, batches):
+        raw, ticks, arrival = zip(*batches)
+        raw = np.concatenate(raw)
+        records = np.empty(len(raw), dtype=RECORD_DTYPE)
+        records["arrival"] = np.repeat(arrival, [len(r) for r in ticks])
+        records["tick"] = np.round(np.concatenate(ticks))
+        records["imu"] = np.clip(np.round(raw), -32768, 32767)
+
+        if (self.file is None or self.file_bytes >= self.rotate_bytes
+                or time.time() - self.file_opened >= self.rotate_seconds):
+            self._open_part()
+        data = records.tobytes()
+        self.file.write(data)
+        # Visible to readers (and safe from a crash of this process) per batch
+        self.file.flush()
+        self.file_bytes += len(data)
+        self.bytes += len(data)
+        self.samples += len(records)
+        self.writes += 1
+
+    def _drain(self):
+        batches = []
+        try:
+            while True:
+                batches.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        self.max_backlog = max(self.max_backlog, len(batches))
+        if batches:
+            self._write(batches)
+
+    def _run(self):
+        while not self.stopping.wait(self.flush_interval):
+            self._drain()
+        self._drain()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def report(self):
+        return (f"Recorder: {self.samples} samples, {self.bytes / 1e6:.2f} MB in {self.part + 1} part(s) "
+                f"and {self.writes} writes (largest backlog {self.max_backlog} notifications), "
+                f"dropped {self.dropped} -> {self.session_dir}")
+
+
+# ------------------------------------------------------------------ #
+# Reading sessions back
+
+def read_part(path):
+    """(header, records) of one log part; records is memory-mapped."""
+    with open(path, "rb") as f:
+        magic = f.read(len(LOG_MAGIC))
+        if magic != LOG_MAGIC:
+            raise ValueError(f"{path} is not a recorder log")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+    offset = len(LOG_MAGIC) + 4 + length
+    n = (os.path.getsize(path) - offset) // RECORD_DTYPE.itemsize
+    if n == 0:
+        return header, np.empty(0, dtype=RECORD_DTYPE)
+    return header, np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=offset, shape=(n,))
+
+
+def read_session(session_dir):
+    """All records of a session, parts in order."""
+    parts = sorted(glob.glob(os.path.join(session_dir, "part_*" + LOG_SUFFIX)))
+    records = [read_part(p)[1] for p in parts]
+    return np.concatenate(records) if records else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def read_segments(session_dir):
+    path = os.path.join(session_dir, LABELS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def next_sample_path(data_root, person, gesture, subject):
+    """data/<person>/gestures/<gesture>/<subject>/sampleN.csv with N one past the highest."""
+    folder = os.path.join(data_root, person, "gestures", gesture, subject)
+    taken = [os.path.basename(p)[len("sample"):-len(".csv")]
+             for p in glob.glob(os.path.join(folder, "sample*.csv"))]
+    n = max([int(t) for t in taken if t.isdigit()], default=0) + 1
+    return os.path.join(folder, f"sample{n}.csv")
+
+
+def slice_session(session_dir, data_root=DATA_ROOT, segments=None, dry_run=False):
+    """Write every labeled segment as a new sampleN.csv in the dataset layout.
+
+    segments defaults to the session's labels.jsonl. Returns
+    [(segment, path, n_samples)]; segments without samples are skipped.
+    """
+    records = read_session(session_dir)
+    segments = read_segments(session_dir) if segments is None else segments
+    written = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        person, gesture, subject = seg["label"].split("/")
+        lo, hi = np.searchsorted(records["arrival"], [seg["start"], seg["end"]], side="right")
+        imu = np.asarray(records["imu"][lo:hi])
+        if len(imu) == 0:
+            continue
+        path = next_sample_path(data_root, person, gesture, subject)
+        if not dry_run:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            np.savetxt(tmp, imu, fmt="%d", delimiter=",", header=",".join(CHANNELS), comments="")
+            os.replace(tmp, path)
+        written.append((seg, path, len(imu)))
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect recorder sessions and slice them into data/")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="time span, rate and labeled segments of a session")
+    p.add_argument("session")
+    p = sub.add_parser("slice", help="write labeled segments as data/.../sampleN.csv")
+    p.add_argument("session")
+    p.add_argument("--data", default=DATA_ROOT, help="dataset root")
+    p.add_argument("--segment", nargs=3, action="append", metavar=("START", "END", "LABEL"),
+                   help="extra segment, seconds from the session start and person/gesture/subject")
+    p.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    records = read_session(args.session)
+    if len(records) == 0:
+        print(f"{args.session}: no samples")
+        return 1
+    t0 = records["arrival"][0]
+    segments = read_segments(args.session)
+
+    if args.command == "list":
+        span = records["arrival"][-1] - t0
+        ticks = records["tick"]
+        print(f"{len(records)} samples over {span:.1f} s "
+              f"({(len(ticks) - 1) * TICK_HZ / max(ticks[-1] - ticks[0], 1):.1f} Hz by device clock)")
+        for seg in segments:
+            print(f"  {seg['start'] - t0:8.2f} - {seg['end'] - t0:8.2f} s  {seg['label']}")
+        return 0
+
+    for start, end, label in args.segment or []:
+        segments.append(dict(start=t0 + float(start), end=t0 + float(end), label=label))
+    for seg, path, n in slice_session(args.session, args.data, segments, args.dry_run):
+        print(f"{'Would write' if args.dry_run else 'Wrote'} {n} samples ({seg['label']}) -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity history of rows, readable without copying.
+
+    Every row is written twice, at i and i + capacity, so the newest n rows
+    are always one contiguous slice and latest() can return a plain view.
+
+    There is a single writer (the BLE thread) and no lock. A reader that
+    holds a view while the writer laps it sees newer rows at the old end;
+    compare `written` before and after reading if that matters.
+    """
+
+    def __init__(self, capacity, columns):
+        self.capacity = int(capacity)
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.buf = np.zeros((2 * self.capacity, len(self.columns)))
+        self.head = 0       # next write position, 0 <= head < capacity
+        self.written = 0    # rows written since creation
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=float)
+        if len(rows) > self.capacity:
+            self.written += len(rows) - self.capacity
+            rows = rows[-self.capacity:]
+        n = len(rows)
+        if n == 0:
+            return
+
+        # At most two contiguous runs: up to the end of the ring, then from 0
+        first = min(n, self.capacity - self.head)
+        for src, dst in ((rows[:first], self.head), (rows[first:], 0)):
+            if len(src):
+                self.buf[dst:dst + len(src)] = src
+                self.buf[dst + self.capacity:dst + self.capacity + len(src)] = src
+        self.head = (self.head + n) % self.capacity
+        self.written += n
+
+    def append(self, row):
+        self.extend(np.asarray(row, dtype=float)[None])
+
+    def latest(self, n=None):
+        """View of the newest n rows (all stored rows by default), oldest first."""
+        n = len(self) if n is None else min(int(n), len(self))
+        end = self.head + self.capacity
+        return self.buf[end - n:end]
+
+    def column(self, name, n=None):
+        return self.latest(n)[:, self.index[name]]
+
+    def clear(self):
+        self.head = 0
+        self.written = 0
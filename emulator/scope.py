@@ -0,0 +1,169 @@
+import ctypes
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from frames import SAMPLE_RATE_HZ
+
+
+SCOPE_SECONDS = 5.0
+SCOPE_HEIGHT = 240      # pixels below the 3D view, split between the panels
+
+# Smallest half-height of each panel, so a ring at rest is not blown up
+# into noise
+MIN_RANGE = {"accel": 1.0, "gyro": 50.0}    # g, deg/s
+
+# Raw traces dim, filtered ones bright, x/y/z in red/green/blue
+RAW_COLORS = [(0.5, 0.15, 0.15), (0.15, 0.5, 0.15), (0.2, 0.2, 0.6)]
+FILTERED_COLORS = [(1.0, 0.3, 0.3), (0.3, 1.0, 0.3), (0.4, 0.5, 1.0)]
+
+
+def default_traces(sens):
+    """(history column, scale, panel, rgb) for raw and low-passed accel/gyro.
+
+    Raw counts are scaled by 1 / sens into the filtered signals' g and
+    deg/s, so both share a panel.
+    """
+    traces = []
+    for panel, raw, filtered, scale in (
+            ("accel", ["Accel_X", "Accel_Y", "Accel_Z"], ["ax_g", "ay_g", "az_g"], sens[:3]),
+            ("gyro", ["Gyro_X", "Gyro_Y", "Gyro_Z"], ["gx_dps", "gy_dps", "gz_dps"], sens[3:])):
+        for col, s, rgb in zip(raw, scale, RAW_COLORS):
+            traces.append((col, 1.0 / s, panel, rgb))
+        for col, rgb in zip(filtered, FILTERED_COLORS):
+            traces.append((col, 1.0, panel, rgb))
+    return traces
+
+
+class Scope:
+    """Scrolling oscilloscope of the newest history rows.
+
+    Runs entirely on the render thread: each frame copies only the rows
+    the BLE thread appended since the last frame out of the history ring,
+    into a float32 (x, y) vertex mirror laid out like RingBuffer (every
+    slot stored twice, so the visible window is one contiguous run), and
+    uploads just those slots into a single VBO. Drawing is then one
+    glDrawArrays per trace, whatever the window length.
+    """
+
+    def __init__(self, history, traces, seconds=SCOPE_SECONDS, rate_hz=SAMPLE_RATE_HZ):
+        self.history = history
+        self.traces = traces
+        self.columns = [history.index[col] for col, _, _, _ in traces]
+        self.scales = np.array([scale for _, scale, _, _ in traces])
+        self.panels = list(dict.fromkeys(panel for _, _, panel, _ in traces))
+        self.n = min(int(seconds * rate_hz), history.capacity)
+
+        # Slot-major: vertices[slot, trace] = (x, y); x is the slot number
+        self.vertices = np.zeros((2 * self.n, len(traces), 2), dtype=np.float32)
+        self.vertices[:, :, 0] = np.arange(2 * self.n)[:, None]
+        self.head = 0       # next slot to write, 0 <= head < n
+        self.count = 0      # valid slots, up to n
+        self.seen = 0       # history.written already copied
+        self.vbo = None
+
+    def init_gl(self):
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _new_rows(self):
+        """Rows appended since the last call, without taking any lock.
+
+        The copy is retried if the writer moved during it (see RingBuffer),
+        which at BLE batch rates almost never happens.
+        """
+        for _ in range(3):
+            written = self.history.written
+            k = min(written - self.seen, self.n)
+            if k <= 0:
+                if written < self.seen:     # history was cleared
+                    self.seen = written
+                return None
+            rows = self.history.latest(k)[:, self.columns]
+            if self.history.written == written:
+                self.seen = written
+                return rows
+        self.seen = self.history.written
+        return None
+
+    def update(self):
+        """Copy new rows into the mirror and upload the slots they touched."""
+        rows = self._new_rows()
+        if rows is None:
+            return
+        rows = rows * self.scales
+        k = len(rows)
+        first = min(k, self.n - self.head)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        # At most two runs (up to the end of the ring, then from 0), each
+        # written at slot and slot + n
+        for src, dst in ((rows[:first], self.head), (rows[first:], 0)):
+            if len(src) == 0:
+                continue
+            for slot in (dst, dst + self.n):
+                self.vertices[slot:slot + len(src), :, 1] = src
+                block = self.vertices[slot:slot + len(src)]
+                glBufferSubData(GL_ARRAY_BUFFER, slot * self.vertices.strides[0], block.nbytes, block)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.head = (self.head + k) % self.n
+        self.count = min(self.count + k, self.n)
+
+    def _limit(self, panel, traces):
+        """Half-height of a panel: the largest visible value, with a floor."""
+        y = self.vertices[:self.n, traces, 1]
+        return max(MIN_RANGE.get(panel, 1.0), 1.1 * float(np.abs(y).max()) if y.size else 0.0)
+
+    def draw(self, width, height):
+        """Draw the panels stacked in the bottom `height` pixels of the window."""
+        self.update()
+
+        glPushAttrib(GL_ENABLE_BIT | GL_VIEWPORT_BIT | GL_CURRENT_BIT)
+        glDisable(GL_DEPTH_TEST)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        stride = self.vertices.strides[0]
+        panel_height = height // len(self.panels)
+        start = self.head + self.n - self.count     # oldest valid slot
+
+        for p, panel in enumerate(self.panels):
+            traces = [t for t, tr in enumerate(self.traces) if tr[2] == panel]
+            limit = self._limit(panel, traces)
+            # Top panel first
+            glViewport(0, height - (p + 1) * panel_height, width, panel_height)
+            glMatrixMode(GL_PROJECTION)
+            glLoadIdentity()
+            glOrtho(0, self.n - 1, -limit, limit, -1, 1)
+            glMatrixMode(GL_MODELVIEW)
+            glLoadIdentity()
+
+            glColor3f(0.08, 0.08, 0.08)
+            glRectf(0, -limit, self.n - 1, limit)
+            glColor3f(0.3, 0.3, 0.3)
+            glBegin(GL_LINES)
+            glVertex2f(0, 0); glVertex2f(self.n - 1, 0)
+            glEnd()
+
+            if self.count < 2:
+                continue
+            # Newest sample at the right edge
+            glTranslatef(self.n - 1 - (start + self.count - 1), 0, 0)
+            for t in traces:
+                glColor3f(*self.traces[t][3])
+                glVertexPointer(2, GL_FLOAT, stride, ctypes.c_void_p(t * self.vertices.strides[1]))
+                glDrawArrays(GL_LINE_STRIP, start, self.count)
+
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopMatrix()
+        glPopAttrib()
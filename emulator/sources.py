@@ -0,0 +1,263 @@
+import asyncio
+import glob
+import os
+import time
+
+import numpy as np
+
+from frames import SAMPLE_RATE_HZ, TICK_HZ, encode_packet, synthetic_imu
+
+
+DEVICE_NAME = "open-ring"
+
+CHAR_UUID = "0000fe4-0000-1000-8000-00805f9b34fb"
+
+# Seconds between live stats reports while connected, 0 to disable
+STATS_INTERVAL = 10.0
+
+SCAN_TIMEOUT = 10.0
+# Connecting straight to the cached address gives up after this long and
+# falls back to scanning by name
+DIRECT_CONNECT_TIMEOUT = 4.0
+
+CHANNELS = ["Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z"]
+
+DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+def find_recordings(root=DATA_ROOT, person="*", gesture="*", subject="*"):
+    """Paths of data/<person>/gestures/<gesture>/<subject>/sampleN.csv, in sample order."""
+    pattern = os.path.join(root, person, "gestures", gesture, subject, "sample*.csv")
+
+    def key(path):
+        head, name = os.path.split(path)
+        num = name[len("sample"):-len(".csv")]
+        return head, int(num) if num.isdigit() else 0
+
+    return sorted(glob.glob(pattern), key=key)
+
+
+def load_recording(path):
+    """Raw (n, 6) samples of one recording, columns in CHANNELS order."""
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+    usecols = [header.index(c) for c in CHANNELS]
+    return np.loadtxt(path, delimiter=",", skiprows=1, usecols=usecols, ndmin=2)
+
+
+class SampleSource:
+    """Feeds raw samples into a BLEManager.
+
+    Subclasses implement run(manager). Sources that deliver samples
+    themselves go through deliver(), which keeps throughput and per-call
+    latency figures for report().
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.latencies = []
+        self.started = None
+        self.finished = None
+
+    async def run(self, manager):
+        raise NotImplementedError
+
+    def deliver(self, handler, payload, count):
+        start = time.perf_counter()
+        handler(payload)
+        self.latencies.append(time.perf_counter() - start)
+        self.samples += count
+
+    def report(self):
+        if not self.latencies:
+            return f"{type(self).__name__}: no samples delivered"
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        lat = np.array(self.latencies) * 1e6
+        return (f"{type(self).__name__}: {self.samples} samples in {elapsed:.3f} s "
+                f"({self.samples / elapsed:,.0f} samples/s), "
+                f"call latency p50 {np.percentile(lat, 50):.1f} us, "
+                f"p99 {np.percentile(lat, 99):.1f} us, max {lat.max():.1f} us")
+
+
+class BLESource(SampleSource):
+    """The ring itself: scan, connect and subscribe to IMU notifications.
+
+    With a calibration.DeviceCache the last ring used is tried by address
+    first, skipping the scan, and the connected ring's address is
+    remembered for next time. The manager's calibrator (if any) is
+    attached to the ring before notifications start, so its cached
+    calibration applies from the first sample.
+    """
+
+    def __init__(self, device_name=DEVICE_NAME, char_uuid=CHAR_UUID, cache=None):
+        super().__init__()
+        self.device_name = device_name
+        self.char_uuid = char_uuid
+        self.cache = cache
+
+    async def _connect_cached(self, BleakClient):
+        address = self.cache.last_address(self.device_name) if self.cache else None
+        if address is None:
+            return None
+        print(f"Connecting to last used ring {address}...")
+        client = BleakClient(address, timeout=DIRECT_CONNECT_TIMEOUT)
+        try:
+            await client.connect()
+            return client
+        except Exception as e:
+            print(f"{address} not reachable ({str(e) or type(e).__name__}), scanning instead")
+            return None
+
+    async def _connect_scanned(self, BleakScanner, BleakClient):
+        print(f"Scanning for device with name containing: '{self.device_name}'...")
+        device = await BleakScanner.find_device_by_filter(
+            lambda d, ad: d.name and self.device_name in d.name,
+            timeout=SCAN_TIMEOUT
+        )
+        if not device:
+            return None
+        print(f"Connecting to {device.name}...")
+        client = BleakClient(device)
+        await client.connect()
+        return client
+
+    async def run(self, manager):
+        # Imported here so replay and synthetic runs work without bleak
+        from bleak import BleakScanner, BleakClient
+
+        try:
+            client = (await self._connect_cached(BleakClient)
+                      or await self._connect_scanned(BleakScanner, BleakClient))
+        except Exception as e:
+            print(f"Bluetooth Error: {e}")
+            manager.state.running = False
+            return
+
+        if client is None:
+            print("Device not found. Please ensure it is powered on.")
+            manager.state.running = False
+            return
+
+        # Known after a scan; a direct connect keeps the cached name
+        name = getattr(client, "name", None)
+        if manager.calibrator is not None:
+            # Also records the address in the cache
+            manager.calibration = manager.calibrator.attach(client.address, name)
+            print(f"Calibration: {manager.calibration.describe()}")
+        elif self.cache:
+            self.cache.update(client.address, name)
+
+        try:
+            print(f"Connected. subscribing to {self.char_uuid}")
+            await client.start_notify(self.char_uuid, manager.notification_handler)
+
+            last_report = time.time()
+            while manager.state.running:
+                if not client.is_connected:
+                    print("Device disconnected unexpectedly.")
+                    break
+                await asyncio.sleep(0.5)
+                if STATS_INTERVAL and time.time() - last_report >= STATS_INTERVAL:
+                    print(manager.stats.report(manager.decoder))
+                    last_report = time.time()
+
+            await client.stop_notify(self.char_uuid)
+        except Exception as e:
+            print(f"Bluetooth Error: {e}")
+            manager.state.running = False
+        finally:
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+
+class ArraySource(SampleSource):
+    """Plays (n, 6) arrays of raw samples into the pipeline.
+
+    speed=1.0 paces delivery at rate_hz like the firmware, other values
+    scale it and speed=0 delivers as fast as possible. chunk_size samples
+    are handed over per call, like BLE connection-interval batching.
+    packet_format=None calls process_samples() directly; "text" or
+    "binary" encodes notifications first so decoding is exercised too.
+    """
+
+    def __init__(self, rate_hz=SAMPLE_RATE_HZ, speed=1.0, chunk_size=1,
+                 packet_format=None):
+        super().__init__()
+        self.rate_hz = rate_hz
+        self.speed = speed
+        self.chunk_size = max(int(chunk_size), 1)
+        self.packet_format = packet_format
+        self.seq = 0
+
+    def recordings(self):
+        raise NotImplementedError
+
+    def payloads(self, rec):
+        """(sample count, payload) pairs for one recording, encoded up front."""
+        if self.packet_format == "text":
+            for row in rec.astype(int):
+                yield 1, ("%d,%d,%d,%d,%d,%d" % tuple(row)).encode()
+            return
+
+        for start in range(0, len(rec), self.chunk_size):
+            chunk = rec[start:start + self.chunk_size]
+            if self.packet_format == "binary":
+                seq = self.seq + start + np.arange(len(chunk))
+                ticks = np.round(seq * TICK_HZ / self.rate_hz).astype(np.int64)
+                yield len(chunk), encode_packet(np.clip(chunk, -32768, 32767), seq, ticks)
+            else:
+                yield len(chunk), chunk
+
+    async def run(self, manager):
+        if self.packet_format:
+            handler = lambda data: manager.notification_handler(None, data)
+        else:
+            def handler(chunk):
+                # Stands in for notification_handler, so stats see the arrivals too
+                arrival = time.time()
+                manager.stats.on_arrival(arrival, len(chunk))
+                manager.process_samples(chunk, arrival=arrival)
+        period = 1.0 / (self.rate_hz * self.speed) if self.speed else None
+
+        self.started = time.perf_counter()
+        sent = 0
+        for rec in self.recordings():
+            payloads = list(self.payloads(rec))
+            self.seq += len(rec)
+            for count, payload in payloads:
+                if not manager.state.running:
+                    break
+                sent += count
+                if period is not None:
+                    # A chunk is ready once its last sample has been "sampled"
+                    delay = self.started + sent * period - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                self.deliver(handler, payload, count)
+        self.finished = time.perf_counter()
+
+
+class ReplaySource(ArraySource):
+    """Replays data/<person>/gestures/<gesture>/<subject>/sampleN.csv recordings."""
+
+    def __init__(self, paths, **kwargs):
+        super().__init__(**kwargs)
+        self.paths = list(paths)
+
+    def recordings(self):
+        for path in self.paths:
+            yield load_recording(path)
+
+
+class SyntheticSource(ArraySource):
+    """In-process stand-in generating `seconds` of smooth motion with noise."""
+
+    def __init__(self, seconds=10.0, seed=0, **kwargs):
+        super().__init__(**kwargs)
+        self.seconds = seconds
+        self.seed = seed
+
+    def recordings(self):
+        yield synthetic_imu(int(self.seconds * self.rate_hz), self.rate_hz, self.seed)
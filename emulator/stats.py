@@ -0,0 +1,182 @@
+import bisect
+import time
+from collections import deque
+
+import numpy as np
+
+
+# Upper edges of the inter-arrival histogram in milliseconds; the last bin
+# collects everything above the final edge.
+JITTER_EDGES_MS = [1, 2, 5, 8, 12, 16, 20, 30, 50, 75, 100, 200, 500]
+
+RATE_WINDOW_S = 2.0
+
+
+class PipelineStats:
+    """Live timing figures for one ring's notification stream.
+
+    Cheap enough to update on every notification: a bisect into the
+    jitter histogram and a few deque appends.
+    """
+
+    def __init__(self, window=1000):
+        self.jitter_hist = [0] * (len(JITTER_EDGES_MS) + 1)
+        self.notifications = 0
+        self.samples = 0
+        self.last_arrival = None
+        self.processing = deque(maxlen=window)   # arrival -> pose published, s
+        self.transport = deque(maxlen=window)    # arrival - device time, s
+        self.min_offset = None
+        self.recent = deque()                    # (arrival, n_samples)
+
+    def on_arrival(self, arrival, n_samples, device_time=None):
+        """Record one notification carrying n_samples; device_time in seconds."""
+        if self.last_arrival is not None:
+            gap_ms = (arrival - self.last_arrival) * 1e3
+            self.jitter_hist[bisect.bisect_right(JITTER_EDGES_MS, gap_ms)] += 1
+        self.last_arrival = arrival
+        self.notifications += 1
+        self.samples += n_samples
+
+        self.recent.append((arrival, n_samples))
+        while self.recent[0][0] < arrival - RATE_WINDOW_S:
+            self.recent.popleft()
+
+        if device_time is not None:
+            # Host and ring clocks have an unknown offset; the smallest
+            # arrival - device_time seen stands in for zero transport delay.
+            offset = arrival - device_time
+            if self.min_offset is None or offset < self.min_offset:
+                self.min_offset = offset
+            self.transport.append(offset)
+
+    def on_published(self, arrival, now=None):
+        self.processing.append((now or time.time()) - arrival)
+
+    def sample_rate(self):
+        # Exporter threads call this while the BLE thread appends and
+        # evicts; list() copies the deque in one step under the GIL
+        recent = list(self.recent)
+        if len(recent) < 2:
+            return 0.0
+        span = recent[-1][0] - recent[0][0]
+        n = sum(c for _, c in recent) - recent[0][1]
+        return n / span if span > 0 else 0.0
+
+    def snapshot(self, decoder=None):
+        """Current figures as a dict; latencies in milliseconds."""
+        out = dict(
+            notifications=self.notifications,
+            samples=self.samples,
+            sample_rate_hz=self.sample_rate(),
+            jitter_edges_ms=JITTER_EDGES_MS,
+            jitter_hist=list(self.jitter_hist),
+        )
+        if self.processing:
+            lat = np.array(self.processing) * 1e3
+            out["processing_ms_p50"] = float(np.percentile(lat, 50))
+            out["processing_ms_p99"] = float(np.percentile(lat, 99))
+        if self.transport:
+            lat = (np.array(self.transport) - self.min_offset) * 1e3
+            out["transport_ms_p50"] = float(np.percentile(lat, 50))
+            out["transport_ms_p99"] = float(np.percentile(lat, 99))
+        if decoder is not None and decoder.frames:
+            out["dropped"] = decoder.dropped
+            out["loss"] = decoder.dropped / (decoder.frames + decoder.dropped)
+        return out
+
+    def report(self, decoder=None):
+        s = self.snapshot(decoder)
+        lines = [f"rate {s['sample_rate_hz']:.1f} Hz, {s['samples']} samples "
+                 f"in {s['notifications']} notifications"]
+        if "loss" in s:
+            lines.append(f"loss {s['loss']:.2%} ({s['dropped']} frames)")
+        if "processing_ms_p50" in s:
+            lines.append(f"arrival->fused p50 {s['processing_ms_p50']:.2f} ms, "
+                         f"p99 {s['processing_ms_p99']:.2f} ms")
+        if "transport_ms_p50" in s:
+            lines.append(f"device->arrival (relative) p50 {s['transport_ms_p50']:.2f} ms, "
+                         f"p99 {s['transport_ms_p99']:.2f} ms")
+        labels = [f"<{e}" for e in JITTER_EDGES_MS] + [f">={JITTER_EDGES_MS[-1]}"]
+        hist = ", ".join(f"{l}:{c}" for l, c in zip(labels, s["jitter_hist"]) if c)
+        lines.append(f"arrival gaps (ms) {hist or '-'}")
+        return "\n".join(lines)
+
+
+FRAME_STAGES = ["events", "pose", "draw", "flip", "idle"]
+
+
+class FrameStats:
+    """Where each rendered frame's time goes.
+
+    The render loop calls begin() and then mark(stage) as it finishes each
+    of FRAME_STAGES, one perf_counter() call per stage:
+
+      events  pygame event handling
+      pose    obtaining the pose and gesture from the BLE thread
+      draw    issuing the GL calls
+      flip    buffer swap (plus glFinish when asked to wait for the GPU)
+      idle    frame-rate cap sleep in clock.tick
+
+    With a metrics.Metrics, every stage also goes into its "frame.<stage>"
+    histogram and the whole frame into "frame.total".
+    """
+
+    def __init__(self, window=600, metrics=None):
+        self.times = {s: deque(maxlen=window) for s in FRAME_STAGES}
+        self.hists = None
+        if metrics is not None:
+            self.hists = {s: metrics.histogram(f"frame.{s}") for s in FRAME_STAGES + ["total"]}
+        self.totals = deque(maxlen=window)
+        self.frames = 0
+        self._start = None
+        self._last = None
+
+    def begin(self):
+        self._start = self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.times[stage].append(now - self._last)
+        if self.hists is not None:
+            self.hists[stage].observe(now - self._last)
+        self._last = now
+
+    def end(self):
+        self.totals.append(self._last - self._start)
+        if self.hists is not None:
+            self.hists["total"].observe(self._last - self._start)
+        self.frames += 1
+
+    def snapshot(self):
+        """Mean and p99 per stage and per frame, in milliseconds."""
+        out = dict(frames=self.frames)
+        if not self.totals:
+            return out
+        total = np.array(self.totals) * 1e3
+        out["frame_ms"] = float(total.mean())
+        out["frame_ms_p99"] = float(np.percentile(total, 99))
+        out["fps"] = 1e3 / out["frame_ms"]
+        for stage, times in self.times.items():
+            t = np.array(times) * 1e3
+            out[f"{stage}_ms"] = float(t.mean())
+            out[f"{stage}_ms_p99"] = float(np.percentile(t, 99))
+        return out
+
+    def lines(self):
+        """Short human-readable summary, one line per stage."""
+        s = self.snapshot()
+        if "frame_ms" not in s:
+            return ["no frames yet"]
+        lines = [f"{s['fps']:5.1f} fps  frame {s['frame_ms']:6.2f} ms  p99 {s['frame_ms_p99']:6.2f}"]
+        lines += [f"{stage:6s} {s[stage + '_ms']:6.2f} ms  p99 {s[stage + '_ms_p99']:6.2f}"
+                  for stage in FRAME_STAGES]
+        return lines
+
+    def report(self):
+        s = self.snapshot()
+        if "frame_ms" not in s:
+            return "no frames rendered"
+        stages = ", ".join(f"{stage} {s[stage + '_ms']:.2f}" for stage in FRAME_STAGES)
+        return (f"{s['fps']:.1f} fps, frame {s['frame_ms']:.2f} ms (p99 {s['frame_ms_p99']:.2f}); "
+                f"mean ms: {stages}")
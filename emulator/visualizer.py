@@ -0,0 +1,249 @@
+import ctypes
+import math
+import time
+
+import numpy as np
+import pygame
+from pygame.locals import DOUBLEBUF, OPENGL, QUIT, K_SPACE, K_f, K_r, KEYDOWN
+
+# OpenGL
+from OpenGL.GL import *
+from OpenGL.GLU import *
+
+from scope import SCOPE_HEIGHT
+from stats import FrameStats
+
+
+POS_SCALE    = 0.1
+
+# Frame-rate cap; 0 renders as fast as possible
+FPS = 60
+
+# Seconds between frame-time lines on stdout, 0 for none
+LOG_INTERVAL_S = 5.0
+
+# Seconds between refreshes of the on-screen frame-time overlay
+OVERLAY_INTERVAL_S = 0.5
+
+
+# X (red), Y (green) and Z (blue) axes, as GL_LINES
+AXIS_VERTICES = [
+    (0, 0, 0), (1, 0, 0),
+    (0, 0, 0), (0, 1, 0),
+    (0, 0, 0), (0, 0, 1),
+]
+AXIS_COLORS = [(1, 0, 0)] * 2 + [(0, 1, 0)] * 2 + [(0, 0, 1)] * 2
+
+# Paper plane / dart, as GL_TRIANGLES
+GLIDER_VERTICES = [
+    # Left Wing Top
+    (0.0, 0.0, -1.5), (-1.0, 0.0, 1.0), (0.0, 0.2, 1.0),
+    # Right Wing Top
+    (0.0, 0.0, -1.5), (1.0, 0.0, 1.0), (0.0, 0.2, 1.0),
+    # Left and right wing bottom
+    (0.0, 0.0, -1.5), (-1.0, 0.0, 1.0), (0.0, -0.2, 1.0),
+    (0.0, 0.0, -1.5), (1.0, 0.0, 1.0), (0.0, -0.2, 1.0),
+    # Tail
+    (-1.0, 0.0, 1.0), (1.0, 0.0, 1.0), (0.0, 0.2, 1.0),
+    (-1.0, 0.0, 1.0), (1.0, 0.0, 1.0), (0.0, -0.2, 1.0),
+]
+GLIDER_COLORS = [(0.2, 0.6, 1.0)] * 6 + [(0.1, 0.4, 0.8)] * 6 + [(0.6, 0.6, 0.6)] * 6
+
+
+class Mesh:
+    """Static colored geometry, uploaded once into one vertex buffer.
+
+    parts is a list of (GL mode, vertices, colors). Drawing sets the
+    vertex and color pointers once (the costly calls in PyOpenGL) and
+    issues one glDrawArrays per part, instead of a glBegin/glVertex call
+    per vertex every frame.
+    """
+
+    def __init__(self, parts):
+        self.ranges = []
+        data = []
+        for mode, vertices, colors in parts:
+            self.ranges.append((mode, sum(len(d) for d in data), len(vertices)))
+            # Interleaved x, y, z, r, g, b
+            data.append(np.hstack([np.asarray(vertices, dtype=np.float32),
+                                   np.asarray(colors, dtype=np.float32)]))
+        self.data = np.concatenate(data)
+        self.vbo = None
+
+    def upload(self):
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.data.nbytes, self.data, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def draw(self):
+        stride = self.data.strides[0]
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, stride, ctypes.c_void_p(0))
+        glColorPointer(3, GL_FLOAT, stride, ctypes.c_void_p(3 * self.data.itemsize))
+        for mode, first, count in self.ranges:
+            glDrawArrays(mode, first, count)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+class Visualizer:
+    def __init__(self, state: "SharedState", scope=None, fps=FPS, finish=False,
+                 log_interval=LOG_INTERVAL_S, recorder=None, metrics=None):
+        self.state = state
+        # Optional recorder.Recorder; R starts/stops a labeled segment
+        self.recorder = recorder
+        # 3D view size; the optional scope.Scope panel goes below it
+        self.view_dim = (800, 600)
+        self.scope = scope
+        self.scope_height = SCOPE_HEIGHT if scope is not None else 0
+        self.display_dim = (self.view_dim[0], self.view_dim[1] + self.scope_height)
+        self.fps = fps
+        # glFinish after every flip, so "flip" includes the rendering itself.
+        # Needed for timings under software GL without a display, where the
+        # swap does not wait for anything.
+        self.finish = finish
+        self.log_interval = log_interval
+
+        # Axes and glider share one buffer, drawn with one pointer setup
+        self.model = Mesh([(GL_LINES, AXIS_VERTICES, AXIS_COLORS),
+                           (GL_TRIANGLES, GLIDER_VERTICES, GLIDER_COLORS)])
+        # Optional metrics.Metrics: frame stage histograms and the render thread for profiling
+        self.metrics = metrics
+        self.frame_stats = FrameStats(metrics=metrics)
+        self.show_stats = True
+        self.overlay = None         # (width, height, RGBA bytes)
+        self.gesture = None
+
+    def open(self):
+        """Create the window and upload everything static."""
+        pygame.init()
+        pygame.display.set_mode(self.display_dim, DOUBLEBUF | OPENGL)
+        pygame.display.set_caption("IMU Visualizer | Press SPACE to Reset Position, F for frame times")
+
+        glViewport(0, self.scope_height, *self.view_dim)
+        glEnable(GL_DEPTH_TEST)
+        glMatrixMode(GL_PROJECTION)
+        gluPerspective(45, (self.view_dim[0] / self.view_dim[1]), 0.1, 100.0)
+        glMatrixMode(GL_MODELVIEW)
+
+        self.model.upload()
+        if self.metrics is not None:
+            self.metrics.register_thread("render")
+            self.metrics.gauge("frame.fps", lambda: self.frame_stats.snapshot().get("fps", 0.0))
+        if self.scope is not None:
+            self.scope.init_gl()
+        self.font = pygame.font.Font(None, 18)
+
+        self.clock = pygame.time.Clock()
+        now = time.perf_counter()
+        self.next_log = now + self.log_interval
+        self.next_overlay = now
+
+    def _render_overlay(self):
+        """Rasterise the frame-time lines once; draw_overlay() just blits them."""
+        lines = [self.font.render(line, True, (255, 255, 255), (0, 0, 0))
+                 for line in self.frame_stats.lines()]
+        surface = pygame.Surface((max(l.get_width() for l in lines),
+                                  sum(l.get_height() for l in lines)))
+        y = 0
+        for line in lines:
+            surface.blit(line, (0, y))
+            y += line.get_height()
+        self.overlay = (surface.get_width(), surface.get_height(),
+                        pygame.image.tostring(surface, "RGBA", True))
+
+    def draw_overlay(self):
+        if self.overlay is None:
+            return
+        width, height, pixels = self.overlay
+        glWindowPos2i(4, self.display_dim[1] - height - 4)
+        glDrawPixels(width, height, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
+
+    def frame(self):
+        """Handle events and draw one frame, timing each stage."""
+        stats = self.frame_stats
+        stats.begin()
+
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                self.state.running = False
+            elif event.type == KEYDOWN:
+                if event.key == K_SPACE:
+                    self.state.reset_position()
+                elif event.key == K_f:
+                    self.show_stats = not self.show_stats
+                elif event.key == K_r and self.recorder is not None and self.recorder.label:
+                    recording = self.recorder.toggle_segment()
+                    print(f"{'Recording' if recording else 'Stopped'} segment {self.recorder.label}")
+                    pygame.display.set_caption(
+                        f"IMU Visualizer | {'REC ' + self.recorder.label if recording else 'Press R to record'}")
+        stats.mark("events")
+
+        pose = self.state.pose
+        gesture = self.state.gesture
+        stats.mark("pose")
+
+        if gesture is not self.gesture:
+            self.gesture = gesture
+            pygame.display.set_caption(f"IMU Visualizer | {gesture.label} | Press SPACE to Reset Position")
+
+        roll, pitch, yaw = pose.roll, pose.pitch, pose.yaw
+        x = pose.x * POS_SCALE
+        y = pose.y * POS_SCALE
+        z = pose.z * POS_SCALE
+
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glLoadIdentity()
+
+        glTranslatef(0.0, 0.0, -8.0)
+
+
+        glTranslatef(x, y, z)
+
+
+        glRotatef(math.degrees(yaw), 0, 1, 0)
+        glRotatef(math.degrees(pitch), 1, 0, 0)
+        glRotatef(math.degrees(roll), 0, 0, 1)
+
+        self.model.draw()
+
+        if self.scope is not None:
+            self.scope.draw(self.display_dim[0], self.scope_height)
+
+        now = time.perf_counter()
+        if self.show_stats:
+            if now >= self.next_overlay:
+                self._render_overlay()
+                self.next_overlay = now + OVERLAY_INTERVAL_S
+            self.draw_overlay()
+        stats.mark("draw")
+
+        pygame.display.flip()
+        if self.finish:
+            glFinish()
+        stats.mark("flip")
+
+        self.clock.tick(self.fps)
+        stats.mark("idle")
+        stats.end()
+
+        if self.log_interval and now >= self.next_log:
+            print(f"Frame times: {stats.report()}")
+            self.next_log = now + self.log_interval
+
+    def close(self):
+        pygame.quit()
+
+    def main_loop(self):
+        self.open()
+        try:
+            while self.state.running:
+                self.frame()
+        finally:
+            print(f"Frame times: {self.frame_stats.report()}")
+            self.close()
@@ -0,0 +1,234 @@
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+
+CHANNELS = ["Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z"]
+
+DATA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+CACHE_DIR = ".cache"
+MANIFEST_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+SAMPLES_FILE = "samples.npy"
+OFFSETS_FILE = "offsets.npy"
+
+
+def scan(root=DATA_ROOT):
+    """Manifest entries (without length/checksum) for every sampleN.csv under root.
+
+    Layout is <root>/<person>/gestures/<gesture>/<subject>/sampleN.csv. Entries
+    are sorted by person, gesture, subject and sample number, so any single
+    person/gesture/subject selection is one contiguous run in the pack.
+    """
+    entries = []
+    for path in glob.glob(os.path.join(root, "*", "gestures", "*", "*", "sample*.csv")):
+        rel = os.path.relpath(path, root)
+        person, _, gesture, subject, name = rel.split(os.sep)
+        num = name[len("sample"):-len(".csv")]
+        st = os.stat(path)
+        entries.append(dict(person=person, gesture=gesture, subject=subject,
+                            sample=int(num) if num.isdigit() else 0, path=rel,
+                            size=st.st_size, mtime_ns=st.st_mtime_ns))
+    entries.sort(key=lambda e: (e["person"], e["gesture"], e["subject"], e["sample"], e["path"]))
+    return entries
+
+
+def file_checksum(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def read_csv(path):
+    """Raw (n, 6) samples of one recording, columns in CHANNELS order."""
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+    missing = [c for c in CHANNELS if c not in header]
+    if missing:
+        raise ValueError(f"Missing columns {missing} in {path}. Found: {header}")
+    usecols = [header.index(c) for c in CHANNELS]
+    return np.loadtxt(path, delimiter=",", skiprows=1, usecols=usecols, ndmin=2)
+
+
+class Dataset:
+    """Every recording under data/ packed into one memory-mapped array.
+
+    samples holds all recordings back to back and offsets[i]:offsets[i+1]
+    is recording i, so recordings and whole-gesture slices are views into
+    the map. The pack lives in <root>/.cache and is rebuilt when files are
+    added, removed or changed. verify="mtime" trusts unchanged size and
+    mtime and only checksums files that differ. verify="checksum" hashes
+    every file. Changed files are re-parsed and the rest are copied from
+    the old pack.
+    """
+
+    def __init__(self, root=DATA_ROOT, cache_dir=None, verify="mtime"):
+        self.root = root
+        self.cache_dir = cache_dir or os.path.join(root, CACHE_DIR)
+        self.refresh(verify)
+
+    # -------------------------------------------------------------- #
+    # Cache maintenance
+
+    def _cache_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._cache_path(MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != MANIFEST_VERSION:
+            return None
+        for name in (SAMPLES_FILE, OFFSETS_FILE):
+            if not os.path.exists(self._cache_path(name)):
+                return None
+        return manifest
+
+    def _match(self, files, manifest, verify):
+        """Fill length/sha1 of files from manifest where unchanged; return True if all matched."""
+        old = {e["path"]: e for e in manifest["entries"]} if manifest else {}
+        fresh = len(old) == len(files)
+        for e in files:
+            prev = old.get(e["path"])
+            same_stat = prev is not None and (prev["size"], prev["mtime_ns"]) == (e["size"], e["mtime_ns"])
+            if prev is not None and verify == "mtime" and same_stat:
+                e["sha1"] = prev["sha1"]
+            else:
+                e["sha1"] = file_checksum(os.path.join(self.root, e["path"]))
+            if prev is not None and prev["sha1"] == e["sha1"]:
+                e["length"] = prev["length"]
+                e["_old"] = prev
+                fresh = fresh and same_stat
+            else:
+                fresh = False
+        return fresh
+
+    def refresh(self, verify="mtime"):
+        files = scan(self.root)
+        manifest = self._read_manifest()
+        if not self._match(files, manifest, verify):
+            self._build(files, manifest)
+        self._open()
+
+    def _build(self, files, manifest):
+        old_samples = old_offsets = None
+        old_index = {}
+        if manifest:
+            old_samples = np.load(self._cache_path(SAMPLES_FILE), mmap_mode="r")
+            old_offsets = np.load(self._cache_path(OFFSETS_FILE))
+            old_index = {e["path"]: i for i, e in enumerate(manifest["entries"])}
+
+        parts = []
+        for e in files:
+            prev = e.pop("_old", None)
+            if prev is not None:
+                i = old_index[prev["path"]]
+                parts.append(np.asarray(old_samples[old_offsets[i]:old_offsets[i + 1]]))
+            else:
+                parts.append(read_csv(os.path.join(self.root, e["path"])))
+                e["length"] = len(parts[-1])
+
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in parts])
+        samples = np.concatenate(parts) if parts else np.empty((0, len(CHANNELS)))
+        # Raw sensor counts fit int16; anything else keeps full precision
+        if np.all(samples == np.round(samples)) and samples.size and \
+                samples.min() >= -32768 and samples.max() <= 32767:
+            samples = samples.astype(np.int16)
+        else:
+            samples = samples.astype(np.float64)
+        del old_samples
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write under temporary names, then swap in, so readers never see a half-written pack
+        for name, arr in ((SAMPLES_FILE, samples), (OFFSETS_FILE, offsets)):
+            tmp = self._cache_path(name + ".tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, self._cache_path(name))
+        tmp = self._cache_path(MANIFEST_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(dict(version=MANIFEST_VERSION, channels=CHANNELS, entries=files), f, indent=1)
+        os.replace(tmp, self._cache_path(MANIFEST_FILE))
+
+    def _open(self):
+        with open(self._cache_path(MANIFEST_FILE)) as f:
+            self.entries = json.load(f)["entries"]
+        self.samples = np.load(self._cache_path(SAMPLES_FILE), mmap_mode="r")
+        self.offsets = np.load(self._cache_path(OFFSETS_FILE))
+        self.lengths = np.diff(self.offsets)
+        self.person = np.array([e["person"] for e in self.entries])
+        self.gesture = np.array([e["gesture"] for e in self.entries])
+        self.subject = np.array([e["subject"] for e in self.entries])
+
+    # -------------------------------------------------------------- #
+    # Access
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        return self.samples[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def gestures(self):
+        return sorted(set(self.gesture.tolist()))
+
+    @property
+    def subjects(self):
+        return sorted(set(self.subject.tolist()))
+
+    def select(self, person=None, gesture=None, subject=None):
+        """Indices of recordings matching every given name (or list of names)."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, want in ((self.person, person), (self.gesture, gesture), (self.subject, subject)):
+            if want is not None:
+                mask &= np.isin(column, [want] if isinstance(want, str) else list(want))
+        return np.flatnonzero(mask)
+
+    def recordings(self, indices=None):
+        """List of per-recording views."""
+        indices = range(len(self)) if indices is None else indices
+        return [self[i] for i in indices]
+
+    def block(self, indices):
+        """(samples, offsets) for the given recordings, offsets relative to samples.
+
+        A run of consecutive indices, e.g. any select() on a single
+        person/gesture/subject, is returned as a view of the map; anything
+        else is copied.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) == 0:
+            return self.samples[:0], np.zeros(1, dtype=np.int64)
+        if np.all(np.diff(indices) == 1):
+            start, stop = self.offsets[indices[0]], self.offsets[indices[-1] + 1]
+            return self.samples[start:stop], self.offsets[indices[0]:indices[-1] + 2] - start
+        parts = self.recordings(indices)
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p) for p in parts])
+        return np.concatenate(parts), offsets
+
+    def slice(self, person=None, gesture=None, subject=None):
+        return self.block(self.select(person, gesture, subject))
+
+
+def main():
+    start = time.perf_counter()
+    ds = Dataset()
+    elapsed = time.perf_counter() - start
+    print(f"{len(ds)} recordings, {len(ds.samples)} samples ({ds.samples.dtype}) "
+          f"loaded in {elapsed * 1e3:.1f} ms from {ds.cache_dir}")
+    for g in ds.gestures:
+        idx = ds.select(gesture=g)
+        print(f"  {g:15s} {len(idx):4d} recordings, {int(ds.lengths[idx].sum()):6d} samples")
+
+
+if __name__ == "__main__":
+    main()
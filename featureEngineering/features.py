@@ -0,0 +1,243 @@
+import argparse
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dataset import CHANNELS, Dataset
+
+
+SAMPLE_RATE_HZ = 100.0
+
+WINDOW = 50          # samples per window (0.5 s)
+STRIDE = 25          # samples between window starts
+
+FEATURE_CACHE_DIR = "features"
+
+
+# ------------------------------------------------------------------ #
+# Per-window features. Each takes (n_windows, channels, window) float
+# windows and returns (n_windows, channels).
+
+def _mean(w, rate_hz):
+    return w.mean(axis=-1)
+
+
+def _std(w, rate_hz):
+    return w.std(axis=-1)
+
+
+def _min(w, rate_hz):
+    return w.min(axis=-1)
+
+
+def _max(w, rate_hz):
+    return w.max(axis=-1)
+
+
+def _energy(w, rate_hz):
+    """Mean square, gravity and offsets included."""
+    return np.einsum("...i,...i->...", w, w) / w.shape[-1]
+
+
+def _zero_crossings(w, rate_hz):
+    """Sign changes of the window around its own mean."""
+    above = w > w.mean(axis=-1, keepdims=True)
+    return np.count_nonzero(above[..., 1:] != above[..., :-1], axis=-1).astype(float)
+
+
+def _jerk(w, rate_hz):
+    """Mean absolute rate of change, in units per second."""
+    return np.abs(np.diff(w, axis=-1)).mean(axis=-1) * rate_hz
+
+
+FEATURES = {
+    "mean": _mean,
+    "std": _std,
+    "min": _min,
+    "max": _max,
+    "energy": _energy,
+    "zero_crossings": _zero_crossings,
+    "jerk": _jerk,
+}
+
+
+class FeatureConfig(namedtuple("FeatureConfig", "window stride features rate_hz")):
+    """Windowing and feature selection; the cache is keyed on it."""
+
+    def __new__(cls, window=WINDOW, stride=STRIDE, features=tuple(FEATURES),
+                rate_hz=SAMPLE_RATE_HZ):
+        unknown = [f for f in features if f not in FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}. Available: {list(FEATURES)}")
+        if window < 2 or stride < 1:
+            raise ValueError("window must be >= 2 and stride >= 1")
+        return super().__new__(cls, int(window), int(stride), tuple(features), float(rate_hz))
+
+    @property
+    def columns(self):
+        return [f"{f}_{c}" for f in self.features for c in CHANNELS]
+
+
+FeatureSet = namedtuple("FeatureSet", "X y columns recording subject")
+
+
+def window_view(rec, window=WINDOW, stride=STRIDE):
+    """(n_windows, channels, window) strided view of an (n, channels) recording.
+
+    Windows start every `stride` samples from the first one; a trailing
+    partial window is dropped and a recording shorter than `window` gives
+    no windows. No data is copied.
+    """
+    if len(rec) < window:
+        return np.empty((0, rec.shape[1], window), dtype=rec.dtype)
+    return sliding_window_view(rec, window, axis=0)[::stride]
+
+
+def compute_features(windows, features=tuple(FEATURES), rate_hz=SAMPLE_RATE_HZ):
+    """(n_windows, channels * len(features)) matrix, feature-major like FeatureConfig.columns."""
+    windows = np.asarray(windows, dtype=float)
+    return np.concatenate([FEATURES[f](windows, rate_hz) for f in features], axis=1)
+
+
+# ------------------------------------------------------------------ #
+# Corpus extraction with a per-feature, per-recording cache
+
+class FeatureCache:
+    """Feature values per recording checksum, one file per (window, stride, feature).
+
+    Changing the feature list only computes the features that were not
+    cached before; new or edited recordings only compute their own rows.
+    Windowing changes start a fresh directory.
+    """
+
+    def __init__(self, cache_dir, config):
+        self.dir = os.path.join(cache_dir, FEATURE_CACHE_DIR,
+                                f"w{config.window}_s{config.stride}_r{config.rate_hz:g}")
+
+    def _path(self, feature):
+        return os.path.join(self.dir, feature + ".npz")
+
+    def load(self, feature):
+        """{sha1: (n_windows, channels) array} for one feature."""
+        try:
+            with np.load(self._path(feature)) as f:
+                keys, offsets, values = f["keys"], f["offsets"], f["values"]
+        except (OSError, KeyError, ValueError):
+            return {}
+        return {k: values[offsets[i]:offsets[i + 1]] for i, k in enumerate(keys.tolist())}
+
+    def save(self, feature, table):
+        keys = sorted(table)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(table[k]) for k in keys])
+        values = np.concatenate([table[k] for k in keys]) if keys else np.empty((0, len(CHANNELS)))
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = self._path(feature) + ".tmp.npz"
+        np.savez(tmp, keys=np.array(keys), offsets=offsets, values=values)
+        os.replace(tmp, self._path(feature))
+
+
+def extract(dataset=None, config=None, indices=None, cache=True):
+    """FeatureSet over the dataset's recordings (all, or `indices`).
+
+    X rows are windows; y is the recording's gesture, recording its index
+    in the dataset and subject its subject, for grouped splits.
+    """
+    dataset = dataset if dataset is not None else Dataset()
+    config = config or FeatureConfig()
+    indices = np.arange(len(dataset)) if indices is None else np.asarray(indices)
+    keys = [dataset.entries[i]["sha1"] for i in indices]
+
+    store = FeatureCache(dataset.cache_dir, config) if cache else None
+    columns = []
+    for feature in config.features:
+        table = store.load(feature) if store else {}
+        missing = [(i, k) for i, k in zip(indices, keys) if k not in table]
+        for i, k in missing:
+            windows = window_view(dataset[i], config.window, config.stride)
+            table[k] = compute_features(windows, (feature,), config.rate_hz)
+        if store and missing:
+            store.save(feature, table)
+        columns.append(np.concatenate([table[k] for k in keys]) if keys
+                       else np.empty((0, len(CHANNELS))))
+
+    counts = np.array([len(table[k]) for k in keys], dtype=np.int64)
+    recording = np.repeat(indices, counts)
+    X = np.concatenate(columns, axis=1) if columns else np.empty((len(recording), 0))
+    return FeatureSet(X, dataset.gesture[recording], config.columns, recording,
+                      dataset.subject[recording])
+
+
+# ------------------------------------------------------------------ #
+# Live stream
+
+class StreamingExtractor:
+    """Feature rows for a live (n, channels) sample stream.
+
+    push() accepts any number of new samples and returns a row for every
+    window completed, using the same window placement and feature code as
+    extract(), so a recording pushed in any chunking yields the same rows.
+    """
+
+    def __init__(self, config=None, channels=len(CHANNELS)):
+        self.config = config or FeatureConfig()
+        self.buf = np.empty((0, channels))
+        self.next_start = 0      # stream index of the next window's first sample
+        self.seen = 0            # stream index of buf[0]
+
+    def reset(self):
+        self.buf = self.buf[:0]
+        self.next_start = 0
+        self.seen = 0
+
+    def push(self, samples):
+        cfg = self.config
+        samples = np.asarray(samples, dtype=float).reshape(-1, self.buf.shape[1])
+        buf = np.concatenate([self.buf, samples]) if len(self.buf) else samples
+
+        first = self.next_start - self.seen
+        windows = window_view(buf[first:], cfg.window, cfg.stride)
+        self.next_start += len(windows) * cfg.stride
+
+        # Keep only what the next window still needs
+        keep_from = min(self.next_start - self.seen, len(buf))
+        self.buf = buf[keep_from:].copy()
+        self.seen += keep_from
+
+        if not len(windows):
+            return np.empty((0, len(cfg.columns)))
+        return compute_features(windows, cfg.features, cfg.rate_hz)
+
+
+def write_csv(fs, path):
+    """data.csv for model_generator.py: f1..fN, label."""
+    import pandas as pd
+    df = pd.DataFrame(fs.X, columns=[f"f{i + 1}" for i in range(fs.X.shape[1])])
+    df["label"] = fs.y
+    df.to_csv(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sliding-window features for the gesture corpus")
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--stride", type=int, default=STRIDE)
+    parser.add_argument("--features", nargs="+", default=list(FEATURES), choices=list(FEATURES))
+    parser.add_argument("--csv", help="also write model_generator's data.csv here")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    config = FeatureConfig(args.window, args.stride, args.features)
+    start = time.perf_counter()
+    fs = extract(config=config, cache=not args.no_cache)
+    print(f"{fs.X.shape[0]} windows x {fs.X.shape[1]} features from "
+          f"{len(set(fs.recording.tolist()))} recordings in {(time.perf_counter() - start) * 1e3:.1f} ms")
+    if args.csv:
+        write_csv(fs, args.csv)
+        print(f"Wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
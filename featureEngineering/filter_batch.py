@@ -0,0 +1,259 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset import CHANNELS, DATA_ROOT, Dataset, read_csv
+from filters import (KalmanFilter, compute_alpha_hpf, compute_alpha_lpf, high_pass_filter,
+                     low_pass_filter, moving_average_filter, stack_recordings,
+                     unstack_recordings)
+
+
+SAMPLE_RATE_HZ = 100.0
+SPEC = "lpf:5,hpf:0.5,ma:5"
+OUTPUT_DTYPE = "float32"
+
+# Recordings per worker task
+CHUNK_SIZE = 32
+
+
+# ------------------------------------------------------------------ #
+# Filter spec
+#
+# Comma-separated outputs, each a "+"-chain of stages applied in order:
+#   lpf:<cutoff Hz>  hpf:<cutoff Hz>  ma:<window>  kalman[:<q>:<r>]
+# "lpf:5,lpf:10,lpf:5+ma:5" writes outputs LPF5, LPF10 and LPF5_MA5.
+
+def _kalman(stack, q=0.022, r=0.617):
+    # KalmanFilter is time-first; causal, so zero padding never leaks back
+    return np.moveaxis(KalmanFilter(q, r).process(np.moveaxis(stack, 1, 0)), 0, 1)
+
+
+STAGES = {
+    "lpf": lambda stack, dt, cutoff: low_pass_filter(stack, compute_alpha_lpf(dt, float(cutoff))),
+    "hpf": lambda stack, dt, cutoff: high_pass_filter(stack, compute_alpha_hpf(dt, float(cutoff))),
+    "ma": lambda stack, dt, window: moving_average_filter(stack, int(window)),
+    "kalman": lambda stack, dt, *qr: _kalman(stack, *map(float, qr)),
+}
+
+# Accepted argument counts of each stage
+STAGE_ARGS = {"lpf": (1,), "hpf": (1,), "ma": (1,), "kalman": (0, 2)}
+
+
+def output_name(stages):
+    """LPF5_MA5 for lpf:5+ma:5: stages in order, each with its arguments."""
+    return "_".join(n.upper() + "_".join(args) for n, args in stages)
+
+
+def parse_spec(spec):
+    """[(output name, [(stage, args), ...]), ...] for a filter spec string."""
+    outputs = []
+    for chain in spec.split(","):
+        stages = []
+        for stage in chain.strip().split("+"):
+            name, *args = stage.strip().lower().split(":")
+            if name not in STAGES:
+                raise ValueError(f"Unknown filter '{name}' in '{spec}'. Available: {list(STAGES)}")
+            if len(args) not in STAGE_ARGS[name]:
+                raise ValueError(f"Filter stage '{stage.strip()}' in '{spec}' takes "
+                                 f"{' or '.join(map(str, STAGE_ARGS[name]))} argument(s)")
+            stages.append((name, args))
+        outputs.append((output_name(stages), stages))
+    names = [n for n, _ in outputs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Outputs must differ in their filter chains: {names}")
+    return outputs
+
+
+def apply_spec(recordings, outputs, sample_rate_hz=SAMPLE_RATE_HZ):
+    """{output name: [filtered recording, ...]} with every stage run on one stack.
+
+    The padding is zeroed again after each stage, so a non-causal stage
+    later in a chain (ma) sees the same zeros as on a recording alone and
+    the output does not depend on which recordings share the stack.
+    """
+    stack, lengths = stack_recordings(recordings)
+    padding = np.arange(stack.shape[1]) >= lengths[:, None]
+    dt = 1.0 / sample_rate_hz
+    result = {}
+    for name, stages in outputs:
+        y = stack
+        for stage, args in stages:
+            y = STAGES[stage](y, dt, *args)
+            y[padding] = 0.0
+        result[name] = unstack_recordings(y, lengths)
+    return result
+
+
+# ------------------------------------------------------------------ #
+# Workers
+
+_dataset = None
+
+
+def _load(source, root):
+    """source is a dataset index or a CSV path."""
+    global _dataset
+    if isinstance(source, str):
+        return read_csv(source)
+    if _dataset is None or _dataset.root != root:
+        _dataset = Dataset(root)
+    return _dataset[source]
+
+
+def _filter_chunk(job):
+    sources, root, spec, sample_rate_hz, dtype = job
+    result = apply_spec([_load(s, root) for s in sources], parse_spec(spec), sample_rate_hz)
+    return {name: [r.astype(dtype) for r in recs] for name, recs in result.items()}
+
+
+# ------------------------------------------------------------------ #
+# Output: <out>/manifest.json, offsets.npy and one (N, 6) <OUTPUT>.npy per
+# filter chain, the same layout as the dataset cache
+
+def _write_npy(path, arr):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def open_output(out_dir):
+    """(manifest, offsets, {output: memory-mapped (N, 6) array}) of a filter_batch run."""
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    offsets = np.load(os.path.join(out_dir, "offsets.npy"))
+    arrays = {name: np.load(os.path.join(out_dir, name + ".npy"), mmap_mode="r")
+              for name in manifest["outputs"]}
+    return manifest, offsets, arrays
+
+
+def write_csvs(out_dir, entries, offsets, arrays, raw):
+    """One CSV per recording, original columns plus <channel>_<OUTPUT> columns."""
+    import pandas as pd
+    for i, entry in enumerate(entries):
+        df = pd.DataFrame(np.asarray(raw[i]), columns=CHANNELS)
+        for name, arr in arrays.items():
+            block = arr[offsets[i]:offsets[i + 1]]
+            for c, col in enumerate(CHANNELS):
+                df[f"{col}_{name}"] = block[:, c]
+        path = os.path.join(out_dir, "csv", os.path.splitext(entry["path"])[0] + ".csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_csv(path, index=False)
+
+
+def run(out_dir, spec=SPEC, paths=None, root=DATA_ROOT, sample_rate_hz=SAMPLE_RATE_HZ,
+        dtype=OUTPUT_DTYPE, workers=None, csv=False):
+    """Filter the data tree (paths=None) or the given CSVs into out_dir."""
+    outputs = parse_spec(spec)
+    if paths is None:
+        ds = Dataset(root)
+        sources = list(range(len(ds)))
+        entries = [dict(path=e["path"], person=e["person"], gesture=e["gesture"],
+                        subject=e["subject"], sample=e["sample"]) for e in ds.entries]
+    else:
+        sources = [os.path.abspath(p) for p in paths]
+        # Paths relative to the inputs' common folder, mirrored by the CSV export
+        base = os.path.commonpath([os.path.dirname(p) for p in sources]) if sources else ""
+        entries = [dict(path=os.path.relpath(p, base)) for p in sources]
+
+    jobs = [(sources[i:i + CHUNK_SIZE], root, spec, sample_rate_hz, dtype)
+            for i in range(0, len(sources), CHUNK_SIZE)]
+    if workers == 1 or len(jobs) <= 1:
+        parts = [_filter_chunk(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_filter_chunk, jobs))
+
+    os.makedirs(out_dir, exist_ok=True)
+    lengths = [len(r) for part in parts for r in part[outputs[0][0]]]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    for name, _ in outputs:
+        recs = [r for part in parts for r in part[name]]
+        arr = np.concatenate(recs) if recs else np.empty((0, len(CHANNELS)), dtype=dtype)
+        _write_npy(os.path.join(out_dir, name + ".npy"), arr)
+    _write_npy(os.path.join(out_dir, "offsets.npy"), offsets)
+    for entry, n in zip(entries, lengths):
+        entry["length"] = n
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(dict(spec=spec, sample_rate_hz=sample_rate_hz, dtype=dtype, channels=CHANNELS,
+                       outputs=[n for n, _ in outputs], entries=entries), f, indent=1)
+
+    if csv:
+        _, offsets, arrays = open_output(out_dir)
+        write_csvs(out_dir, entries, offsets, arrays, [_load(s, root) for s in sources])
+    return entries
+
+
+def verify(spec="lpf:5+ma:5," + SPEC + ",kalman", root=DATA_ROOT, seed=0):
+    """Check that chunking never changes a recording's output.
+
+    Every recording is filtered alone and again in a random chunk of
+    recordings of other lengths; both must agree exactly. Returns the
+    number of mismatching recordings and the number checked.
+    """
+    outputs = parse_spec(spec)
+    recs = Dataset(root).recordings()
+    rng = np.random.default_rng(seed)
+    failures = 0
+    for i, rec in enumerate(recs):
+        others = rng.choice(len(recs), size=min(CHUNK_SIZE - 1, len(recs) - 1), replace=False)
+        chunk = [recs[j] for j in others if j != i] + [rec]
+        alone = apply_spec([rec], outputs)
+        mixed = apply_spec(chunk, outputs)
+        for name, _ in outputs:
+            if not np.array_equal(alone[name][0], mixed[name][-1]):
+                failures += 1
+                print(f"MISMATCH recording {i} ({name})")
+                break
+    return failures, len(recs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter many recordings into a compact columnar store")
+    parser.add_argument("inputs", nargs="*",
+                        help="CSV files or globs (default: the whole data/ tree)")
+    parser.add_argument("-o", "--out", help="output directory")
+    parser.add_argument("-f", "--filters", default=SPEC,
+                        help="comma-separated outputs, each a +-chain of lpf:<Hz>, hpf:<Hz>, "
+                             f"ma:<window>, kalman[:q:r] (default {SPEC})")
+    parser.add_argument("--rate", type=float, default=SAMPLE_RATE_HZ, help="sample rate in Hz")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default=OUTPUT_DTYPE)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--csv", action="store_true", help="also write one CSV per recording")
+    parser.add_argument("--verify", action="store_true",
+                        help="check that each recording filters the same alone and in a mixed chunk")
+    args = parser.parse_args()
+
+    if args.verify:
+        failures, n = verify()
+        print(f"{n - failures}/{n} recordings identical alone and in mixed-length chunks")
+        return 1 if failures else 0
+    if not args.out:
+        parser.error("--out is required")
+
+    paths = None
+    if args.inputs:
+        paths = sorted({p for pattern in args.inputs for p in glob.glob(pattern)})
+        if not paths:
+            parser.error("no CSV files match the inputs")
+
+    start = time.perf_counter()
+    entries = run(args.out, args.filters, paths, sample_rate_hz=args.rate, dtype=args.dtype,
+                  workers=args.workers, csv=args.csv)
+    size = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out)
+               if f.endswith(".npy"))
+    print(f"Filtered {len(entries)} recordings ({args.filters}) in "
+          f"{time.perf_counter() - start:.2f} s -> {args.out} ({size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
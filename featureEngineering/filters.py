@@ -0,0 +1,276 @@
+import numpy as np
+from scipy.signal import lfilter
+from scipy.ndimage import convolve1d
+
+
+CHANNELS = ["Accel_X", "Accel_Y", "Accel_Z", "Gyro_X", "Gyro_Y", "Gyro_Z"]
+
+
+def compute_alpha_lpf(dt, cutoff_hz):
+    """Return alpha for first-order low-pass filter."""
+    # RC = 1 / (2π f_c)
+    rc = 1.0 / (2.0 * np.pi * cutoff_hz)
+    alpha = dt / (rc + dt)
+    return alpha
+
+
+def compute_alpha_hpf(dt, cutoff_hz):
+    """Return alpha for first-order high-pass filter."""
+    # RC = 1 / (2π f_c)
+    rc = 1.0 / (2.0 * np.pi * cutoff_hz)
+    alpha = rc / (rc + dt)
+    return alpha
+
+
+def _time_axis(x, axis):
+    # 1-D signals are filtered along their only axis, (n_samples, channels)
+    # and (n_recordings, n_samples, channels) stacks along the samples axis.
+    if axis is not None:
+        return axis
+    return 0 if x.ndim == 1 else x.ndim - 2
+
+
+def _first(x, axis):
+    return np.take(x, [0], axis=axis)
+
+
+def low_pass_filter(x, alpha, axis=None):
+    """y[i] = y[i-1] + alpha * (x[i] - y[i-1]), seeded with y[0] = x[0].
+
+    Works on a single column, an (n_samples, 6) array or a stack of
+    recordings in one call.
+    """
+    x = np.asarray(x, dtype=float)
+    axis = _time_axis(x, axis)
+    if x.shape[axis] == 0:
+        return x.copy()
+
+    # Direct form II transposed: y[0] = alpha * x[0] + zi = x[0]
+    zi = (1.0 - alpha) * _first(x, axis)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, axis=axis, zi=zi)
+    return y
+
+
+def high_pass_filter(x, alpha, axis=None):
+    """y[i] = alpha * (y[i-1] + x[i] - x[i-1]), seeded with y[0] = 0."""
+    x = np.asarray(x, dtype=float)
+    axis = _time_axis(x, axis)
+    if x.shape[axis] == 0:
+        return x.copy()
+
+    # y[0] = alpha * x[0] + zi = 0
+    zi = -alpha * _first(x, axis)
+    y, _ = lfilter([alpha, -alpha], [1.0, -alpha], x, axis=axis, zi=zi)
+    return y
+
+
+def moving_average_filter(x, window_size, axis=None):
+    """Centered moving average over a zero-padded signal; len(x) outputs.
+
+    Equal to np.convolve(x, kernel, mode='same') when len(x) >= window_size.
+    For shorter signals np.convolve returns window_size samples instead;
+    this returns the first len(x) of those for x zero-padded at the end
+    to window_size.
+    """
+    x = np.asarray(x, dtype=float)
+    if window_size <= 1:
+        return x.copy()
+
+    axis = _time_axis(x, axis)
+    kernel = np.ones(window_size) / window_size
+    # np.convolve(mode='same') centres the window (window_size - 1) // 2
+    # samples behind the output and zero-pads both ends.
+    origin = window_size // 2 - (window_size - 1) // 2
+    return convolve1d(x, kernel, axis=axis, mode="constant", cval=0.0,
+                      origin=-origin)
+
+
+def stack_recordings(recordings):
+    """Zero-pad a list of (n_i, channels) arrays into one (k, n_max, channels) stack.
+
+    The filters above are causal (LPF/HPF) or zero-padded (moving average),
+    so trailing padding never changes the first n_i outputs of a recording.
+    Returns the stack and the original lengths.
+    """
+    recordings = [np.asarray(r, dtype=float) for r in recordings]
+    lengths = np.array([len(r) for r in recordings], dtype=np.int64)
+    n_max = int(lengths.max()) if len(lengths) else 0
+    tail = recordings[0].shape[1:] if recordings else ()
+
+    stack = np.zeros((len(recordings), n_max) + tail)
+    for i, r in enumerate(recordings):
+        stack[i, :len(r)] = r
+    return stack, lengths
+
+
+def unstack_recordings(stack, lengths):
+    """Inverse of stack_recordings: views of each recording without padding."""
+    return [stack[i, :n] for i, n in enumerate(lengths)]
+
+
+def filter_recordings(recordings, sample_rate_hz=100.0, cutoff_lpf_hz=None,
+                      cutoff_hpf_hz=None, ma_window=None):
+    """Filter many recordings at once.
+
+    Returns a dict of lists keyed by "LPF", "HPF" and "MA" for every filter
+    whose parameter is given.
+    """
+    stack, lengths = stack_recordings(recordings)
+    dt = 1.0 / sample_rate_hz
+
+    out = {}
+    if cutoff_lpf_hz is not None:
+        y = low_pass_filter(stack, compute_alpha_lpf(dt, cutoff_lpf_hz))
+        out["LPF"] = unstack_recordings(y, lengths)
+    if cutoff_hpf_hz is not None:
+        y = high_pass_filter(stack, compute_alpha_hpf(dt, cutoff_hpf_hz))
+        out["HPF"] = unstack_recordings(y, lengths)
+    if ma_window is not None:
+        y = moving_average_filter(stack, ma_window)
+        out["MA"] = unstack_recordings(y, lengths)
+    return out
+
+
+# ------------------------------------------------------------------ #
+# Streaming filters
+#
+# Each object keeps its internal state between process() calls, so a
+# recording fed whole, in BLE-sized chunks or one sample at a time gives
+# the same output. Chunks are time-first: (n,) for one channel or
+# (n, channels) for several, e.g. (1, 6) for a single live sample.
+
+
+class LowPassFilter:
+    """Streaming version of low_pass_filter()."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return x.copy()
+        if self.zi is None:
+            self.zi = (1.0 - self.alpha) * x[:1]
+        if len(x) == 1:
+            # Same arithmetic as lfilter, without its per-call overhead
+            y = self.alpha * x + self.zi
+            self.zi = (1.0 - self.alpha) * y
+            return y
+        y, self.zi = lfilter([self.alpha], [1.0, self.alpha - 1.0], x,
+                             axis=0, zi=self.zi)
+        return y
+
+
+class HighPassFilter:
+    """Streaming version of high_pass_filter()."""
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.zi = None
+
+    def process(self, x):
+        x = np.asarray(x, dtype=float)
+        if len(x) == 0:
+            return x.copy()
+        if self.zi is None:
+            self.zi = -self.alpha * x[:1]
+        if len(x) == 1:
+            y = self.alpha * x + self.zi
+            self.zi = self.alpha * y - self.alpha * x
+            return y
+        y, self.zi = lfilter([self.alpha, -self.alpha], [1.0, -self.alpha], x,
+                             axis=0, zi=self.zi)
+        return y
+
+
+class MovingAverageFilter:
+    """Causal moving average over the last window_size samples.
+
+    A live stream cannot look ahead, so the output is
+    moving_average_filter() delayed by `delay` samples.
+    """
+
+    def __init__(self, window_size):
+        self.window_size = max(int(window_size), 1)
+        self.delay = (self.window_size - 1) // 2
+        self.reset()
+
+    def reset(self):
+        self.history = None
+
+    def process(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.window_size == 1:
+            return x.copy()
+        if self.history is None:
+            # Samples before the start count as zeros, as in np.convolve.
+            self.history = np.zeros((self.window_size - 1,) + x.shape[1:])
+
+        ext = np.concatenate([self.history, x], axis=0)
+        self.history = ext[len(ext) - (self.window_size - 1):]
+        windows = np.lib.stride_tricks.sliding_window_view(ext, self.window_size, axis=0)
+        return windows.sum(axis=-1) / self.window_size
+
+
+class KalmanFilter:
+    """Per-channel scalar Kalman filter from kalmanFilter/kalman.c.
+
+    The first sample seeds the estimate (as kalman.c does with its initial
+    measurement) and every later sample runs one predict/correct step. The
+    gain does not depend on the data, so once it has settled the remaining
+    samples go through lfilter as a fixed first-order filter.
+    """
+
+    def __init__(self, q=0.022, r=0.617):
+        self.q = q
+        self.r = r
+        self.reset()
+
+    def reset(self):
+        self.x_est = None
+        self.p = 0.0
+        self.k = None      # steady-state gain once the transient is over
+        self.zi = None
+
+    def _step_gain(self):
+        p_temp = self.p + self.q
+        k = p_temp * (1.0 / (p_temp + self.r))
+        p = (1.0 - k) * p_temp
+        if abs(p - self.p) <= 1e-15 * p:
+            self.k = k
+        self.p = p
+        return k
+
+    def process(self, z):
+        z = np.asarray(z, dtype=float)
+        y = np.empty_like(z)
+        if len(z) == 0:
+            return y
+
+        i = 0
+        if self.x_est is None:
+            self.x_est = z[0].copy()
+            y[0] = self.x_est
+            i = 1
+
+        while i < len(z) and self.k is None:
+            k = self._step_gain()
+            self.x_est = self.x_est + k * (z[i] - self.x_est)
+            y[i] = self.x_est
+            i += 1
+
+        if i < len(z):
+            if self.zi is None:
+                self.zi = (1.0 - self.k) * np.asarray(self.x_est)[None]
+            y[i:], self.zi = lfilter([self.k], [1.0, self.k - 1.0], z[i:],
+                                     axis=0, zi=self.zi)
+            self.x_est = y[-1].copy()
+        return y
@@ -0,0 +1,189 @@
+import math
+
+import numpy as np
+
+from filters import stack_recordings
+
+
+SAMPLE_RATE_HZ = 100.0
+ACCEL_SENS = 16384.0     # LSB per g
+GYRO_SENS = 131.0        # LSB per deg/s
+
+MAHONY_KP = 1.0          # proportional gain pulling towards the accel reference
+MAHONY_KI = 0.02         # integral gain, absorbs gyro bias on roll/pitch
+
+# Stacks with fewer recordings than this are cheaper to run one sample at a
+# time with Python floats than one time step at a time with NumPy.
+MIN_VECTOR_STACK = 8
+
+
+def _rsqrt_scalar(s):
+    return 1.0 / math.sqrt(s) if s > 0.0 else 0.0
+
+
+def _rsqrt_array(s):
+    with np.errstate(divide="ignore"):
+        r = 1.0 / np.sqrt(s)
+    r[s <= 0.0] = 0.0
+    return r
+
+
+def _mahony_step(q, integral, g, a, dt, kp, ki, rsqrt):
+    """One Mahony update. Works on floats or on equally shaped arrays."""
+    q0, q1, q2, q3 = q
+    ix, iy, iz = integral
+    gx, gy, gz = g
+    ax, ay, az = a
+
+    # A zero accel vector gives r = 0 and therefore no correction
+    r = rsqrt(ax * ax + ay * ay + az * az)
+    ax, ay, az = ax * r, ay * r, az * r
+
+    # Gravity direction predicted by q, in the sensor frame
+    vx = 2.0 * (q1 * q3 - q0 * q2)
+    vy = 2.0 * (q0 * q1 + q2 * q3)
+    vz = q0 * q0 - q1 * q1 - q2 * q2 + q3 * q3
+
+    ex = ay * vz - az * vy
+    ey = az * vx - ax * vz
+    ez = ax * vy - ay * vx
+
+    ix = ix + ki * ex * dt
+    iy = iy + ki * ey * dt
+    iz = iz + ki * ez * dt
+
+    h = 0.5 * dt
+    gx = (gx + kp * ex + ix) * h
+    gy = (gy + kp * ey + iy) * h
+    gz = (gz + kp * ez + iz) * h
+
+    # q += 0.5 * q * (0, g) * dt
+    n0 = q0 - q1 * gx - q2 * gy - q3 * gz
+    n1 = q1 + q0 * gx + q2 * gz - q3 * gy
+    n2 = q2 + q0 * gy - q1 * gz + q3 * gx
+    n3 = q3 + q0 * gz + q1 * gy - q2 * gx
+
+    r = rsqrt(n0 * n0 + n1 * n1 + n2 * n2 + n3 * n3)
+    return (n0 * r, n1 * r, n2 * r, n3 * r), (ix, iy, iz)
+
+
+def initial_quaternion(ax, ay, az, sqrt=math.sqrt, atan2=math.atan2,
+                       cos=math.cos, sin=math.sin):
+    """Roll and pitch from the accel vector, zero yaw."""
+    roll = atan2(ay, az)
+    pitch = atan2(-ax, sqrt(ay * ay + az * az))
+    cr, sr = cos(roll * 0.5), sin(roll * 0.5)
+    cp, sp = cos(pitch * 0.5), sin(pitch * 0.5)
+    return (cr * cp, sr * cp, cr * sp, -sr * sp)
+
+
+def quaternion_to_rotation_matrix(q):
+    """Sensor-to-world rotation matrix (ZYX convention, like euler_to_rotation_matrix)."""
+    q0, q1, q2, q3 = q
+    return [
+        [1.0 - 2.0 * (q2 * q2 + q3 * q3), 2.0 * (q1 * q2 - q0 * q3), 2.0 * (q1 * q3 + q0 * q2)],
+        [2.0 * (q1 * q2 + q0 * q3), 1.0 - 2.0 * (q1 * q1 + q3 * q3), 2.0 * (q2 * q3 - q0 * q1)],
+        [2.0 * (q1 * q3 - q0 * q2), 2.0 * (q2 * q3 + q0 * q1), 1.0 - 2.0 * (q1 * q1 + q2 * q2)],
+    ]
+
+
+def quaternion_to_euler(q):
+    """(roll, pitch, yaw) in radians for a (..., 4) array of quaternions."""
+    q = np.asarray(q, dtype=float)
+    q0, q1, q2, q3 = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    roll = np.arctan2(2.0 * (q0 * q1 + q2 * q3), 1.0 - 2.0 * (q1 * q1 + q2 * q2))
+    pitch = np.arcsin(np.clip(2.0 * (q0 * q2 - q3 * q1), -1.0, 1.0))
+    yaw = np.arctan2(2.0 * (q0 * q3 + q1 * q2), 1.0 - 2.0 * (q2 * q2 + q3 * q3))
+    return roll, pitch, yaw
+
+
+class MahonyFilter:
+    """Streaming Mahony attitude filter for one IMU.
+
+    Works on plain floats so a live update costs no array allocations.
+    The first update only sets the initial attitude from the accelerometer.
+    """
+
+    __slots__ = ("kp", "ki", "q", "integral")
+
+    def __init__(self, kp=MAHONY_KP, ki=MAHONY_KI):
+        self.kp = kp
+        self.ki = ki
+        self.reset()
+
+    def reset(self):
+        self.q = None
+        self.integral = (0.0, 0.0, 0.0)
+
+    def update(self, gx, gy, gz, ax, ay, az, dt):
+        """Gyro in rad/s, accel in any unit. Returns the new quaternion."""
+        if self.q is None:
+            self.q = initial_quaternion(ax, ay, az)
+        else:
+            self.q, self.integral = _mahony_step(
+                self.q, self.integral, (gx, gy, gz), (ax, ay, az), dt,
+                self.kp, self.ki, _rsqrt_scalar)
+        return self.q
+
+    def rotation_matrix(self):
+        return quaternion_to_rotation_matrix(self.q)
+
+    def euler(self):
+        q0, q1, q2, q3 = self.q
+        roll = math.atan2(2.0 * (q0 * q1 + q2 * q3), 1.0 - 2.0 * (q1 * q1 + q2 * q2))
+        pitch = math.asin(max(-1.0, min(1.0, 2.0 * (q0 * q2 - q3 * q1))))
+        yaw = math.atan2(2.0 * (q0 * q3 + q1 * q2), 1.0 - 2.0 * (q2 * q2 + q3 * q3))
+        return roll, pitch, yaw
+
+
+def fuse_batch(imu, dt=1.0 / SAMPLE_RATE_HZ, kp=MAHONY_KP, ki=MAHONY_KI,
+               accel_sens=ACCEL_SENS, gyro_sens=GYRO_SENS):
+    """Quaternions for raw (n, 6) or (k, n, 6) ax, ay, az, gx, gy, gz arrays.
+
+    dt is a scalar or per-sample (n,) / (k, n) array. Returns (..., n, 4).
+    Each recording starts from its own first sample, exactly as a fresh
+    MahonyFilter would.
+    """
+    imu = np.asarray(imu, dtype=float)
+    stack = imu[None] if imu.ndim == 2 else imu
+    k, n, _ = stack.shape
+    out = np.empty((k, n, 4))
+    if n == 0:
+        return out[0] if imu.ndim == 2 else out
+
+    accel = stack[..., :3] / accel_sens
+    gyro = np.radians(stack[..., 3:] / gyro_sens)
+    dt = np.broadcast_to(np.asarray(dt, dtype=float), (k, n))
+
+    if k < MIN_VECTOR_STACK:
+        for i in range(k):
+            f = MahonyFilter(kp, ki)
+            for t, (g, a, step) in enumerate(zip(gyro[i].tolist(), accel[i].tolist(),
+                                                 dt[i].tolist())):
+                out[i, t] = f.update(*g, *a, step)
+    else:
+        # Time steps stay sequential; every operation runs across all k recordings.
+        # Component-major copies keep each step's slices contiguous.
+        a = np.ascontiguousarray(accel.transpose(2, 1, 0))
+        g = np.ascontiguousarray(gyro.transpose(2, 1, 0))
+        dts = np.ascontiguousarray(dt.T)
+
+        q = initial_quaternion(a[0, 0], a[1, 0], a[2, 0], sqrt=np.sqrt,
+                               atan2=np.arctan2, cos=np.cos, sin=np.sin)
+        out[:, 0] = np.stack(q, axis=-1)
+        integral = (np.zeros(k), np.zeros(k), np.zeros(k))
+        for t in range(1, n):
+            q, integral = _mahony_step(q, integral, (g[0, t], g[1, t], g[2, t]),
+                                       (a[0, t], a[1, t], a[2, t]), dts[t],
+                                       kp, ki, _rsqrt_array)
+            for c in range(4):
+                out[:, t, c] = q[c]
+
+    return out[0] if imu.ndim == 2 else out
+
+
+def fuse_recordings(recordings, **kwargs):
+    """fuse_batch() over a list of recordings of different lengths."""
+    stack, lengths = stack_recordings(recordings)
+    quats = fuse_batch(stack, **kwargs)
+    return [quats[i, :n] for i, n in enumerate(lengths)]
@@ -1,5 +1,6 @@
 import pandas as pd
-import numpy as np
+
+from filters import CHANNELS, compute_alpha_hpf, high_pass_filter
 
 INPUT_FILE = "data.csv"              
 OUTPUT_FILE = "data_hpf.csv"         
@@ -9,27 +10,10 @@ CUTOFF_HPF_HZ = 0.5
 
 
 
-def compute_alpha_hpf(dt, cutoff_hz):
-    """Return alpha for first-order high-pass filter."""
-    rc = 1.0 / (2.0 * np.pi * cutoff_hz)
-    alpha = rc / (rc + dt)
-    return alpha
-
-
-def high_pass_filter(x, alpha):
-
-    y = np.zeros_like(x, dtype=float)
-    y[0] = 0.0
-    for i in range(1, len(x)):
-        y[i] = alpha * (y[i-1] + x[i] - x[i-1])
-    return y
-
-
 def main():
     df = pd.read_csv(INPUT_FILE)
 
-    expected_cols = ["Accel_X", "Accel_Y", "Accel_Z",
-                     "Gyro_X", "Gyro_Y", "Gyro_Z"]
+    expected_cols = CHANNELS
 
     for col in expected_cols:
         if col not in df.columns:
@@ -40,9 +24,9 @@ def main():
 
     print(f"[HPF] dt = {dt:.6f} s, cutoff = {CUTOFF_HPF_HZ} Hz, alpha = {alpha_hpf:.4f}")
 
-    for col in expected_cols:
-        x = df[col].values.astype(float)
-        df[f"{col}_HPF"] = high_pass_filter(x, alpha_hpf)
+    y = high_pass_filter(df[expected_cols].values, alpha_hpf)
+    for i, col in enumerate(expected_cols):
+        df[f"{col}_HPF"] = y[:, i]
 
     df.to_csv(OUTPUT_FILE, index=False)
     print(f"[HPF] Saved filtered data to: {OUTPUT_FILE}")
@@ -0,0 +1,47 @@
+#include "kalman_filter.h"
+
+void kalman_init(kalman_state *s, float Q, float R) {
+    s->x_est_last = 0;
+    s->P_last = 0;
+    s->Q = Q;
+    s->R = R;
+    s->initialized = 0;
+}
+
+float kalman_update(kalman_state *s, float z_measured) {
+    float K;
+    float P;
+    float P_temp;
+    float x_temp_est;
+    float x_est;
+
+    //initialize with a measurement
+    if (!s->initialized) {
+        s->x_est_last = z_measured;
+        s->initialized = 1;
+        return z_measured;
+    }
+
+    //do a prediction
+    x_temp_est = s->x_est_last;
+    P_temp = s->P_last + s->Q;
+    //calculate the Kalman gain
+    K = P_temp * (1.0/(P_temp + s->R));
+    //correct
+    x_est = x_temp_est + K * (z_measured - x_temp_est);
+    P = (1- K) * P_temp;
+
+    //update our last's
+    s->P_last = P;
+    s->x_est_last = x_est;
+    return x_est;
+}
+
+void kalman_run(kalman_state *states, int n_channels,
+                const float *z, float *out, long n_samples) {
+    for (long i = 0; i < n_samples; i++) {
+        for (int c = 0; c < n_channels; c++) {
+            out[i * n_channels + c] = kalman_update(&states[c], z[i * n_channels + c]);
+        }
+    }
+}
@@ -0,0 +1,23 @@
+#ifndef KALMAN_FILTER_H
+#define KALMAN_FILTER_H
+
+//one scalar kalman filter (constant model), state kept between calls
+typedef struct {
+    float x_est_last;
+    float P_last;
+    float Q;
+    float R;
+    int initialized;   //0 until the first measurement seeds x_est_last
+} kalman_state;
+
+void kalman_init(kalman_state *s, float Q, float R);
+
+//one predict/correct step, returns the new estimate
+float kalman_update(kalman_state *s, float z_measured);
+
+//runs n_channels independent filters over z[n_samples][n_channels]
+//(row-major, time first) into out, in one call
+void kalman_run(kalman_state *states, int n_channels,
+                const float *z, float *out, long n_samples);
+
+#endif
@@ -0,0 +1,232 @@
+import argparse
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from filters import _time_axis
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KALMAN_DIR = os.path.join(HERE, "kalmanFilter")
+SOURCES = ["kalman_filter.c"]
+BUILD_DIR = os.path.join(HERE, ".cache")
+
+# No FMA contraction, so the library rounds exactly like a plain build of
+# kalman.c on the same machine
+CFLAGS = ["-O2", "-ffp-contract=off"]
+
+Q = 0.022
+R = 0.617
+
+# kalman_state from kalman_filter.h; all members are 4 bytes, so no padding
+STATE_DTYPE = np.dtype([("x_est_last", np.float32), ("P_last", np.float32),
+                        ("Q", np.float32), ("R", np.float32), ("initialized", np.intc)])
+
+
+def build_library(cflags=CFLAGS, build_dir=BUILD_DIR):
+    """Compile kalmanFilter/kalman_filter.c into a shared library, cached by source hash."""
+    cc = shutil.which(os.environ.get("CC", "gcc"))
+    if cc is None:
+        raise ImportError("kalman_c needs a C compiler (set CC or install gcc)")
+
+    paths = [os.path.join(KALMAN_DIR, s) for s in SOURCES + ["kalman_filter.h"]]
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    digest.update(" ".join(cflags).encode())
+    lib = os.path.join(build_dir, f"kalman_{digest.hexdigest()[:16]}.so")
+    if not os.path.exists(lib):
+        os.makedirs(build_dir, exist_ok=True)
+        tmp = lib + ".tmp"
+        subprocess.run([cc, *cflags, "-shared", "-fPIC",
+                        *[os.path.join(KALMAN_DIR, s) for s in SOURCES], "-o", tmp], check=True)
+        os.replace(tmp, lib)
+    return lib
+
+
+_lib = None
+
+
+def load_library():
+    global _lib
+    if _lib is None:
+        lib = ctypes.CDLL(build_library())
+        lib.kalman_run.argtypes = [
+            np.ctypeslib.ndpointer(STATE_DTYPE, flags="C_CONTIGUOUS"), ctypes.c_int,
+            np.ctypeslib.ndpointer(np.float32, flags="C_CONTIGUOUS"),
+            np.ctypeslib.ndpointer(np.float32, flags="C_CONTIGUOUS"), ctypes.c_long]
+        lib.kalman_run.restype = None
+        _lib = lib
+    return _lib
+
+
+def new_states(n_channels, q=Q, r=R):
+    """kalman_init() for n_channels filters."""
+    states = np.zeros(n_channels, dtype=STATE_DTYPE)
+    states["Q"] = q
+    states["R"] = r
+    return states
+
+
+def _run(states, z):
+    """z is (n, channels) float32, C-contiguous; states are updated in place."""
+    out = np.empty_like(z)
+    load_library().kalman_run(states, z.shape[1], z, out, len(z))
+    return out
+
+
+class CKalmanFilter:
+    """kalman.c run on time-first chunks of any shape, state carried between calls.
+
+    Works in float32 like the C code, and returns float32. The first sample
+    of each channel seeds its estimate, like filters.KalmanFilter.
+    """
+
+    def __init__(self, q=Q, r=R):
+        self.q = q
+        self.r = r
+        self.reset()
+
+    def reset(self):
+        self.states = None
+
+    def process(self, z):
+        z = np.asarray(z, dtype=np.float32)
+        flat = np.ascontiguousarray(z.reshape(len(z), -1))
+        if self.states is None:
+            self.states = new_states(flat.shape[1], self.q, self.r)
+        elif len(self.states) != flat.shape[1]:
+            raise ValueError(f"expected {len(self.states)} channels, got {flat.shape[1]}")
+        return _run(self.states, flat).reshape(z.shape)
+
+
+def kalman_filter(x, q=Q, r=R, axis=None):
+    """kalman.c over a whole array in one call; float32 result.
+
+    Same axis convention as the filters module: 1-D signals, (n, channels)
+    recordings or (k, n, channels) stacks, time along axis.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    axis = _time_axis(x, axis)
+    moved = np.moveaxis(x, axis, 0)
+    flat = np.ascontiguousarray(moved.reshape(len(moved), -1))
+    out = _run(new_states(flat.shape[1], q, r), flat)
+    return np.moveaxis(out.reshape(moved.shape), 0, axis)
+
+
+# ------------------------------------------------------------------ #
+# Verification against a plain, unoptimised build of the C code
+
+REFERENCE_MAIN = r"""
+#include <stdio.h>
+#include <stdlib.h>
+#include "kalman_filter.h"
+
+/* reference <in.f32> <out.f32> <n_channels>: one kalman_update() call per
+   sample, channels kept apart, no batching */
+int main(int argc, char **argv) {
+    int n_channels = atoi(argv[3]);
+    FILE *in = fopen(argv[1], "rb"), *out = fopen(argv[2], "wb");
+    kalman_state *s = malloc(sizeof(kalman_state) * n_channels);
+    for (int c = 0; c < n_channels; c++)
+        kalman_init(&s[c], 0.022, 0.617);
+    float z;
+    long i = 0;
+    while (fread(&z, sizeof z, 1, in) == 1) {
+        float y = kalman_update(&s[i % n_channels], z);
+        fwrite(&y, sizeof y, 1, out);
+        i++;
+    }
+    fclose(in);
+    fclose(out);
+    return 0;
+}
+"""
+
+
+def build_reference(folder):
+    """Compile REFERENCE_MAIN and kalman_filter.c unoptimised into folder; returns the executable."""
+    cc = shutil.which(os.environ.get("CC", "gcc"))
+    if cc is None:
+        raise ImportError("kalman_c needs a C compiler (set CC or install gcc)")
+    exe = os.path.join(folder, "reference")
+    src = os.path.join(folder, "reference.c")
+    with open(src, "w") as f:
+        f.write(REFERENCE_MAIN)
+    subprocess.run([cc, "-O0", "-I", KALMAN_DIR, src,
+                    *[os.path.join(KALMAN_DIR, s) for s in SOURCES], "-o", exe], check=True)
+    return exe
+
+
+def run_reference(exe, rec, folder):
+    """Filter an (n, channels) recording through the reference executable; float32 result."""
+    rec = np.ascontiguousarray(rec, dtype=np.float32)
+    rec.tofile(os.path.join(folder, "in.f32"))
+    subprocess.run([exe, os.path.join(folder, "in.f32"), os.path.join(folder, "out.f32"),
+                    str(rec.shape[1])], check=True)
+    return np.fromfile(os.path.join(folder, "out.f32"), dtype=np.float32).reshape(rec.shape)
+
+
+def verify(seed=0):
+    """Compare the binding with the reference executable on every corpus recording.
+
+    Each recording goes through kalman_filter() in one call and through
+    CKalmanFilter in random chunks; both must equal the reference bit for
+    bit. Returns the number of mismatching recordings.
+    """
+    from dataset import Dataset
+    ds = Dataset()
+    rng = np.random.default_rng(seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exe = build_reference(tmp)
+        failures = 0
+        for i, entry in enumerate(ds.entries):
+            rec = np.asarray(ds[i], dtype=np.float32)
+            expected = run_reference(exe, rec, tmp)
+
+            batch = kalman_filter(rec)
+            stream = CKalmanFilter()
+            cuts = np.sort(rng.choice(np.arange(1, len(rec)), size=min(5, len(rec) - 1), replace=False))
+            chunked = np.concatenate([stream.process(c) for c in np.split(rec, cuts)])
+
+            if not (np.array_equal(batch.view(np.uint32), expected.view(np.uint32))
+                    and np.array_equal(chunked.view(np.uint32), expected.view(np.uint32))):
+                failures += 1
+                print(f"MISMATCH {entry['path']}")
+
+    # Stacked recordings in one call, zero-padded like filters.stack_recordings
+    from filters import stack_recordings
+    recs = [np.asarray(r, dtype=np.float32) for r in ds.recordings()]
+    stack, lengths = stack_recordings(recs)
+    stacked = kalman_filter(stack)
+    for rec, out, n in zip(recs, stacked, lengths):
+        if not np.array_equal(out[:n].view(np.uint32), kalman_filter(rec).view(np.uint32)):
+            failures += 1
+    return failures, len(ds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python binding for kalmanFilter/kalman_filter.c")
+    parser.add_argument("--verify", action="store_true",
+                        help="check bit-for-bit agreement with the C code on the whole corpus")
+    args = parser.parse_args()
+
+    print(f"Built {build_library()}")
+    if args.verify:
+        failures, n = verify()
+        print(f"{n - failures}/{n} recordings bit-identical to the C reference "
+              f"(batched, streamed in random chunks and stacked)")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
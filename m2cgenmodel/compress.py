@@ -0,0 +1,327 @@
+import argparse
+import copy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "featureEngineering"))
+
+
+INT16_MIN, INT16_MAX = -32768, 32767
+PROBA_ONE = 65535           # leaf probabilities are stored as uint16 fractions of this
+LEAF = 255                  # rf_feature[] marker for leaf nodes (uint8_t)
+LEAF_WIDE = 0xFFFF          # the same with uint16_t rf_feature[], for 255+ features
+
+# Variants tried by `python compress.py`
+TREE_COUNTS = [100, 50, 25, 10]
+DEPTHS = [None, 12, 8, 6]
+
+
+# ------------------------------------------------------------------ #
+# Size and cost of a forest
+
+def forest_stats(rf):
+    """(trees, nodes, worst-case comparisons per prediction)."""
+    trees = [est.tree_ for est in rf.estimators_]
+    return len(trees), sum(t.node_count for t in trees), sum(t.max_depth for t in trees)
+
+
+def object_size(c_code):
+    """text + data bytes of c_code compiled with the host gcc -Os, None without gcc.
+
+    Not the ESP32 figure, but it ranks variants the same way and is far
+    closer than the source size.
+    """
+    if not shutil.which("gcc") or not shutil.which("size"):
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        src, obj = os.path.join(tmp, "rf_model.c"), os.path.join(tmp, "rf_model.o")
+        with open(src, "w") as f:
+            f.write(c_code)
+        subprocess.run(["gcc", "-Os", "-c", src, "-o", obj], check=True)
+        out = subprocess.run(["size", obj], check=True, capture_output=True, text=True).stdout
+    text, data = out.splitlines()[1].split()[:2]
+    return int(text) + int(data)
+
+
+# ------------------------------------------------------------------ #
+# Compression steps
+
+def limit_forest(rf, X, y, n_estimators=None, max_depth=None):
+    """A copy of rf's settings with fewer/shallower trees, refitted on X, y."""
+    params = {}
+    if n_estimators is not None:
+        params["n_estimators"] = n_estimators
+    if max_depth is not None:
+        params["max_depth"] = max_depth
+    return clone(rf).set_params(**params).fit(X, y)
+
+
+def prune_forest(rf, X_val, y_val, tolerance=0.0, min_trees=1):
+    """Drop trees, greedily, as long as validation accuracy stays within tolerance.
+
+    Each round removes the tree whose absence costs least (or helps most).
+    Returns a shallow copy sharing the kept estimators.
+    """
+    probas = np.stack([est.predict_proba(X_val) for est in rf.estimators_])
+    target = np.searchsorted(rf.classes_, y_val)
+    total = probas.sum(axis=0)
+    keep = list(range(len(probas)))
+    base = np.mean(total.argmax(axis=1) == target)
+
+    while len(keep) > min_trees:
+        scores = [np.mean((total - probas[i]).argmax(axis=1) == target) for i in keep]
+        best = int(np.argmax(scores))
+        if scores[best] < base - tolerance:
+            break
+        total -= probas[keep.pop(best)]
+
+    pruned = copy.copy(rf)
+    pruned.estimators_ = [rf.estimators_[i] for i in keep]
+    pruned.n_estimators = len(keep)
+    return pruned
+
+
+class Quantizer:
+    """Per-feature power-of-two scales mapping features into int16.
+
+    Features in raw sensor counts (mean, min, max, std) keep a scale of
+    about 1, so their thresholds are plain sensor values; large ones such as
+    energy are shifted down, small ones such as zero crossings up.
+    """
+
+    def __init__(self, scale):
+        self.scale = np.asarray(scale, dtype=float)
+
+    @classmethod
+    def fit(cls, X):
+        peak = np.abs(np.asarray(X, dtype=float)).max(axis=0)
+        exp = np.floor(np.log2(INT16_MAX / np.where(peak > 0, peak, 1.0)))
+        return cls(np.exp2(exp))
+
+    def transform(self, X):
+        """int16-valued floats, rounded half up like the generated C."""
+        return np.clip(np.floor(np.asarray(X, dtype=float) * self.scale + 0.5), INT16_MIN, INT16_MAX)
+
+
+QuantizedForest = namedtuple("QuantizedForest", "forest quantizer classes")
+
+
+def quantize_forest(rf, quantizer):
+    """Copy of rf whose thresholds are integers in the quantizer's domain.
+
+    The returned forest takes quantizer.transform(X). Thresholds are stored
+    as t + 0.5 so sklearn's x <= t gives the same branch as the C code's
+    integer x <= t.
+    """
+    q = copy.deepcopy(rf)
+    for est in q.estimators_:
+        t = est.tree_
+        split = t.children_left != -1
+        scaled = t.threshold[split] * quantizer.scale[t.feature[split]]
+        t.threshold[split] = np.clip(np.floor(scaled), INT16_MIN, INT16_MAX) + 0.5
+    return QuantizedForest(q, quantizer, rf.classes_)
+
+
+def _leaf_tables(qf):
+    """Quantized leaf probabilities per tree: list of {node: uint16 row}."""
+    tables = []
+    for est in qf.forest.estimators_:
+        t = est.tree_
+        leaves = np.flatnonzero(t.children_left == -1)
+        value = t.value[leaves, 0, :]
+        proba = value / value.sum(axis=1, keepdims=True)
+        tables.append(dict(zip(leaves.tolist(), np.round(proba * PROBA_ONE).astype(np.int64))))
+    return tables
+
+
+def predict_quantized(qf, X):
+    """Class predictions exactly as the table-driven C model computes them."""
+    Xq = qf.quantizer.transform(X)
+    acc = np.zeros((len(Xq), len(qf.classes)), dtype=np.int64)
+    for est, table in zip(qf.forest.estimators_, _leaf_tables(qf)):
+        leaves = est.apply(Xq.astype(np.float32))
+        acc += np.stack([table[leaf] for leaf in leaves.tolist()])
+    # argmax takes the first maximum, like main.c
+    return qf.classes[acc.argmax(axis=1)]
+
+
+# ------------------------------------------------------------------ #
+# C export
+
+def export_c(rf):
+    import m2cgen as m2c
+    return m2c.export_to_c(rf, function_name="score_rf")
+
+
+def _c_array(ctype, name, values, per_line=16):
+    values = [str(int(v)) if not isinstance(v, float) else repr(v) for v in values]
+    lines = [", ".join(values[i:i + per_line]) for i in range(0, len(values), per_line)]
+    body = ",\n    ".join(lines)
+    return f"static const {ctype} {name}[{len(values)}] = {{\n    {body}\n}};\n"
+
+
+def export_c_quantized(qf):
+    """Table-driven C for a quantized forest: int16 comparisons, uint16 leaf votes.
+
+    Keeps the m2cgen signature, score_rf(double *input, double *output),
+    so main.c and the host harness work unchanged; the inputs are scaled
+    and rounded to int16 on entry.
+    """
+    trees = [est.tree_ for est in qf.forest.estimators_]
+    tables = _leaf_tables(qf)
+    n_classes = len(qf.classes)
+    scale = qf.quantizer.scale.tolist()
+    n_features = len(scale)
+    # Feature indices must stay below the leaf marker of their type
+    if n_features < LEAF:
+        feature_type, leaf = "uint8_t", LEAF
+    elif n_features < LEAF_WIDE:
+        feature_type, leaf = "uint16_t", LEAF_WIDE
+    else:
+        raise ValueError(f"{n_features} features do not fit a uint16_t rf_feature[]")
+
+    feature, threshold, left, right, roots, leaf_rows = [], [], [], [], [], []
+    for t, table in zip(trees, tables):
+        base = len(feature)
+        roots.append(base)
+        for node in range(t.node_count):
+            if t.children_left[node] == -1:
+                feature.append(leaf)
+                threshold.append(0)
+                left.append(len(leaf_rows))     # leaf: index into rf_leaf_proba
+                right.append(0)
+                leaf_rows.append(table[node])
+            else:
+                feature.append(int(t.feature[node]))
+                threshold.append(int(t.threshold[node] - 0.5))
+                left.append(base + int(t.children_left[node]))
+                right.append(base + int(t.children_right[node]))
+
+    index_type = "uint16_t" if max(len(feature), len(leaf_rows)) <= 0xFFFF else "uint32_t"
+
+    return "\n".join([
+        "#include <math.h>",
+        "#include <stdint.h>",
+        "",
+        f"/* {len(trees)} trees, {len(feature)} nodes, {len(leaf_rows)} leaves, "
+        f"int16 thresholds, leaf votes in 1/{PROBA_ONE} */",
+        "",
+        _c_array("float", "rf_scale", [float(s) for s in scale]),
+        _c_array(feature_type, "rf_feature", feature),
+        _c_array("int16_t", "rf_threshold", threshold),
+        _c_array(index_type, "rf_left", left),
+        _c_array(index_type, "rf_right", right),
+        _c_array(index_type, "rf_root", roots),
+        _c_array("uint16_t", "rf_leaf_proba", np.concatenate(leaf_rows) if leaf_rows else []),
+        "void score_rf(double * input, double * output) {",
+        f"    int16_t x[{n_features}];",
+        f"    uint32_t acc[{n_classes}] = {{0}};",
+        f"    for (int f = 0; f < {n_features}; f++) {{",
+        "        double v = floor(input[f] * rf_scale[f] + 0.5);",
+        f"        x[f] = (int16_t)(v < {INT16_MIN} ? {INT16_MIN} : v > {INT16_MAX} ? {INT16_MAX} : v);",
+        "    }",
+        f"    for (int t = 0; t < {len(trees)}; t++) {{",
+        f"        {index_type} n = rf_root[t];",
+        f"        while (rf_feature[n] != {leaf})",
+        "            n = x[rf_feature[n]] <= rf_threshold[n] ? rf_left[n] : rf_right[n];",
+        f"        const uint16_t *p = &rf_leaf_proba[rf_left[n] * {n_classes}];",
+        f"        for (int c = 0; c < {n_classes}; c++) acc[c] += p[c];",
+        "    }",
+        f"    for (int c = 0; c < {n_classes}; c++)",
+        f"        output[c] = acc[c] / ({float(PROBA_ONE)} * {len(trees)});",
+        "}",
+        "",
+    ])
+
+
+# ------------------------------------------------------------------ #
+# Variant evaluation
+
+Variant = namedtuple("Variant", "name model c_code trees nodes comparisons c_bytes object_bytes accuracy")
+
+
+def make_variant(name, model, X_test, y_test, measure_object=False):
+    """model is a fitted forest or a QuantizedForest."""
+    if isinstance(model, QuantizedForest):
+        c_code = export_c_quantized(model)
+        y_pred = predict_quantized(model, X_test)
+        trees, nodes, comparisons = forest_stats(model.forest)
+    else:
+        c_code = export_c(model)
+        y_pred = model.predict(X_test)
+        trees, nodes, comparisons = forest_stats(model)
+    return Variant(name, model, c_code, trees, nodes, comparisons, len(c_code.encode()),
+                   object_size(c_code) if measure_object else None,
+                   float(np.mean(y_pred == y_test)))
+
+
+def format_report(variants, reference=None):
+    reference = reference if reference is not None else variants[0].accuracy
+    lines = [f"{'variant':32s} {'trees':>5s} {'nodes':>7s} {'worst cmp':>9s} "
+             f"{'C bytes':>10s} {'obj bytes':>10s} {'accuracy':>8s} {'delta':>7s}"]
+    for v in variants:
+        obj = f"{v.object_bytes:10d}" if v.object_bytes is not None else f"{'-':>10s}"
+        lines.append(f"{v.name:32s} {v.trees:5d} {v.nodes:7d} {v.comparisons:9d} "
+                     f"{v.c_bytes:10d} {obj} {v.accuracy:8.2%} {v.accuracy - reference:+7.2%}")
+    return "\n".join(lines)
+
+
+def sweep(rf, X_fit, y_fit, X_val, y_val, X_test, y_test, tree_counts=TREE_COUNTS,
+          depths=DEPTHS, tolerance=0.0, measure_object=False):
+    """Limited, quantized, and pruned + quantized variants of rf's configuration."""
+    quantizer = Quantizer.fit(X_fit)
+    variants = []
+    for n in tree_counts:
+        for depth in depths:
+            model = limit_forest(rf, X_fit, y_fit, n, depth)
+            name = f"{n} trees, depth {depth or 'inf'}"
+            pruned = prune_forest(model, X_val, y_val, tolerance)
+            variants.append(make_variant(name, model, X_test, y_test, measure_object))
+            variants.append(make_variant(name + " +int16", quantize_forest(model, quantizer),
+                                         X_test, y_test, measure_object))
+            variants.append(make_variant(name + " +prune +int16", quantize_forest(pruned, quantizer),
+                                         X_test, y_test, measure_object))
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare smaller forests for the ESP32 export")
+    parser.add_argument("--trees", type=int, nargs="+", default=TREE_COUNTS)
+    parser.add_argument("--depths", type=int, nargs="+", default=DEPTHS,
+                        help="max depths, 0 for unlimited")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="validation accuracy pruning may give up")
+    parser.add_argument("--object-size", action="store_true",
+                        help="also compile each variant with gcc -Os (slow for big forests)")
+    args = parser.parse_args()
+
+    from features import extract
+    from search import cv_groups, group_split
+    fs = extract()
+    # Whole recordings (or subjects) per side: overlapping windows of one
+    # recording in both would make every accuracy below optimistic
+    groups, _ = cv_groups(fs)
+    train, test = group_split(groups, test_size=0.2)
+    # Pruning decisions are made on data the test score never sees
+    fit, val = group_split(groups[train], test_size=0.25)
+    fit, val = train[fit], train[val]
+    X_fit, X_val, X_test = fs.X[fit], fs.X[val], fs.X[test]
+    y_fit, y_val, y_test = fs.y[fit], fs.y[val], fs.y[test]
+
+    rf = RandomForestClassifier(n_estimators=100, max_depth=None, random_state=42, n_jobs=-1)
+    depths = [d or None for d in args.depths]
+    variants = sweep(rf, X_fit, y_fit, X_val, y_val, X_test, y_test, args.trees, depths,
+                     args.tolerance, args.object_size)
+    print(format_report(variants))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import ctypes
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "featureEngineering"))
+
+BUILD_DIR = os.path.join(HERE, ".cache")
+CFLAGS = ["-O2"]
+
+# Compiled next to the generated code: a loop over rows so a whole feature
+# matrix costs one ctypes call
+BATCH_SOURCE = """
+void score_rf(double * input, double * output);
+
+void score_rf_batch(double * input, int n_rows, int n_features, double * output, int n_classes) {
+    for (int i = 0; i < n_rows; i++)
+        score_rf(input + (long)i * n_features, output + (long)i * n_classes);
+}
+
+void predict_rf_batch(double * input, int n_rows, int n_features, double * scratch,
+                      int n_classes, int * labels) {
+    for (int i = 0; i < n_rows; i++) {
+        score_rf(input + (long)i * n_features, scratch);
+        int best = 0;
+        for (int c = 1; c < n_classes; c++)
+            if (scratch[best] < scratch[c])
+                best = c;
+        labels[i] = best;
+    }
+}
+"""
+
+
+class CompilerNotFound(ImportError):
+    """No C compiler; benchmarks treat it like a missing package."""
+
+
+def build_library(c_code, cflags=CFLAGS, build_dir=BUILD_DIR):
+    """Compile score_rf C code plus the batch wrappers into a shared library.
+
+    Libraries are cached by a hash of the code and flags, so re-running on
+    an unchanged model does not recompile. Returns the .so path.
+    """
+    cc = shutil.which(os.environ.get("CC", "gcc"))
+    if cc is None:
+        raise CompilerNotFound("no C compiler (set CC or install gcc)")
+
+    key = hashlib.sha1("\0".join([c_code, BATCH_SOURCE] + list(cflags)).encode()).hexdigest()[:16]
+    lib = os.path.join(build_dir, f"rf_model_{key}.so")
+    if os.path.exists(lib):
+        return lib
+
+    os.makedirs(build_dir, exist_ok=True)
+    model_src = os.path.join(build_dir, f"rf_model_{key}.c")
+    batch_src = os.path.join(build_dir, f"rf_batch_{key}.c")
+    with open(model_src, "w") as f:
+        f.write(c_code)
+    with open(batch_src, "w") as f:
+        f.write(BATCH_SOURCE)
+    tmp = lib + ".tmp"
+    subprocess.run([cc, *cflags, "-shared", "-fPIC", model_src, batch_src, "-o", tmp, "-lm"],
+                   check=True)
+    os.replace(tmp, lib)
+    return lib
+
+
+class CModel:
+    """A compiled score_rf loaded with ctypes."""
+
+    def __init__(self, lib_path, n_features, n_classes):
+        self.lib = ctypes.CDLL(lib_path)
+        self.n_features = n_features
+        self.n_classes = n_classes
+
+        rows = np.ctypeslib.ndpointer(np.float64, flags="C_CONTIGUOUS")
+        self.lib.score_rf.argtypes = [rows, rows]
+        self.lib.score_rf.restype = None
+        self.lib.score_rf_batch.argtypes = [rows, ctypes.c_int, ctypes.c_int, rows, ctypes.c_int]
+        self.lib.score_rf_batch.restype = None
+        self.lib.predict_rf_batch.argtypes = [
+            rows, ctypes.c_int, ctypes.c_int, rows, ctypes.c_int,
+            np.ctypeslib.ndpointer(np.intc, flags="C_CONTIGUOUS")]
+        self.lib.predict_rf_batch.restype = None
+
+    @classmethod
+    def from_code(cls, c_code, n_features, n_classes, **kwargs):
+        return cls(build_library(c_code, **kwargs), n_features, n_classes)
+
+    def _input(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"expected (n, {self.n_features}) features, got {X.shape}")
+        return X
+
+    def score(self, X):
+        """(n, n_classes) scores, one ctypes call for all rows."""
+        X = self._input(X)
+        out = np.empty((len(X), self.n_classes))
+        self.lib.score_rf_batch(X, len(X), self.n_features, out, self.n_classes)
+        return out
+
+    def score_rows(self, X):
+        """Same as score(), one ctypes call per row, like a live caller."""
+        X = self._input(X)
+        out = np.empty((len(X), self.n_classes))
+        for row, res in zip(X, out):
+            self.lib.score_rf(row, res)
+        return out
+
+    def predict_index(self, X):
+        """Class indices, argmax taken in C (first maximum, like main.c)."""
+        X = self._input(X)
+        labels = np.empty(len(X), dtype=np.intc)
+        scratch = np.empty(self.n_classes)
+        self.lib.predict_rf_batch(X, len(X), self.n_features, scratch, self.n_classes, labels)
+        return labels
+
+
+def reference_predict(rf, X):
+    """What the exported C should predict: rf.predict, or the int16 mirror
+    for forests model_generator.py exported with --quantize."""
+    scale = getattr(rf, "quantizer_scale_", None)
+    if scale is None:
+        return rf.predict(X)
+    from compress import Quantizer, predict_quantized, quantize_forest
+    return predict_quantized(quantize_forest(rf, Quantizer(scale)), X)
+
+
+def rate(fn, X, min_time=0.5):
+    """Rows per second of fn(X), repeated until min_time has passed."""
+    runs, start = 0, time.perf_counter()
+    while True:
+        fn(X)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return runs * len(X) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile rf_model.c and check it against the sklearn model")
+    parser.add_argument("--model", default="rf_model.joblib")
+    parser.add_argument("--c", default="rf_model.c")
+    parser.add_argument("--cflags", default=" ".join(CFLAGS))
+    args = parser.parse_args()
+
+    import joblib
+    from features import FeatureConfig, extract
+
+    rf = joblib.load(args.model)
+    rf.n_jobs = 1
+    with open(args.c) as f:
+        c_code = f.read()
+    config = FeatureConfig(**getattr(rf, "feature_config_", {}))
+    # sklearn compares float32 features against its thresholds; feeding C
+    # the same rounded values makes parity exact instead of off by a
+    # threshold-straddling window here and there
+    X = extract(config=config).X.astype(np.float32).astype(np.float64)
+
+    start = time.perf_counter()
+    model = CModel.from_code(c_code, X.shape[1], len(rf.classes_), cflags=args.cflags.split())
+    print(f"Built {args.c} in {time.perf_counter() - start:.1f} s (cached builds are instant)")
+
+    expected = reference_predict(rf, X)
+    got = rf.classes_[model.predict_index(X)]
+    mismatch = int(np.count_nonzero(got != expected))
+    print(f"Parity with {'int16 mirror' if hasattr(rf, 'quantizer_scale_') else 'rf.predict'}: "
+          f"{len(X) - mismatch}/{len(X)} windows agree")
+    if not hasattr(rf, "quantizer_scale_"):
+        diff = np.abs(model.score(X) - rf.predict_proba(X)).max()
+        print(f"Max |score_rf - predict_proba|: {diff:.2e}")
+
+    print(f"C batched   {rate(model.predict_index, X):14,.0f} predictions/s")
+    print(f"C per row   {rate(model.score_rows, X):14,.0f} predictions/s")
+    print(f"sklearn     {rate(rf.predict, X):14,.0f} predictions/s")
+    return 1 if mismatch else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,10 @@
 int m;
 
 int main(){
-    double input[4]={5.1, 3.5, 1.4, 0.2};
+    /* A held-out window's features, written by model_generator.py */
+    double input[RF_N_FEATURES]=RF_EXAMPLE_INPUT;
 
-    double output[4];
+    double output[RF_N_CLASSES];
 
 
     score_rf(input,output);
@@ -14,8 +15,8 @@ int main(){
 
     double max=output[0];
 
-    
-    for(int i=0;i<4;i++){
+
+    for(int i=0;i<RF_N_CLASSES;i++){
         printf("%f\t",output[i]);
         if(max<output[i]){
             max=output[i];
@@ -23,7 +24,7 @@ int main(){
         }
     }
     printf("\n");
-    printf("OUTPUT is %d\n",m);
+    printf("OUTPUT is %d (%s), expected %s\n",m,RF_CLASSES[m],RF_EXAMPLE_CLASS);
 
     return 0;
-}
\ No newline at end of file
+}
@@ -1,4 +1,8 @@
 # train_and_export_c.py
+import argparse
+import os
+import sys
+
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -6,36 +10,118 @@ from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import m2cgen as m2c
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "featureEngineering"))
+from compress import (Quantizer, export_c_quantized, forest_stats, predict_quantized,
+                      prune_forest, quantize_forest)
 
-df = pd.read_csv("data.csv")
-X = df[["f1", "f2", "f3", "f4"]].values
-y = df["label"].values
 
+parser = argparse.ArgumentParser(description="Train the gesture forest and export it to C")
+parser.add_argument("--csv", help="train on a data.csv with f1..fN and label columns "
+                                  "instead of extracting features from data/")
+parser.add_argument("--window", type=int, help="feature window in samples")
+parser.add_argument("--stride", type=int, help="feature stride in samples")
+parser.add_argument("--max-trees", type=int, default=100, help="trees in the forest")
+parser.add_argument("--max-depth", type=int, help="limit tree depth")
+parser.add_argument("--prune", type=float, nargs="?", const=0.0, metavar="TOLERANCE",
+                    help="drop trees that do not help validation accuracy "
+                         "(optionally giving up TOLERANCE of it)")
+parser.add_argument("--quantize", action="store_true",
+                    help="export int16 thresholds as compact C tables")
+args = parser.parse_args()
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
+config = None
+groups = None
+if args.csv:
+    df = pd.read_csv(args.csv)
+    X = df[[c for c in df.columns if c.startswith("f") and c[1:].isdigit()]].values
+    y = df["label"].values
+else:
+    # Sliding-window features from the raw recordings, cached per configuration
+    from features import FeatureConfig, WINDOW, STRIDE, extract
+    config = FeatureConfig(args.window or WINDOW, args.stride or STRIDE)
+    fs = extract(config=config)
+    X, y = fs.X, fs.y
+    print(f"{X.shape[0]} windows x {X.shape[1]} features (window {config.window}, stride {config.stride})")
+    # Overlapping windows of one recording must not sit on both sides of a split
+    from search import cv_groups, group_split
+    groups, kind = cv_groups(fs)
+    print(f"Splitting by {kind}")
+
+
+if groups is None:
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+else:
+    train, test = group_split(groups, test_size=0.2)
+    X_train, X_test, y_train, y_test = X[train], X[test], y[train], y[test]
 
 rf = RandomForestClassifier(
-    n_estimators=100,
-    max_depth=None,
+    n_estimators=args.max_trees,
+    max_depth=args.max_depth,
     random_state=42,
     n_jobs=-1
 )
-rf.fit(X_train, y_train)
+if args.prune is not None:
+    # Trees are dropped based on a validation split the test score never sees
+    if groups is None:
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.25, random_state=42)
+    else:
+        fit, val = group_split(groups[train], test_size=0.25)
+        X_fit, X_val, y_fit, y_val = X_train[fit], X_train[val], y_train[fit], y_train[val]
+    rf.fit(X_fit, y_fit)
+    rf = prune_forest(rf, X_val, y_val, args.prune)
+else:
+    rf.fit(X_train, y_train)
+if config is not None:
+    # Lets the emulator's live classifier cut the same windows
+    rf.feature_config_ = config._asdict()
 
 
-y_pred = rf.predict(X_test)
+if args.quantize:
+    qf = quantize_forest(rf, Quantizer.fit(X_train))
+    # harness.py needs the scales to reproduce the C model's predictions
+    rf.quantizer_scale_ = qf.quantizer.scale.tolist()
+    y_pred = predict_quantized(qf, X_test)
+else:
+    y_pred = rf.predict(X_test)
 print("Accuracy:", accuracy_score(y_test, y_pred))
-print(classification_report(y_test, y_pred))
+print(classification_report(y_test, y_pred, zero_division=0))
 joblib.dump(rf, "rf_model.joblib")
 print("Saved sklearn model to rf_model.joblib")
 
 # --------------------------------------------------------------#
 # model to c code
-c_code = m2c.export_to_c(rf, function_name="score_rf")
+if args.quantize:
+    c_code = export_c_quantized(qf)
+else:
+    c_code = m2c.export_to_c(rf, function_name="score_rf")
 
 with open("rf_model.c", "w") as f:
     f.write(c_code)
 
 print("Wrote rf_model.c (C implementation of the RF model)")
+
+trees, nodes, comparisons = forest_stats(rf)
+print(f"{trees} trees, {nodes} nodes, {comparisons} comparisons worst case, "
+      f"{len(c_code.encode())} bytes of C")
+if args.prune is not None or args.quantize or args.max_depth or args.max_trees != 100:
+    reference = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
+    reference.fit(X_train, y_train)
+    delta = accuracy_score(y_test, y_pred) - reference.score(X_test, y_test)
+    print(f"Accuracy delta vs 100 unlimited trees: {delta:+.2%} (python compress.py compares more variants)")
+
+# Sizes and class order for callers of score_rf(), see main.c
+with open("rf_model.h", "w") as f:
+    f.write("#ifndef RF_MODEL_H\n#define RF_MODEL_H\n\n")
+    f.write(f"#define RF_N_FEATURES {X.shape[1]}\n")
+    f.write(f"#define RF_N_CLASSES {len(rf.classes_)}\n\n")
+    labels = ", ".join(f'"{c}"' for c in rf.classes_)
+    f.write(f"static const char *const RF_CLASSES[RF_N_CLASSES] = {{{labels}}};\n\n")
+    # One held-out feature row and its true class, for main.c's demo call
+    example = ", ".join(repr(float(v)) for v in X_test[0])
+    f.write(f"#define RF_EXAMPLE_INPUT {{{example}}}\n")
+    f.write(f'#define RF_EXAMPLE_CLASS "{y_test[0]}"\n\n')
+    f.write("void score_rf(double * input, double * output);\n\n#endif\n")
+
+print("Wrote rf_model.h")
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GroupKFold, GroupShuffleSplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "featureEngineering"))
+
+from dataset import Dataset
+from features import FeatureConfig, extract
+from compress import Quantizer, export_c_quantized, forest_stats, predict_quantized, quantize_forest
+
+
+FOLDS = 5
+WINDOWS = [(50, 25), (50, 10), (100, 25)]
+TREE_COUNTS = [10, 25, 50, 100]
+DEPTHS = [None, 12, 8, 6]
+
+SEARCH_CACHE_DIR = "search"
+# Part of every fold's cache key; bump when what a fold result means changes
+RESULT_VERSION = 2
+
+Candidate = namedtuple("Candidate", "window stride n_estimators max_depth")
+Result = namedtuple("Result", "candidate accuracy accuracy_std nodes comparisons latency_us")
+
+
+def cv_groups(fs, folds=FOLDS):
+    """Group labels for cross-validation and what they are.
+
+    Folds are split by subject so a person's recordings never sit on both
+    sides. With fewer subjects than folds that is impossible, and whole
+    recordings are the groups instead: overlapping windows of one
+    recording still never leak between train and test.
+    """
+    if len(set(fs.subject.tolist())) >= folds:
+        return fs.subject, "subject"
+    return fs.recording, "recording"
+
+
+def group_split(groups, test_size, seed=42):
+    """(train, test) row indices of one random split that keeps every group on one side."""
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=seed)
+    return next(splitter.split(np.zeros((len(groups), 1)), groups=groups))
+
+
+# ------------------------------------------------------------------ #
+# One fold, run in a worker process
+
+_features = {}
+
+
+def _feature_set(root, window, stride):
+    """Per-process memo over the on-disk feature cache."""
+    key = (root, window, stride)
+    if key not in _features:
+        _features[key] = extract(Dataset(root), FeatureConfig(window, stride))
+    return _features[key]
+
+
+def _fold_split(fs, fold, folds):
+    groups, _ = cv_groups(fs, folds)
+    return list(GroupKFold(n_splits=folds).split(fs.X, fs.y, groups))[fold]
+
+
+def _build(qf):
+    """Compiled int16 C export of qf, None without a compiler."""
+    from harness import CompilerNotFound, build_library
+    try:
+        return build_library(export_c_quantized(qf))
+    except CompilerNotFound:
+        return None
+
+
+def _latency_us(library, X, n_classes):
+    """Mean microseconds per prediction of a compiled export."""
+    from harness import CModel
+    model = CModel(library, X.shape[1], n_classes)
+    reps = max(1, 20_000 // len(X))
+    start = time.perf_counter()
+    for _ in range(reps):
+        model.predict_index(X)
+    return (time.perf_counter() - start) / (reps * len(X)) * 1e6
+
+
+def run_fold(root, candidate, fold, folds, cache_path):
+    """Fit and score one candidate on one fold.
+
+    Accuracy is that of the int16 forest whose C export is compiled
+    here; timing it is left to search(), which does so serially once
+    the pool is done. Cached results already carry their latency.
+    """
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return json.load(f)
+
+    fs = _feature_set(root, candidate.window, candidate.stride)
+    train, test = _fold_split(fs, fold, folds)
+
+    rf = RandomForestClassifier(n_estimators=candidate.n_estimators, max_depth=candidate.max_depth,
+                                random_state=42, n_jobs=1)
+    rf.fit(fs.X[train], fs.y[train])
+    qf = quantize_forest(rf, Quantizer.fit(fs.X[train]))
+    _, nodes, comparisons = forest_stats(rf)
+    return dict(accuracy=float(np.mean(predict_quantized(qf, fs.X[test]) == fs.y[test])),
+                nodes=nodes, comparisons=comparisons, latency_us=None,
+                library=_build(qf), n_classes=len(qf.classes))
+
+
+def _finish_fold(root, candidate, fold, folds, cache_path, result):
+    """Time a fresh fold's C export on the otherwise idle process and cache it."""
+    if "library" not in result:
+        return result
+    library = result.pop("library")
+    n_classes = result.pop("n_classes")
+    if library is not None:
+        fs = _feature_set(root, candidate.window, candidate.stride)
+        _, test = _fold_split(fs, fold, folds)
+        result["latency_us"] = _latency_us(library, fs.X[test], n_classes)
+
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp, cache_path)
+    return result
+
+
+def _run_fold(args):
+    return run_fold(*args)
+
+
+# ------------------------------------------------------------------ #
+# Search
+
+def fold_cache_path(ds, candidate, fold, folds):
+    """Cache file keyed on the candidate, the fold and the exact recordings."""
+    corpus = hashlib.sha1("".join(e["sha1"] for e in ds.entries).encode()).hexdigest()
+    key = hashlib.sha1(json.dumps([corpus, list(candidate), fold, folds, RESULT_VERSION]).encode()).hexdigest()
+    return os.path.join(ds.cache_dir, SEARCH_CACHE_DIR, key + ".json")
+
+
+def search(candidates, folds=FOLDS, workers=None, dataset=None):
+    """Cross-validated Result per candidate."""
+    ds = dataset or Dataset()
+    os.makedirs(os.path.join(ds.cache_dir, SEARCH_CACHE_DIR), exist_ok=True)
+
+    # Features for each window setting are computed (or loaded) once here,
+    # so workers only ever read them from the cache
+    for window, stride in sorted({(c.window, c.stride) for c in candidates}):
+        extract(ds, FeatureConfig(window, stride))
+
+    jobs = [(ds.root, c, fold, folds, fold_cache_path(ds, c, fold, folds))
+            for c in candidates for fold in range(folds)]
+    cached = sum(os.path.exists(j[-1]) for j in jobs)
+    print(f"{len(candidates)} candidates x {folds} folds, {cached} of {len(jobs)} fits cached")
+
+    if workers == 1:
+        fold_results = [_run_fold(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            fold_results = list(pool.map(_run_fold, jobs, chunksize=1))
+    # Latency is timed only now, one fold at a time, so no fit competes for the CPU
+    fold_results = [_finish_fold(*job, result) for job, result in zip(jobs, fold_results)]
+
+    results = []
+    for i, c in enumerate(candidates):
+        runs = fold_results[i * folds:(i + 1) * folds]
+        acc = np.array([r["accuracy"] for r in runs])
+        lat = [r["latency_us"] for r in runs if r["latency_us"] is not None]
+        results.append(Result(c, float(acc.mean()), float(acc.std()),
+                              int(np.mean([r["nodes"] for r in runs])),
+                              int(np.mean([r["comparisons"] for r in runs])),
+                              float(np.mean(lat)) if lat else None))
+    return results
+
+
+def pareto_front(results):
+    """Results no other result beats on accuracy, node count and latency at once."""
+    def cost(r):
+        return (-r.accuracy, r.nodes, r.latency_us if r.latency_us is not None else 0.0)
+
+    front = []
+    for r in results:
+        a = cost(r)
+        dominated = any(all(x <= y for x, y in zip(cost(o), a)) and cost(o) != a for o in results)
+        if not dominated:
+            front.append(r)
+    return front
+
+
+def format_results(results, front):
+    lines = [f"  {'window':>6s} {'stride':>6s} {'trees':>5s} {'depth':>5s} {'accuracy':>14s} "
+             f"{'nodes':>7s} {'worst cmp':>9s} {'us/pred':>8s}"]
+    on_front = {r.candidate for r in front}
+    for r in sorted(results, key=lambda r: (r.nodes, -r.accuracy)):
+        c = r.candidate
+        lat = f"{r.latency_us:8.2f}" if r.latency_us is not None else f"{'-':>8s}"
+        lines.append(f"{'*' if c in on_front else ' '} {c.window:6d} {c.stride:6d} "
+                     f"{c.n_estimators:5d} {str(c.max_depth or 'inf'):>5s} "
+                     f"{r.accuracy:7.2%} ±{r.accuracy_std:5.2%} {r.nodes:7d} {r.comparisons:9d} {lat}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated forest search with a cost/accuracy Pareto front")
+    parser.add_argument("--windows", nargs="+", default=[f"{w}:{s}" for w, s in WINDOWS],
+                        help="window:stride pairs in samples")
+    parser.add_argument("--trees", type=int, nargs="+", default=TREE_COUNTS)
+    parser.add_argument("--depths", type=int, nargs="+", default=[d or 0 for d in DEPTHS],
+                        help="max depths, 0 for unlimited")
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--all", action="store_true", help="list every candidate, not just the front")
+    args = parser.parse_args()
+
+    windows = [tuple(int(v) for v in w.split(":")) for w in args.windows]
+    candidates = [Candidate(w, s, n, d or None) for (w, s), n, d
+                  in itertools.product(windows, args.trees, args.depths)]
+
+    ds = Dataset()
+    fs = extract(ds, FeatureConfig(*windows[0]))
+    _, kind = cv_groups(fs, args.folds)
+    print(f"Folds grouped by {kind}")
+
+    start = time.perf_counter()
+    results = search(candidates, args.folds, args.workers, ds)
+    front = pareto_front(results)
+    print(f"Done in {time.perf_counter() - start:.1f} s; * marks the Pareto front "
+          f"(accuracy vs nodes vs int16 C latency)")
+    print(format_results(results if args.all else front, front))
+
+
+if __name__ == "__main__":
+    main()
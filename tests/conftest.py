@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The project folders are script directories, not packages; make their
+# modules importable the way the scripts import each other
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+for folder in ["featureEngineering", "emulator", "m2cgenmodel"]:
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,45 @@
+import numpy as np
+
+from classifier import GestureClassifier
+from features import FeatureConfig
+
+
+class FakeModel:
+    classes_ = np.array(["down_up", "only_up"])
+
+    def __init__(self):
+        self.n_features_in_ = len(FeatureConfig().columns)
+
+
+def run(sequence, **kwargs):
+    """Labels reported for a sequence of (label or None for low confidence) windows."""
+    reported = []
+    clf = GestureClassifier(FakeModel(), config=FeatureConfig(), min_confidence=0.6,
+                            on_gesture=lambda p: reported.append(p.label), **kwargs)
+    for label in sequence:
+        proba = np.full(2, 0.5) if label is None else \
+            np.where(FakeModel.classes_ == label, 0.9, 0.1)
+        clf._debounce(proba, 0.0, 0.0)
+    return reported, clf
+
+
+def test_debounced_once_while_held():
+    reported, clf = run(["only_up"] * 5, debounce=3, repeat_after=4)
+    assert reported == ["only_up"]
+    assert clf.counts["only_up"] == 1
+
+
+def test_repeat_after_low_confidence_gap():
+    reported, _ = run(["only_up"] * 3 + [None] + ["only_up"] * 3, debounce=3)
+    assert reported == ["only_up", "only_up"]
+
+
+def test_repeat_after_other_label_window():
+    reported, _ = run(["only_up"] * 3 + ["down_up"] + ["only_up"] * 3, debounce=3)
+    assert reported == ["only_up", "only_up"]
+
+
+def test_repeat_when_held_past_cooldown():
+    # Reported at window 3, released 4 windows later, debounced again by window 9
+    reported, _ = run(["only_up"] * 9, debounce=3, repeat_after=4)
+    assert reported == ["only_up", "only_up"]
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from filter_batch import apply_spec, parse_spec
+
+
+def names(spec):
+    return [name for name, _ in parse_spec(spec)]
+
+
+def test_output_names_carry_arguments():
+    assert names("lpf:5,lpf:10,lpf:5+ma:5,kalman,kalman:0.1:0.5") == \
+        ["LPF5", "LPF10", "LPF5_MA5", "KALMAN", "KALMAN0.1_0.5"]
+
+
+@pytest.mark.parametrize("spec", ["lpf:5,lpf:5", "lpf", "lpf:5+ma", "ma:5:3", "kalman:1", "median:3"])
+def test_bad_specs_raise(spec):
+    with pytest.raises(ValueError):
+        parse_spec(spec)
+
+
+def test_chain_independent_of_chunk():
+    # A short recording among longer ones: the MA after the LPF must still
+    # see zeros past its end
+    rng = np.random.default_rng(0)
+    short = rng.normal(0, 1000, (40, 6))
+    others = [rng.normal(0, 1000, (n, 6)) for n in (120, 300)]
+    outputs = parse_spec("lpf:5+ma:5,hpf:0.5+ma:9,kalman+ma:3")
+    alone = apply_spec([short], outputs)
+    mixed = apply_spec(others + [short], outputs)
+    for name, _ in outputs:
+        np.testing.assert_array_equal(alone[name][0], mixed[name][-1])
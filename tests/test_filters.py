@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from filters import (KalmanFilter, compute_alpha_hpf, compute_alpha_lpf, high_pass_filter,
+                     low_pass_filter, moving_average_filter)
+
+
+DT = 0.01
+
+# The per-sample loops the vectorized filters replaced, one column at a time
+
+def loop_lpf(x, alpha):
+    y = np.zeros_like(x, dtype=float)
+    y[0] = x[0]
+    for i in range(1, len(x)):
+        y[i] = y[i-1] + alpha * (x[i] - y[i-1])
+    return y
+
+
+def loop_hpf(x, alpha):
+    y = np.zeros_like(x, dtype=float)
+    y[0] = 0.0
+    for i in range(1, len(x)):
+        y[i] = alpha * (y[i-1] + x[i] - x[i-1])
+    return y
+
+
+def loop_ma(x, window_size):
+    kernel = np.ones(window_size) / window_size
+    return np.convolve(x, kernel, mode='same')
+
+
+def loop_kalman(z, q=0.022, r=0.617):
+    # kalmanFilter/kalman.c, seeded with the first measurement
+    x_est_last, p_last = z[0], 0.0
+    y = np.empty(len(z))
+    y[0] = x_est_last
+    for i in range(1, len(z)):
+        p_temp = p_last + q
+        k = p_temp * (1.0 / (p_temp + r))
+        x_est = x_est_last + k * (z[i] - x_est_last)
+        p_last = (1 - k) * p_temp
+        x_est_last = y[i] = x_est
+    return y
+
+
+def by_column(fn, x, *args):
+    return np.stack([fn(x[:, c], *args) for c in range(x.shape[1])], axis=1)
+
+
+@pytest.fixture
+def recording():
+    # Raw-count magnitudes: gravity on Z, a slow drift, a step and noise
+    rng = np.random.default_rng(0)
+    t = np.arange(1500)[:, None]
+    x = rng.normal(0, 400, (1500, 6)) + [0, 0, 16384, 50, -30, 10] + 0.8 * t
+    x[700:] += 3000
+    return x
+
+
+@pytest.mark.parametrize("cutoff", [0.5, 5.0, 20.0])
+def test_low_pass_matches_loop(recording, cutoff):
+    alpha = compute_alpha_lpf(DT, cutoff)
+    np.testing.assert_allclose(low_pass_filter(recording, alpha),
+                               by_column(loop_lpf, recording, alpha), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("cutoff", [0.1, 0.5, 5.0])
+def test_high_pass_matches_loop(recording, cutoff):
+    alpha = compute_alpha_hpf(DT, cutoff)
+    np.testing.assert_allclose(high_pass_filter(recording, alpha),
+                               by_column(loop_hpf, recording, alpha), rtol=1e-9, atol=1e-7)
+
+
+@pytest.mark.parametrize("window", [1, 2, 4, 5, 50])
+def test_moving_average_matches_convolve(recording, window):
+    np.testing.assert_allclose(moving_average_filter(recording, window),
+                               by_column(loop_ma, recording, window), rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("n, window", [(1, 5), (3, 4), (3, 5), (4, 6)])
+def test_moving_average_shorter_than_window(n, window):
+    x = np.arange(1.0, n + 1)
+    padded = np.concatenate([x, np.zeros(window - n)])
+    y = moving_average_filter(x, window)
+    assert len(y) == n
+    np.testing.assert_allclose(y, loop_ma(padded, window)[:n])
+
+
+def test_kalman_matches_loop(recording):
+    np.testing.assert_allclose(KalmanFilter().process(recording),
+                               by_column(loop_kalman, recording), rtol=1e-9, atol=1e-9)
+
+
+def test_stack_matches_single_recordings(recording):
+    stack = np.stack([recording, recording[::-1]])
+    alpha = compute_alpha_lpf(DT, 5.0)
+    np.testing.assert_allclose(low_pass_filter(stack, alpha)[1],
+                               by_column(loop_lpf, recording[::-1], alpha), rtol=1e-9, atol=1e-9)
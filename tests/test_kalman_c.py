@@ -0,0 +1,58 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+if shutil.which(os.environ.get("CC", "gcc")) is None:
+    pytest.skip("no C compiler", allow_module_level=True)
+
+import kalman_c
+from dataset import Dataset
+from filters import stack_recordings
+
+
+def bits(x):
+    return np.asarray(x, dtype=np.float32).view(np.uint32)
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("kalman_reference"))
+    exe = kalman_c.build_reference(folder)
+    return lambda rec: kalman_c.run_reference(exe, rec, folder)
+
+
+def synthetic(n=3000, channels=6, seed=0):
+    """Noise around steps and a ramp, at raw IMU count magnitudes."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)[:, None]
+    level = 2000.0 * (t // 500 % 3) + 0.5 * t + 100.0 * np.arange(channels)
+    return (level + rng.normal(0, 300, (n, channels))).astype(np.float32)
+
+
+def test_synthetic_bit_identical(reference):
+    rec = synthetic()
+    expected = reference(rec)
+    assert np.array_equal(bits(kalman_c.kalman_filter(rec)), bits(expected))
+
+    stream = kalman_c.CKalmanFilter()
+    chunked = np.concatenate([stream.process(c) for c in np.split(rec, [1, 17, 500, 2999])])
+    assert np.array_equal(bits(chunked), bits(expected))
+
+
+def test_stacked_matches_single_recordings():
+    recs = [synthetic(n, seed=n) for n in (10, 700, 3000)]
+    stack, lengths = stack_recordings(recs)
+    out = kalman_c.kalman_filter(stack.astype(np.float32))
+    for rec, y, n in zip(recs, out, lengths):
+        assert np.array_equal(bits(y[:n]), bits(kalman_c.kalman_filter(rec)))
+
+
+def test_corpus_bit_identical(reference):
+    ds = Dataset()
+    if len(ds) == 0:
+        pytest.skip("no recordings under data/")
+    for i, entry in enumerate(ds.entries):
+        rec = np.asarray(ds[i], dtype=np.float32)
+        assert np.array_equal(bits(kalman_c.kalman_filter(rec)), bits(reference(rec))), entry["path"]
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from dataset import Dataset
+from physics_batch import (DEFAULT_PARAMS, NOMINAL_DT, TICK_HZ, VERIFY_TOLERANCE, Params,
+                           verify)
+from recorder import Recorder
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    n = len(Dataset())
+    if n == 0:
+        pytest.skip("no recordings under data/")
+    return list(range(n))
+
+
+@pytest.mark.parametrize("fusion", ["complementary", "mahony"])
+def test_batch_matches_stream(corpus, fusion):
+    assert verify(corpus, [DEFAULT_PARAMS], fusion) <= VERIFY_TOLERANCE
+
+
+def test_parameter_sweep_matches_stream(corpus):
+    params = [Params(0.1, 0.95, 0.9), Params(0.3, 0.98, 0.98)]
+    assert verify(corpus[::10], params) <= VERIFY_TOLERANCE
+
+
+def test_device_ticks_with_gap(tmp_path):
+    # A recorder session whose ticks skip 40 ms, as after lost frames
+    rng = np.random.default_rng(0)
+    raw = rng.normal(0, 500, (600, 6)) + [0, 0, 16384, 0, 0, 0]
+    period = round(TICK_HZ * NOMINAL_DT)
+    ticks = np.arange(600) * period
+    ticks[300:] += 4 * period
+    recorder = Recorder(str(tmp_path), flush_interval=0.01).start()
+    recorder.feed(raw, ticks)
+    recorder.stop()
+    assert verify([recorder.session_dir], [DEFAULT_PARAMS]) <= VERIFY_TOLERANCE